@@ -0,0 +1,312 @@
+"""
+SafeGuard AI — Alert Rules
+===========================
+Turns live events from the event bus into rows in the alerts table.
+
+Rules are evaluated incrementally as events arrive: each keeps a small
+amount of state per camera or zone (a deque of recent violation times,
+the time a condition started) instead of querying the database. Rules
+are indexed by topic and camera, so an event only reaches the rules that
+can match it. An alert fires at most once per rule and camera/zone
+within the rule's cooldown, and fired alerts are written in batches by
+a single writer thread.
+
+Rules come from the "alertRules" settings key (DEFAULT_RULES if unset):
+    [
+      {"type": "violation_burst", "count": 5, "minutes": 10, "zone": "Dock 2"},
+      {"type": "low_compliance", "below": 80, "minutes": 5, "camera": "cam01"},
+      {"type": "camera_stalled", "seconds": 30}
+    ]
+Every rule also takes "name", "camera", "severity" (High Severity,
+Medium, Low) and "cooldown_minutes" (default: the rule's window).
+"""
+
+import time
+import sqlite3
+import threading
+from collections import deque
+from datetime import datetime
+
+from event_bus import bus
+
+FLUSH_INTERVAL = 1.0
+SEVERITY_COLORS = {"High Severity": "rose", "Medium": "amber", "Low": "blue"}
+
+DEFAULT_RULES = [
+    {"type": "violation_burst", "count": 5, "minutes": 10},
+    {"type": "low_compliance", "below": 80, "minutes": 5},
+    {"type": "camera_stalled", "seconds": 30},
+]
+
+
+class Rule:
+    topics = ()
+    default_severity = "Medium"
+
+    def __init__(self, name, camera=None, severity=None, cooldown=None):
+        self.name = name
+        self.camera = camera  # None: every camera
+        self.severity = severity or self.default_severity
+        if self.severity not in SEVERITY_COLORS:
+            raise ValueError(f"severity must be one of: {', '.join(SEVERITY_COLORS)}")
+        self.cooldown = cooldown
+        self.evaluations = 0
+        self.fired = 0
+        self.eval_ns = 0
+
+    def evaluate(self, data, now):
+        """Update state with one event. Returns (key, title, zone) to raise an alert, else None."""
+        raise NotImplementedError
+
+    def get_stats(self):
+        return {
+            "type": type(self).__name__,
+            "camera": self.camera,
+            "evaluations": self.evaluations,
+            "fired": self.fired,
+            "avg_us": round(self.eval_ns / self.evaluations / 1000, 2) if self.evaluations else 0.0,
+            "total_ms": round(self.eval_ns / 1e6, 3)
+        }
+
+
+class ViolationBurstRule(Rule):
+    """More than `count` violations in one zone within `minutes`."""
+    topics = ("violation.opened",)
+    default_severity = "High Severity"
+
+    def __init__(self, name, count=5, minutes=10, zone=None, **kwargs):
+        super().__init__(name, **kwargs)
+        self.count = int(count)
+        self.window = float(minutes) * 60
+        self.zone = zone
+        self.cooldown = self.window if self.cooldown is None else self.cooldown
+        self._times = {}  # (camera, zone) -> deque of event times in the window
+
+    def evaluate(self, data, now):
+        zone = data.get("zone")
+        if self.zone and zone != self.zone:
+            return None
+        times = self._times.setdefault((data["camera_id"], zone), deque())
+        times.append(now)
+        while times[0] < now - self.window:
+            times.popleft()
+        if len(times) > self.count:
+            where = zone or f"camera {data['camera_id']}"  # Events outside any zone
+            return ((data["camera_id"], zone),
+                    f"{len(times)} violations in {where} within {self.window / 60:g} min", zone)
+        return None
+
+
+class SustainedRule(Rule):
+    """Fires once a per-camera metrics condition has held for `seconds`."""
+    topics = ("metrics",)
+
+    def __init__(self, name, seconds, **kwargs):
+        super().__init__(name, **kwargs)
+        self.window = float(seconds)
+        self.cooldown = self.window if self.cooldown is None else self.cooldown
+        self._since = {}  # camera -> time the condition started holding
+
+    def holds(self, data):
+        raise NotImplementedError
+
+    def title(self, data):
+        raise NotImplementedError
+
+    def evaluate(self, data, now):
+        camera = data["camera_id"]
+        if data.get("paused") or not self.holds(data):
+            self._since.pop(camera, None)
+            return None
+        since = self._since.setdefault(camera, now)
+        if now - since >= self.window:
+            return camera, self.title(data), camera
+        return None
+
+
+class LowComplianceRule(SustainedRule):
+    """Compliance below `below` percent for `minutes` (only while people are in view)."""
+
+    def __init__(self, name, below=80, minutes=5, **kwargs):
+        super().__init__(name, float(minutes) * 60, **kwargs)
+        self.below = float(below)
+
+    def holds(self, data):
+        return data.get("total_tracked", 0) > 0 and data.get("compliance_rate", 100) < self.below
+
+    def title(self, data):
+        return f"Compliance {data['compliance_rate']:.0f}% below {self.below:g}% for {self.window / 60:g} min"
+
+
+class CameraStalledRule(Rule):
+    """A running (not paused) camera that has published no frame for `seconds`."""
+    topics = ("metrics",)
+    default_severity = "Low"
+
+    def __init__(self, name, seconds=30, **kwargs):
+        super().__init__(name, **kwargs)
+        self.window = float(seconds)
+        self.cooldown = self.window if self.cooldown is None else self.cooldown
+
+    def evaluate(self, data, now):
+        # frame_age is the time since the last published frame (VideoProcessor.get_stats)
+        age = data.get("frame_age")
+        if data.get("paused") or age is None or age < self.window:
+            return None
+        camera = data["camera_id"]
+        return camera, f"Camera {camera} has produced no frames for {age:.0f}s", camera
+
+
+RULE_TYPES = {
+    "violation_burst": ViolationBurstRule,
+    "low_compliance": LowComplianceRule,
+    "camera_stalled": CameraStalledRule,
+}
+
+
+def rule_from_dict(data, index=0):
+    """Build a rule from its settings entry. Raises ValueError for unknown types or options."""
+    options = dict(data)
+    kind = options.pop("type", None)
+    if kind not in RULE_TYPES:
+        raise ValueError(f"Unknown alert rule type {kind!r}. Use one of: {', '.join(RULE_TYPES)}")
+    name = options.pop("name", None) or f"{kind}-{index + 1}"
+    cooldown = options.pop("cooldown_minutes", None)
+    if cooldown is not None:
+        options["cooldown"] = float(cooldown) * 60
+    try:
+        return RULE_TYPES[kind](name, **options)
+    except TypeError as e:
+        raise ValueError(f"Alert rule {name}: {e}")
+
+
+def parse_alert_rules(entries):
+    """Build the rules for an "alertRules" setting (None: DEFAULT_RULES). Raises ValueError."""
+    if entries is None:
+        entries = DEFAULT_RULES
+    if not isinstance(entries, list):
+        raise ValueError("alertRules must be a list")
+    rules = []
+    for i, entry in enumerate(entries):
+        if not isinstance(entry, dict):
+            raise ValueError(f"Alert rule {i + 1} must be an object")
+        rules.append(rule_from_dict(entry, i))
+    return rules
+
+
+def ensure_alert_columns(conn):
+    """Add the camera and rule columns to an existing alerts table."""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(alerts)")}
+    if not columns:
+        return
+    for name in ("camera_id", "rule"):
+        if name not in columns:
+            conn.execute(f"ALTER TABLE alerts ADD COLUMN {name} TEXT")
+    conn.commit()
+
+
+class AlertEngine:
+    def __init__(self, db_path, flush_interval=FLUSH_INTERVAL):
+        self.db_path = db_path
+        self.flush_interval = flush_interval
+        self.rules = []
+        self._index = {}       # (topic, camera or None) -> [rule]
+        self._last_fired = {}  # (rule name, key) -> time, kept across rule reloads
+        self._pending = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self.suppressed = 0
+        self.written = 0
+
+    def start(self):
+        threading.Thread(target=self._writer, name="alerts", daemon=True).start()
+        bus.subscribe(self.handle)
+
+    def apply_settings(self, settings):
+        """Rebuild the rules from settings. Invalid rules keep the previous set running."""
+        try:
+            rules = parse_alert_rules(settings.get("alertRules"))
+        except ValueError as e:
+            print(f"Alert rules not applied: {e}")
+            return
+        self.set_rules(rules)
+
+    def set_rules(self, rules):
+        index = {}
+        for rule in rules:
+            for topic in rule.topics:
+                index.setdefault((topic, rule.camera), []).append(rule)
+        with self._lock:
+            self.rules = rules
+            self._index = index
+        print(f"Alert engine: {len(rules)} rules")
+
+    def handle(self, topic, data):
+        """Event bus callback: runs on the publishing thread, so it only updates memory."""
+        camera = data.get("camera_id")
+        now = time.time()
+        with self._lock:
+            rules = self._index.get((topic, None), []) + self._index.get((topic, camera), [])
+            for rule in rules:
+                start = time.perf_counter_ns()
+                result = rule.evaluate(data, now)
+                rule.eval_ns += time.perf_counter_ns() - start
+                rule.evaluations += 1
+                if result:
+                    self._raise(rule, *result, camera, now)
+
+    def _raise(self, rule, key, title, zone, camera, now):
+        last = self._last_fired.get((rule.name, key))
+        if last is not None and now - last < rule.cooldown:
+            self.suppressed += 1
+            return
+        self._last_fired[(rule.name, key)] = now
+        rule.fired += 1
+        self._pending.append({
+            "type": rule.severity,
+            "time": datetime.fromtimestamp(now).strftime("%H:%M:%S"),
+            "title": title,
+            "zone": zone,
+            "color": SEVERITY_COLORS[rule.severity],
+            "camera_id": camera,
+            "rule": rule.name
+        })
+        self._wake.set()
+
+    def _writer(self):
+        while True:
+            self._wake.wait()
+            time.sleep(self.flush_interval)  # Let alerts raised together share one insert
+            self._wake.clear()
+            with self._lock:
+                alerts, self._pending = self._pending, []
+            if alerts:
+                self._flush(alerts)
+
+    def _flush(self, alerts):
+        try:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            try:
+                conn.executemany(
+                    "INSERT INTO alerts (type, time, title, zone, color, camera_id, rule) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [(a["type"], a["time"], a["title"], a["zone"], a["color"], a["camera_id"], a["rule"])
+                     for a in alerts]
+                )
+                conn.commit()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            print(f"Error writing {len(alerts)} alerts: {e}")
+            return
+        self.written += len(alerts)
+        for alert in alerts:
+            bus.publish("alert.raised", alert)
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                "rules": {rule.name: rule.get_stats() for rule in self.rules},
+                "pending": len(self._pending),
+                "written": self.written,
+                "suppressed": self.suppressed
+            }
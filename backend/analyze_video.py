@@ -1,38 +1,298 @@
+"""
+SafeGuard AI — Offline Video Analysis
+======================================
+Audits recorded footage for PPE compliance. The video is split into
+segments that are analyzed in parallel by a process pool, each worker
+with its own detector. Finished segments are saved as they complete, so
+an interrupted run picks up where it left off when started again.
+
+Output (in --out):
+    segments/seg_XXXXX.npz   per-segment results (used for resuming)
+    results.npz              merged columnar results
+                               frame_*  one row per analyzed frame
+                               det_*    one row per detected person (no det_helmet /
+                                        det_vest with --no-helmet / --no-vest)
+    summary.json             totals, violation intervals and throughput
+
+Usage:
+    python analyze_video.py "upstairs-Cam 03.mp4" --out results/cam03 --workers 4
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
 import cv2
-from yolo_logic import YoloPPEDetector
-
-# Initialize Detector
-detector = YoloPPEDetector("yolov8n.pt")
-print("✅ Detector initialized")
-
-# Path to video
-video_path = r"c:\Users\aksha\Downloads\open cv project\upstairs-Cam 03.mp4"
-cap = cv2.VideoCapture(video_path)
-
-if not cap.isOpened():
-    print(f"❌ Error opening video: {video_path}")
-    exit()
-
-print(f"▶️ Processing {video_path}...")
-
-frame_count = 0
-while True:
-    ret, frame = cap.read()
-    if not ret: break
-    
-    frame_count += 1
-    if frame_count % 10 != 0: continue # Process every 10th frame for speed
-    
-    # Run Detection
-    detections = detector.detect(frame, check_helmet=True, check_vest=True)
-    
-    print(f"\n--- Frame {frame_count} ---")
-    for i, d in enumerate(detections):
-        status = d["status"]
-        conf = d["conf"]
-        print(f"  Person {i+1}: {status} (Conf: {conf:.2f})")
-        print(f"    - Helmet: {'✅' if d['helmet'] else '❌'}")
-        print(f"    - Vest:   {'✅' if d['vest'] else '❌'}")
-
-cap.release()
-print("\nDone.")
+import numpy as np
+
+BATCH_SIZE = 8
+
+FRAME_COLUMNS = ("frame", "persons", "violations", "no_helmet", "no_vest")
+DET_COLUMNS = ("frame", "x", "y", "w", "h", "conf", "helmet", "vest", "violation")
+
+# --- Worker Process ---
+_detector = None
+
+def _init_worker(model_path, threads):
+    """Load one detector per worker process."""
+    global _detector
+    cv2.setNumThreads(1)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    from yolo_logic import YoloPPEDetector
+    _detector = YoloPPEDetector(model_path)
+
+
+def _analyze_segment(video_path, seg_index, start, end, every, check_helmet, check_vest, seg_path):
+    """Analyze frames [start, end) and save the segment's columns to seg_path."""
+    t0 = time.perf_counter()
+    cap = cv2.VideoCapture(video_path)
+    cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+
+    frame_rows = {c: [] for c in FRAME_COLUMNS}
+    det_rows = {c: [] for c in DET_COLUMNS}
+    batch, batch_idx = [], []
+
+    def flush():
+        results = _detector.detect_batch(batch, check_helmet, check_vest)
+        for idx, detections in zip(batch_idx, results):
+            frame_rows["frame"].append(idx)
+            frame_rows["persons"].append(len(detections))
+            frame_rows["violations"].append(sum(d["status"] == "Violation" for d in detections))
+            # helmet/vest are None for items that aren't checked
+            frame_rows["no_helmet"].append(sum(d["helmet"] is False for d in detections))
+            frame_rows["no_vest"].append(sum(d["vest"] is False for d in detections))
+            for d in detections:
+                x, y, w, h = d["bbox"]
+                for col, val in zip(DET_COLUMNS, (idx, x, y, w, h, d["conf"], d["helmet"], d["vest"],
+                                                  d["status"] == "Violation")):
+                    det_rows[col].append(val)
+        batch.clear()
+        batch_idx.clear()
+
+    frames_read = 0
+    for idx in range(start, end):
+        # Only decode the frames we analyze
+        if idx % every:
+            if not cap.grab():
+                break
+            continue
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames_read += 1
+        batch.append(frame)
+        batch_idx.append(idx)
+        if len(batch) >= BATCH_SIZE:
+            flush()
+    if batch:
+        flush()
+    cap.release()
+
+    columns = {
+        "frame_frame": np.asarray(frame_rows["frame"], dtype=np.int32),
+        "frame_persons": np.asarray(frame_rows["persons"], dtype=np.uint16),
+        "frame_violations": np.asarray(frame_rows["violations"], dtype=np.uint16),
+        "frame_no_helmet": np.asarray(frame_rows["no_helmet"], dtype=np.uint16),
+        "frame_no_vest": np.asarray(frame_rows["no_vest"], dtype=np.uint16),
+        "det_frame": np.asarray(det_rows["frame"], dtype=np.int32),
+        "det_x": np.asarray(det_rows["x"], dtype=np.int16),
+        "det_y": np.asarray(det_rows["y"], dtype=np.int16),
+        "det_w": np.asarray(det_rows["w"], dtype=np.int16),
+        "det_h": np.asarray(det_rows["h"], dtype=np.int16),
+        "det_conf": np.asarray(det_rows["conf"], dtype=np.float32),
+        "det_violation": np.asarray(det_rows["violation"], dtype=bool),
+    }
+    # An unchecked item is unknown, not missing, so it gets no column at all
+    if check_helmet:
+        columns["det_helmet"] = np.asarray(det_rows["helmet"], dtype=bool)
+    if check_vest:
+        columns["det_vest"] = np.asarray(det_rows["vest"], dtype=bool)
+    # Write then rename, so a killed worker never leaves a half-written segment
+    tmp_path = seg_path + ".tmp.npz"
+    np.savez_compressed(tmp_path, **columns)
+    os.replace(tmp_path, seg_path)
+
+    return seg_index, frames_read, time.perf_counter() - t0
+
+
+# --- Planning & Merging ---
+def probe_video(video_path):
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        return None
+    info = {
+        "frames": int(cap.get(cv2.CAP_PROP_FRAME_COUNT)),
+        "fps": cap.get(cv2.CAP_PROP_FPS) or 30.0,
+        "width": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+        "height": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+    }
+    cap.release()
+    return info
+
+
+def plan_segments(total_frames, segment_frames):
+    return [(i, start, min(start + segment_frames, total_frames))
+            for i, start in enumerate(range(0, total_frames, segment_frames))]
+
+
+def load_manifest(out_dir, manifest):
+    """Return True if out_dir holds a run with the same input and parameters."""
+    path = os.path.join(out_dir, "manifest.json")
+    if not os.path.exists(path):
+        return False
+    with open(path) as f:
+        return json.load(f) == manifest
+
+
+def merge_segments(seg_paths):
+    merged = {}
+    for path in seg_paths:
+        with np.load(path) as data:
+            for key in data.files:
+                merged.setdefault(key, []).append(data[key])
+    return {key: np.concatenate(parts) for key, parts in merged.items()}
+
+
+def violation_intervals(frames, violations, fps, max_gap):
+    """Group analyzed frames with violations into [start, end] intervals in seconds."""
+    intervals = []
+    current = None
+    for idx, count in zip(frames.tolist(), violations.tolist()):
+        if not count:
+            continue
+        t = idx / fps
+        if current and t - current["end"] <= max_gap:
+            current["end"] = t
+            current["frames"] += 1
+            current["peak_violations"] = max(current["peak_violations"], count)
+        else:
+            current = {"start": t, "end": t, "frames": 1, "peak_violations": count}
+            intervals.append(current)
+    for iv in intervals:
+        iv["duration"] = round(iv["end"] - iv["start"], 2)
+        iv["start"] = round(iv["start"], 2)
+        iv["end"] = round(iv["end"], 2)
+    return intervals
+
+
+def build_summary(video_path, info, args, columns, elapsed, analyzed_now):
+    frames = columns["frame_frame"]
+    persons = int(columns["frame_persons"].sum())
+    violations = int(columns["frame_violations"].sum())
+    intervals = violation_intervals(frames, columns["frame_violations"], info["fps"], args.max_gap)
+    video_seconds = info["frames"] / info["fps"]
+    return {
+        "video": video_path,
+        "video_seconds": round(video_seconds, 1),
+        "frames_analyzed": int(len(frames)),
+        "person_detections": persons,
+        "violation_detections": violations,
+        "no_helmet_detections": None if args.no_helmet else int(columns["frame_no_helmet"].sum()),
+        "no_vest_detections": None if args.no_vest else int(columns["frame_no_vest"].sum()),
+        "compliance_rate": round((persons - violations) / persons * 100, 1) if persons else 100.0,
+        "violation_intervals": intervals,
+        "violation_seconds": round(sum(iv["duration"] for iv in intervals), 1),
+        "throughput": {
+            "wall_seconds": round(elapsed, 1),
+            "frames_analyzed_this_run": analyzed_now,
+            "frames_per_second": round(analyzed_now / elapsed, 1) if elapsed else 0,
+            "workers": args.workers,
+        },
+    }
+
+
+# --- CLI ---
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Parallel offline PPE compliance analysis of a video file.")
+    parser.add_argument("video", help="Path to the video file")
+    parser.add_argument("--out", default=None, help="Output directory (default: results/<video name>)")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--segment-seconds", type=float, default=60.0, help="Length of each parallel segment")
+    parser.add_argument("--every", type=int, default=10, help="Analyze every Nth frame")
+    parser.add_argument("--model", default=os.path.join(os.path.dirname(__file__), "yolov8n.pt"))
+    parser.add_argument("--max-gap", type=float, default=2.0,
+                        help="Seconds without a violation that still count as the same interval")
+    parser.add_argument("--no-helmet", action="store_true", help="Don't check helmets")
+    parser.add_argument("--no-vest", action="store_true", help="Don't check vests")
+    parser.add_argument("--restart", action="store_true", help="Ignore segments from a previous run")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    video_path = os.path.abspath(args.video)
+    info = probe_video(video_path)
+    if info is None or info["frames"] <= 0:
+        print(f"❌ Error opening video: {video_path}")
+        return 1
+
+    out_dir = args.out or os.path.join(os.path.dirname(__file__), "results",
+                                       os.path.splitext(os.path.basename(video_path))[0])
+    seg_dir = os.path.join(out_dir, "segments")
+    os.makedirs(seg_dir, exist_ok=True)
+
+    segment_frames = max(args.every, int(args.segment_seconds * info["fps"]))
+    segments = plan_segments(info["frames"], segment_frames)
+    seg_paths = [os.path.join(seg_dir, f"seg_{i:05d}.npz") for i, _, _ in segments]
+
+    stat = os.stat(video_path)
+    manifest = {
+        "video": video_path, "size": stat.st_size, "mtime": int(stat.st_mtime),
+        "every": args.every, "segment_frames": segment_frames,
+        "check_helmet": not args.no_helmet, "check_vest": not args.no_vest,
+    }
+    if args.restart or not load_manifest(out_dir, manifest):
+        for path in seg_paths:
+            if os.path.exists(path):
+                os.remove(path)
+        with open(os.path.join(out_dir, "manifest.json"), "w") as f:
+            json.dump(manifest, f, indent=2)
+
+    todo = [seg for seg, path in zip(segments, seg_paths) if not os.path.exists(path)]
+    print(f"▶️ {video_path}: {info['frames']} frames @ {info['fps']:.1f} fps, "
+          f"{len(segments)} segments ({len(segments) - len(todo)} already done), {args.workers} workers")
+
+    start = time.perf_counter()
+    analyzed_now = 0
+    if todo:
+        threads = max(1, (os.cpu_count() or 1) // args.workers)
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker,
+                                 initargs=(args.model, threads)) as pool:
+            futures = [
+                pool.submit(_analyze_segment, video_path, i, s, e, args.every,
+                            not args.no_helmet, not args.no_vest, seg_paths[i])
+                for i, s, e in todo
+            ]
+            done = len(segments) - len(todo)
+            for future in as_completed(futures):
+                seg_index, frames_read, seconds = future.result()
+                done += 1
+                analyzed_now += frames_read
+                elapsed = time.perf_counter() - start
+                print(f"  segment {seg_index:>5} done: {frames_read} frames in {seconds:.1f}s "
+                      f"[{done}/{len(segments)}] {analyzed_now / elapsed:.1f} frames/s overall")
+
+    elapsed = time.perf_counter() - start
+    columns = merge_segments(seg_paths)
+    np.savez_compressed(os.path.join(out_dir, "results.npz"), **columns)
+
+    summary = build_summary(video_path, info, args, columns, elapsed, analyzed_now)
+    with open(os.path.join(out_dir, "summary.json"), "w") as f:
+        json.dump(summary, f, indent=2)
+
+    print(f"✅ {summary['frames_analyzed']} frames analyzed, compliance {summary['compliance_rate']}%, "
+          f"{len(summary['violation_intervals'])} violation intervals "
+          f"({summary['violation_seconds']}s total)")
+    print(f"   Results written to {out_dir}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
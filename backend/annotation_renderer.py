@@ -0,0 +1,83 @@
+import cv2
+import numpy as np
+
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+FONT_SCALE = 0.5
+FONT_THICKNESS = 1
+LABEL_HEIGHT = 20
+TEXT_BASELINE = 15  # Text baseline inside the label, in pixels from its top
+
+COLOR_COMPLIANT = (0, 255, 0)  # Green
+COLOR_VIOLATION = (0, 0, 255)  # Red
+COLOR_TEXT = (255, 255, 255)
+
+
+class AnnotationRenderer:
+    """
+    Draws detection boxes and labels directly onto a frame.
+
+    Labels only come in a handful of variants (status + missing PPE), so
+    each one is rasterized once into a small sprite and then copied into
+    place, instead of measuring and drawing the text for every box on
+    every frame.
+    """
+
+    def __init__(self):
+        self._sprites = {}
+        self._last_key = None
+
+    @staticmethod
+    def label_key(d):
+        details = []
+        if d.get("helmet") is False: details.append("No Helmet")
+        if d.get("vest") is False: details.append("No Vest")
+        return d["status"], tuple(details)
+
+    def sprite(self, key):
+        """Return the cached label image for (status, details), rendering it on first use."""
+        sprite = self._sprites.get(key)
+        if sprite is None:
+            status, details = key
+            label = status
+            if details:
+                label += ": " + ", ".join(details)
+            (tw, _), _ = cv2.getTextSize(label, FONT, FONT_SCALE, FONT_THICKNESS)
+            color = COLOR_VIOLATION if status == "Violation" else COLOR_COMPLIANT
+            sprite = np.empty((LABEL_HEIGHT + 1, tw + 1, 3), dtype=np.uint8)
+            sprite[:] = color
+            cv2.putText(sprite, label, (0, TEXT_BASELINE), FONT, FONT_SCALE, COLOR_TEXT, FONT_THICKNESS)
+            self._sprites[key] = sprite
+        return sprite
+
+    def draw(self, frame, detections):
+        """Draw detections in place on frame and return it."""
+        fh, fw = frame.shape[:2]
+        for d in detections:
+            x, y, w, h = d["bbox"]
+            color = COLOR_VIOLATION if d["status"] == "Violation" else COLOR_COMPLIANT
+
+            # Box
+            cv2.rectangle(frame, (x, y), (x + w, y + h), color, 2)
+
+            # Label, clipped to the frame edges
+            sprite = self.sprite(self.label_key(d))
+            sh, sw = sprite.shape[:2]
+            top = y - LABEL_HEIGHT
+            y0, x0 = max(top, 0), max(x, 0)
+            y1, x1 = min(top + sh, fh), min(x + sw, fw)
+            if y1 > y0 and x1 > x0:
+                frame[y0:y1, x0:x1] = sprite[y0 - top:y1 - top, x0 - x:x1 - x]
+
+        return frame
+
+    def render(self, frame, detections, frame_version, detections_version):
+        """
+        Draw onto frame unless this (frame, detections) pair was already the
+        last thing rendered. Returns True if anything was drawn.
+        """
+        key = (id(frame), frame_version, detections_version)
+        if key == self._last_key:
+            return False
+        self.draw(frame, detections)
+        self._last_key = key
+        return True
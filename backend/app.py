@@ -1,41 +1,63 @@
 import os
+import io
 import cv2
 import time
 import json
+import queue
 import sqlite3
+import zipfile
 import threading
+import numpy as np
+from concurrent.futures import as_completed
 from datetime import datetime
-from flask import Flask, request, jsonify, g, send_from_directory, Response
+from flask import Flask, Blueprint, request, jsonify, g, send_from_directory, Response
 from flask_cors import CORS
 
-from yolo_logic import YoloPPEDetector
-from firebase_auth import require_auth, require_role, init_firebase
-from video_processor import VideoProcessor
-
-# --- Initialize ---
-app = Flask(__name__)
-CORS(app)
-init_firebase()
-
-DB_PATH = os.path.join(os.path.dirname(__file__), "safeguard.db")
-UPLOAD_FOLDER = os.path.join(os.path.dirname(__file__), "uploads")
-SNAPSHOT_FOLDER = os.path.join(os.path.dirname(__file__), "snapshots")
+from firebase_auth import require_auth, require_role, init_firebase, get_auth_metrics, invalidate_role
+from video_processor import VideoProcessor, parse_processor_settings
+from startup import StartupTracker
+from inference import BatchedDetector
+from camera_config import load_camera_configs
+from violation_events import ensure_violation_columns
+from stream_hub import StreamHub, VARIANTS, DEFAULT_VARIANT
+from yolo_logic import YoloPPEDetector, parse_color_settings
+from settings_service import SettingsService
+from event_bus import bus
+from alert_engine import AlertEngine, ensure_alert_columns, parse_alert_rules
+from profiler import (sample_threads, collapsed_stacks, memory_snapshot, ProfilerBusy,
+                      MAX_PROFILE_SECONDS, MIN_INTERVAL)
+from export_stream import stream_export, ensure_export_indexes, FORMATS as EXPORT_FORMATS
+
+# --- Paths ---
+BASE_DIR = os.path.dirname(__file__)
+DB_PATH = os.path.join(BASE_DIR, "safeguard.db")
+UPLOAD_FOLDER = os.path.join(BASE_DIR, "uploads")
+SNAPSHOT_FOLDER = os.path.join(BASE_DIR, "snapshots")
+CLIP_FOLDER = os.path.join(BASE_DIR, "clips")
+MODEL_PATH = os.path.join(BASE_DIR, "yolov8n.pt")
+CAMERAS_FILE = os.path.join(BASE_DIR, "cameras.json")
+# Base URL written into snapshot and clip links (a cluster node sets its own address)
+MEDIA_URL = os.environ.get("SAFEGUARD_PUBLIC_URL", "http://localhost:5000")
 
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(SNAPSHOT_FOLDER, exist_ok=True)
+os.makedirs(CLIP_FOLDER, exist_ok=True)
 
-detector = YoloPPEDetector(os.path.join(os.path.dirname(__file__), "yolov8n.pt"))
+api = Blueprint("api", __name__)
 
-# Warm up the model once on the main thread to prevent threading conflicts
-import numpy as np
-_dummy = np.zeros((64, 64, 3), dtype=np.uint8)
-detector.detect(_dummy)
-print("YOLO model warmed up successfully.")
+# --- Shared State ---
+# Filled in by the background startup phases launched from create_app().
+startup = StartupTracker()
+settings = SettingsService(DB_PATH)
+detector = None
+inference = None  # BatchedDetector shared by cameras and /api/detect
+alert_engine = None  # AlertEngine turning bus events into alerts rows
 
-# Global lock so only one thread runs YOLO at a time
-detection_lock = threading.Lock()
+MAX_DETECT_IMAGES = 64
+MAX_DETECT_ARCHIVE_BYTES = 200 * 1024 * 1024  # Uncompressed size limit for zip batches
 
 # --- Video Processors ---
+# Defaults used when there is no cameras.json (see camera_config.py)
 CAMERAS = {
     "cam01": r"c:\Users\aksha\Downloads\open cv project\Assembly Line A-Cam 01.mp4",
     "cam02": r"c:\Users\aksha\Downloads\open cv project\Dock Area-Cam 02.mp4",
@@ -43,18 +65,71 @@ CAMERAS = {
 }
 
 processors = {}
-
-# Start processors with a small delay between each to avoid race conditions
-import time as _time
-for cam_id, path in CAMERAS.items():
-    if os.path.exists(path):
-        print(f"Starting processor for {cam_id}...")
-        p = VideoProcessor(path, cam_id, DB_PATH, SNAPSHOT_FOLDER)
-        p.start(detector, detection_lock)
-        processors[cam_id] = p
-        _time.sleep(1)  # Stagger startup
-    else:
+streams = StreamHub(processors)  # Shared MJPEG encoding for all viewers
+
+# --- Startup Phases ---
+def load_model():
+    model = YoloPPEDetector(MODEL_PATH)
+    # Warm up once before any camera thread shares the model
+    model.detect(np.zeros((64, 64, 3), dtype=np.uint8))
+    install_detector(model)
+    print("YOLO model warmed up successfully.")
+
+def install_detector(model):
+    """Share a detector with the cameras and /api/detect (see load_model)."""
+    global detector, inference
+    settings.subscribe(model.apply_settings)
+    detector = model
+    inference = BatchedDetector(model)
+
+def open_processor(cam_id, config):
+    """Open one camera's source. Returns its VideoProcessor, or None if it can't be opened."""
+    path = config.source
+    if "://" not in path and not os.path.exists(path):
         print(f"Warning: Video file not found: {path}")
+        return None
+    p = VideoProcessor(path, cam_id, DB_PATH, SNAPSHOT_FOLDER, config=config, clip_folder=CLIP_FOLDER,
+                       media_url=MEDIA_URL)
+    return p if p.open() else None
+
+def start_processor(cam_id, p):
+    """Run an opened processor on the shared detector and make it visible to the API."""
+    print(f"Starting processor for {cam_id}...")
+    settings.subscribe(p.apply_settings)
+    p.start(inference)
+    processors[cam_id] = p
+
+def stop_processor(cam_id):
+    p = processors.pop(cam_id, None)
+    if p:
+        print(f"Stopping processor for {cam_id}...")
+        settings.unsubscribe(p.apply_settings)
+        p.stop()
+
+def open_cameras(configs=None):
+    """Open every camera (cameras.json, or CAMERAS) and start it once the model is ready."""
+    opened = {}
+    opened_lock = threading.Lock()
+
+    def _open(cam_id, config):
+        p = open_processor(cam_id, config)
+        if p:
+            with opened_lock:
+                opened[cam_id] = p
+
+    configs = configs or load_camera_configs(CAMERAS_FILE, CAMERAS)
+    threads = [threading.Thread(target=_open, args=item, name=f"open-{item[0]}", daemon=True)
+               for item in configs.items()]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    # Processors need the shared detector before they can run
+    if not startup.wait_for("model"):
+        raise RuntimeError("model failed to load, cameras not started")
+    for cam_id, p in opened.items():
+        start_processor(cam_id, p)
 
 # --- DB Helpers ---
 def get_db():
@@ -65,15 +140,80 @@ def get_db():
 
 # --- API Endpoints ---
 
-@app.route("/api/health", methods=["GET"])
+@api.route("/api/health", methods=["GET"])
 def health():
-    return jsonify({
-        "status": "healthy",
+    body = {
+        "status": startup.status(),
+        "ready": startup.is_ready(),
         "service": "SafeGuard AI Backend",
-        "opencv_version": cv2.__version__
-    })
+        "opencv_version": cv2.__version__,
+        "stages": startup.snapshot(),
+        "cameras": sorted(processors),
+        "inference": inference.get_stats() if inference else None,
+        "streams": streams.get_stats()
+    }
+    # ?ready=1 lets readiness probes fail until every stage has loaded
+    if request.args.get("ready") and not body["ready"]:
+        return jsonify(body), 503
+    return jsonify(body)
+
+@api.route("/api/auth/metrics", methods=["GET"])
+@require_auth
+@require_role("admin")
+def auth_metrics():
+    return jsonify(get_auth_metrics())
+
+@api.route("/api/auth/cache/invalidate", methods=["POST"])
+@require_auth
+@require_role("admin")
+def invalidate_auth_cache():
+    # Call after changing a user's role or status in Firestore
+    data = request.get_json(silent=True) or {}
+    invalidate_role(data.get("uid"))
+    return jsonify({"success": True})
 
-@app.route("/api/metrics", methods=["GET"])
+@api.route("/api/admin/profile", methods=["GET"])
+@require_auth
+@require_role("admin")
+def profile_threads():
+    """
+    Sample every thread for ?seconds=5 (every ?interval_ms=5) and return
+    collapsed stacks rooted at the thread name (camera-cam01, inference,
+    metrics, ...) for flamegraph.pl or speedscope. ?thread=camera-cam01
+    keeps only matching threads, ?lines=1 keeps line numbers and
+    ?format=json adds sample counts per thread.
+    """
+    seconds = min(max(request.args.get("seconds", 5, type=float), 0.1), MAX_PROFILE_SECONDS)
+    interval = max(request.args.get("interval_ms", 5, type=float) / 1000, MIN_INTERVAL)
+    try:
+        profile = sample_threads(seconds, interval, request.args.get("thread"), bool(request.args.get("lines")))
+    except ProfilerBusy as e:
+        return jsonify({"error": str(e)}), 409
+    if request.args.get("format") == "json":
+        return jsonify({**profile, "stacks": dict(profile["stacks"].most_common())})
+    return Response(collapsed_stacks(profile["stacks"]), mimetype="text/plain")
+
+@api.route("/api/admin/profile/memory", methods=["GET"])
+@require_auth
+@require_role("admin")
+def profile_memory():
+    """
+    Top ?top=25 live allocations by ?group=lineno|filename|traceback,
+    traced for ?seconds=10 (with ?frames=1 stack depth) unless tracemalloc
+    is already running for the whole process.
+    """
+    seconds = min(max(request.args.get("seconds", 10, type=float), 0.1), MAX_PROFILE_SECONDS)
+    top = min(max(request.args.get("top", 25, type=int), 1), 500)
+    frames = min(max(request.args.get("frames", 1, type=int), 1), 50)
+    try:
+        snapshot = memory_snapshot(seconds, top, request.args.get("group", "lineno"), frames)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except ProfilerBusy as e:
+        return jsonify({"error": str(e)}), 409
+    return jsonify(snapshot)
+
+@api.route("/api/metrics", methods=["GET"])
 def get_metrics():
     db = get_db()
     # Get latest metric for EACH camera
@@ -87,14 +227,17 @@ def get_metrics():
         )
     """).fetchall()
     db.close()
-    
+    return jsonify(summarize_metrics(rows))
+
+def summarize_metrics(rows):
+    """Dashboard totals from per-camera rows of total_tracked, active_violations and fps."""
     if not rows:
-        return jsonify({
+        return {
             "total_tracked": 0,
             "active_violations": 0,
             "compliance_rate": 100.0,
             "fps": 0.0
-        })
+        }
 
     total_tracked = sum(r["total_tracked"] for r in rows)
     total_violations = sum(r["active_violations"] for r in rows)
@@ -104,21 +247,21 @@ def get_metrics():
     if total_tracked > 0:
         compliance_rate = ((total_tracked - total_violations) / total_tracked) * 100.0
         
-    return jsonify({
+    return {
         "total_tracked": total_tracked,
         "active_violations": total_violations,
         "compliance_rate": round(compliance_rate, 1),
         "fps": round(avg_fps, 1)
-    })
+    }
 
-@app.route("/api/workers", methods=["GET"])
+@api.route("/api/workers", methods=["GET"])
 def get_workers():
     db = get_db()
     rows = db.execute("SELECT * FROM workers ORDER BY created_at DESC").fetchall()
     db.close()
     return jsonify([dict(r) for r in rows])
 
-@app.route("/api/workers", methods=["POST"])
+@api.route("/api/workers", methods=["POST"])
 @require_auth
 @require_role("admin")
 def add_worker():
@@ -133,7 +276,7 @@ def add_worker():
     db.close()
     return jsonify({"success": True, "id": worker_id})
 
-@app.route("/api/workers/<id>", methods=["DELETE"])
+@api.route("/api/workers/<id>", methods=["DELETE"])
 @require_auth
 @require_role("admin")
 def delete_worker(id):
@@ -143,14 +286,14 @@ def delete_worker(id):
     db.close()
     return jsonify({"success": True})
 
-@app.route("/api/violations", methods=["GET"])
+@api.route("/api/violations", methods=["GET"])
 def get_violations():
     db = get_db()
     rows = db.execute("SELECT * FROM violations ORDER BY created_at DESC LIMIT 50").fetchall()
     db.close()
     return jsonify([dict(r) for r in rows])
 
-@app.route("/api/violations/<id>", methods=["PUT"])
+@api.route("/api/violations/<id>", methods=["PUT"])
 @require_auth
 @require_role("admin", "staff")
 def update_violation(id, status=None):
@@ -162,14 +305,22 @@ def update_violation(id, status=None):
     db.close()
     return jsonify({"success": True})
 
-@app.route("/api/alerts", methods=["GET"])
+@api.route("/api/alerts", methods=["GET"])
 def get_alerts():
     db = get_db()
     rows = db.execute("SELECT * FROM alerts WHERE read = 0 ORDER BY created_at DESC").fetchall()
     db.close()
     return jsonify([dict(r) for r in rows])
 
-@app.route("/api/alerts/<int:id>/read", methods=["PUT"])
+@api.route("/api/alerts/rules", methods=["GET"])
+@require_auth
+@require_role("admin")
+def alert_rule_stats():
+    if alert_engine is None:
+        return jsonify({"error": "Alert engine not started"}), 503
+    return jsonify(alert_engine.get_stats())
+
+@api.route("/api/alerts/<int:id>/read", methods=["PUT"])
 def mark_alert_read(id):
     db = get_db()
     db.execute("UPDATE alerts SET read = 1 WHERE id = ?", (id,))
@@ -177,7 +328,7 @@ def mark_alert_read(id):
     db.close()
     return jsonify({"success": True})
 
-@app.route("/api/alerts/<int:id>", methods=["DELETE"])
+@api.route("/api/alerts/<int:id>", methods=["DELETE"])
 def dismiss_alert(id):
     db = get_db()
     db.execute("DELETE FROM alerts WHERE id = ?", (id,))
@@ -185,127 +336,454 @@ def dismiss_alert(id):
     db.close()
     return jsonify({"success": True})
 
-@app.route("/api/settings", methods=["GET"])
-def get_settings():
+# --- Exports & Stats ---
+VIOLATION_EXPORT_COLUMNS = [
+    "id", "date", "time", "worker", "worker_id", "type", "severity", "zone", "camera_id",
+    "status", "started_at", "ended_at", "duration", "snapshot", "clip", "created_at"
+]
+WORKER_EXPORT_COLUMNS = ["id", "name", "role", "site", "compliance", "last_seen", "created_at"]
+
+def export_filters(camera_column=None):
+    """
+    SQL WHERE clause and params for ?from=YYYY-MM-DD&to=YYYY-MM-DD (inclusive,
+    on created_at) and ?camera=cam01,cam02. Raises ValueError on a bad date.
+    """
+    clauses, params = [], []
+    start, end = request.args.get("from"), request.args.get("to")
+    if start:
+        datetime.strptime(start, "%Y-%m-%d")
+        clauses.append("created_at >= ?")
+        params.append(start)
+    if end:
+        datetime.strptime(end, "%Y-%m-%d")
+        clauses.append("created_at < date(?, '+1 day')")
+        params.append(end)
+    cameras = [c for c in request.args.get("camera", "").split(",") if c]
+    if cameras and camera_column:
+        clauses.append(f"{camera_column} IN ({', '.join('?' * len(cameras))})")
+        params.extend(cameras)
+    return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+def export_response(name, table, columns, camera_column=None):
+    """Stream a table as CSV (default) or ?format=ndjson, gzipped if the client accepts it."""
+    fmt = request.args.get("format", "csv")
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({"error": f"Unknown format. Use one of: {', '.join(EXPORT_FORMATS)}"}), 400
+    try:
+        where, params = export_filters(camera_column)
+    except ValueError:
+        return jsonify({"error": "Dates must be YYYY-MM-DD"}), 400
+
+    compress = bool(request.accept_encodings["gzip"])
+    sql = f"SELECT {', '.join(columns)} FROM {table}{where} ORDER BY created_at DESC"
+    chunks = stream_export(DB_PATH, sql, params, columns, fmt, compress)
+    headers = {
+        "Content-Disposition": f'attachment; filename="safeguard-{name}-{datetime.now():%Y-%m-%d}.{fmt}"',
+        "Vary": "Accept-Encoding"
+    }
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+    return Response(chunks, mimetype=EXPORT_FORMATS[fmt], headers=headers)
+
+@api.route("/api/export/violations", methods=["GET"])
+def export_violations():
+    return export_response("violations", "violations", VIOLATION_EXPORT_COLUMNS, camera_column="camera_id")
+
+@api.route("/api/export/workers", methods=["GET"])
+def export_workers():
+    return export_response("workers", "workers", WORKER_EXPORT_COLUMNS)
+
+@api.route("/api/stats", methods=["GET"])
+def get_stats():
+    """Violation counts (same filters as the exports) and worker totals, aggregated in SQL."""
+    try:
+        where, params = export_filters("camera_id")
+    except ValueError:
+        return jsonify({"error": "Dates must be YYYY-MM-DD"}), 400
+
     db = get_db()
-    row = db.execute("SELECT value FROM settings WHERE key='app_config'").fetchone()
-    db.close()
-    if row:
-        return jsonify(json.loads(row[0]))
-    return jsonify({})
+    try:
+        def grouped(expr, table="violations", where=where, params=params):
+            rows = db.execute(f"SELECT {expr}, COUNT(*) FROM {table}{where} GROUP BY {expr}", params)
+            return {(r[0] if r[0] is not None else "Unknown"): r[1] for r in rows}
+
+        total, avg_duration = db.execute(
+            f"SELECT COUNT(*), AVG(duration) FROM violations{where}", params
+        ).fetchone()
+        body = {
+            "violations": {
+                "total": total,
+                "avg_duration": round(avg_duration, 1) if avg_duration is not None else None,
+                "by_status": grouped("status"),
+                "by_severity": grouped("severity"),
+                "by_type": grouped("type"),
+                "by_camera": grouped("camera_id"),
+                "by_day": grouped("date(created_at)")
+            },
+            "workers": {
+                "total": db.execute("SELECT COUNT(*) FROM workers").fetchone()[0],
+                "by_compliance": grouped("compliance", "workers", "", [])
+            }
+        }
+    finally:
+        db.close()
+    return jsonify(body)
+
+@api.route("/api/settings", methods=["GET"])
+def get_settings():
+    # Served from memory; clients revalidate with If-None-Match
+    _, body, etag, version = settings.get()
+    if request.if_none_match.contains(etag):
+        resp = Response(status=304)
+    else:
+        resp = Response(body, mimetype="application/json")
+    resp.set_etag(etag)
+    resp.headers["X-Settings-Version"] = str(version)
+    return resp
 
-@app.route("/api/settings", methods=["PUT"])
+@api.route("/api/settings", methods=["PUT"])
 @require_auth
 @require_role("admin")
 def save_settings():
     data = request.json
-    db = get_db()
-    db.execute("INSERT OR REPLACE INTO settings (key, value) VALUES ('app_config', ?)", (json.dumps(data),))
-    db.commit()
-    db.close()
-    return jsonify({"success": True})
-
-@app.route("/api/detect", methods=["POST"])
-def detect_ppe():
-    if "image" not in request.files:
-        return jsonify({"error": "No image uploaded"}), 400
-    
-    file = request.files["image"]
-    filename = f"detect_{int(time.time())}.jpg"
-    filepath = os.path.join(UPLOAD_FOLDER, filename)
-    file.save(filepath)
-    
-    img = cv2.imread(filepath)
-    detections = detector.detect(img)
-    
-    compliance = "Compliant"
+    if not isinstance(data, dict):
+        return jsonify({"error": "Settings must be a JSON object"}), 400
+    try:
+        parse_processor_settings(data)
+        parse_color_settings(data)
+        parse_alert_rules(data.get("alertRules"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    version = settings.update(data)
+    return jsonify({"success": True, "version": version})
+
+@api.route("/api/settings/reload", methods=["POST"])
+@require_auth
+@require_role("admin")
+def reload_settings():
+    # Pick up changes written straight to the DB by the offline scripts
+    version = settings.reload()
+    return jsonify({"success": True, "version": version})
+
+def decode_image(data):
+    """Decode uploaded image bytes in memory. Returns None if they aren't an image."""
+    buf = np.frombuffer(data, dtype=np.uint8)
+    if buf.size == 0:
+        return None
+    return cv2.imdecode(buf, cv2.IMREAD_COLOR)
+
+def summarize_detections(detections):
     violations_count = sum(1 for d in detections if d["status"] == "Violation")
-    if violations_count > 0:
-        compliance = "Violation"
-        
-    return jsonify({
-        "compliance_status": compliance,
+    return {
+        "compliance_status": "Violation" if violations_count > 0 else "Compliant",
         "detections": detections,
         "total_persons": len(detections)
-    })
+    }
+
+def read_batch_uploads():
+    """Collect (name, bytes) pairs from multipart `images` fields and zip archives."""
+    uploads = []
+    files = request.files.getlist("images") + request.files.getlist("image")
+    archives = request.files.getlist("archive")
+    if request.mimetype in ("application/zip", "application/x-zip-compressed"):
+        archives.append(io.BytesIO(request.get_data()))
+
+    for f in files:
+        uploads.append((f.filename, f.read()))
+    for archive in archives:
+        with zipfile.ZipFile(archive) as zf:
+            members = [m for m in zf.infolist() if not m.is_dir()]
+            if sum(m.file_size for m in members) > MAX_DETECT_ARCHIVE_BYTES:
+                raise ValueError("Archive is too large")
+            for m in members[:MAX_DETECT_IMAGES + 1]:
+                uploads.append((m.filename, zf.read(m)))
+    return uploads
+
+@api.route("/api/detect", methods=["POST"])
+def detect_ppe():
+    if "image" not in request.files:
+        return jsonify({"error": "No image uploaded"}), 400
 
-@app.route('/snapshots/<path:filename>')
+    if inference is None:
+        return jsonify({"error": "Model is still loading"}), 503
+
+    img = decode_image(request.files["image"].read())
+    if img is None:
+        return jsonify({"error": "Could not decode image"}), 400
+
+    detections = inference.detect(img)
+    return jsonify(summarize_detections(detections))
+
+@api.route("/api/detect/batch", methods=["POST"])
+def detect_ppe_batch():
+    """
+    Detect PPE on many images in one call. Accepts several `images` files,
+    a zip `archive`, or a raw application/zip body. With ?stream=1 results
+    are sent as NDJSON lines in completion order.
+    """
+    if inference is None:
+        return jsonify({"error": "Model is still loading"}), 503
+
+    try:
+        uploads = read_batch_uploads()
+    except (zipfile.BadZipFile, ValueError) as e:
+        return jsonify({"error": f"Invalid archive: {e}"}), 400
+    if not uploads:
+        return jsonify({"error": "No images uploaded"}), 400
+    if len(uploads) > MAX_DETECT_IMAGES:
+        return jsonify({"error": f"At most {MAX_DETECT_IMAGES} images per batch"}), 413
+
+    results = [None] * len(uploads)
+    futures = {}
+    for index, (name, data) in enumerate(uploads):
+        img = decode_image(data)
+        if img is None:
+            results[index] = {"index": index, "name": name, "error": "Could not decode image"}
+            continue
+        futures[inference.submit(img)] = (index, name)
+    del uploads
+
+    def result_for(future):
+        index, name = futures[future]
+        try:
+            return {"index": index, "name": name, **summarize_detections(future.result())}
+        except Exception as e:
+            return {"index": index, "name": name, "error": str(e)}
+
+    if request.args.get("stream"):
+        def generate():
+            for r in results:
+                if r is not None:
+                    yield json.dumps(r) + "\n"
+            for future in as_completed(futures):
+                yield json.dumps(result_for(future)) + "\n"
+        return Response(generate(), mimetype="application/x-ndjson")
+
+    for future in futures:
+        r = result_for(future)
+        results[r["index"]] = r
+    return jsonify({"results": results, "total_images": len(results)})
+
+@api.route('/snapshots/<path:filename>')
 def serve_snapshot(filename):
     return send_from_directory(SNAPSHOT_FOLDER, filename)
 
-@app.route('/video_feed/<cam_id>')
+@api.route('/clips/<path:filename>')
+def serve_clip(filename):
+    return send_from_directory(CLIP_FOLDER, filename)
+
+@api.route("/api/cameras", methods=["GET"])
+def get_cameras():
+    # Live stats per camera, including per-zone compliance
+    return jsonify({
+        cam_id: {**p.config.to_dict(), "stats": p.get_stats()}
+        for cam_id, p in processors.items()
+    })
+
+@api.route("/api/cameras/<cam_id>/pause", methods=["POST"])
+@require_auth
+@require_role("admin", "staff")
+def pause_camera(cam_id):
+    if cam_id not in processors:
+        return jsonify({"error": "Camera not found or inactive"}), 404
+    processors[cam_id].pause()
+    return jsonify({"success": True})
+
+@api.route("/api/cameras/<cam_id>/resume", methods=["POST"])
+@require_auth
+@require_role("admin", "staff")
+def resume_camera(cam_id):
+    if cam_id not in processors:
+        return jsonify({"error": "Camera not found or inactive"}), 404
+    processors[cam_id].resume()
+    return jsonify({"success": True})
+
+def mjpeg_part(jpeg):
+    return (b'--frame\r\n'
+            b'Content-Type: image/jpeg\r\n\r\n' + jpeg + b'\r\n')
+
+@api.route('/video_feed/grid')
+def video_feed_grid():
+    """One stream tiling many cameras: ?cams=cam01,cam02&cols=4&tile=thumb&fps=5"""
+    cam_ids = [c for c in request.args.get("cams", "").split(",") if c] or sorted(processors)
+    unknown = [c for c in cam_ids if c not in processors]
+    if unknown:
+        return jsonify({"error": f"Camera not found or inactive: {', '.join(unknown)}"}), 404
+    variant = request.args.get("tile", "thumb")
+    if variant not in VARIANTS:
+        return jsonify({"error": f"Unknown tile size. Use one of: {', '.join(VARIANTS)}"}), 400
+    cols = request.args.get("cols", 4, type=int)
+    fps = request.args.get("fps", 5, type=float)
+    grid = streams.grid(cam_ids, cols, variant, fps)
+
+    def generate():
+        streams.add_grid_viewer(grid)
+        try:
+            seq = 0
+            while True:
+                seq, jpeg = grid.get(seq)
+                yield mjpeg_part(jpeg)
+        finally:
+            streams.add_grid_viewer(grid, -1)
+
+    return Response(generate(), mimetype='multipart/x-mixed-replace; boundary=frame')
+
+@api.route('/video_feed/<cam_id>')
 def video_feed(cam_id):
     if cam_id not in processors:
         return jsonify({"error": "Camera not found or inactive"}), 404
+    variant = request.args.get("variant", DEFAULT_VARIANT)
+    if variant not in VARIANTS:
+        return jsonify({"error": f"Unknown variant. Use one of: {', '.join(VARIANTS)}"}), 400
+    encoder = streams.encoder(cam_id)
         
     def generate():
-        processor = processors[cam_id]
+        version = 0
         while True:
-            frame = processor.get_frame()
-            if frame is None:
-                time.sleep(0.01)
+            # Only frames this client hasn't seen yet, encoded once per variant for all clients
+            latest = encoder.get(variant, version, timeout=1.0)
+            if latest is None:
                 continue
-                
-            ret, buffer = cv2.imencode('.jpg', frame)
-            if not ret:
-                continue
-                
-            yield (b'--frame\r\n'
-                   b'Content-Type: image/jpeg\r\n\r\n' + buffer.tobytes() + b'\r\n')
+            version, jpeg = latest
+            yield mjpeg_part(jpeg)
 
     return Response(generate(), mimetype='multipart/x-mixed-replace; boundary=frame')
 
+def sse_event(event):
+    return f"event: {event['topic']}\ndata: {json.dumps(event)}\n\n"
+
+@api.route('/api/events')
+def event_stream():
+    """Server-sent events: violation.opened, violation.closed and metrics."""
+    topics = set(filter(None, request.args.get("topics", "").split(",")))
+    q = bus.subscribe_queue()
+
+    def generate():
+        try:
+            while True:
+                try:
+                    event = q.get(timeout=15)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                if not topics or event["topic"] in topics:
+                    yield sse_event(event)
+        finally:
+            q.close()
+
+    return Response(generate(), mimetype="text/event-stream", headers={"Cache-Control": "no-cache"})
+
 # --- Background Processing Simulation ---
 # In a real app, this would process the camera stream.
 # Here we simulate real-time metrics for the dashboard.
+def delete_media_file(url, prefix, folder):
+    """Delete the file behind a media URL (e.g. http://localhost:5000/snapshots/vio_cam01_123.jpg)."""
+    try:
+        if url and prefix in url:
+            filename = url.split(prefix)[-1]
+            filepath = os.path.join(folder, filename)
+            if os.path.exists(filepath):
+                os.remove(filepath)
+                print(f"Deleted old media file: {filename}")
+    except Exception as err:
+        print(f"Error deleting media file: {err}")
+
 def background_metrics_updater():
     while True:
+        db = None
         try:
             db = get_db()
             # Randomly fluctuate metrics slightly for a "live" feel
             
-            for cam_id in ["cam01", "cam02", "cam03"]:
-                proc = processors.get(cam_id)
-                if proc:
-                    stats = proc.get_stats()
-                    
-                    db.execute(
-                        "INSERT INTO metrics_log (camera_id, total_tracked, active_violations, compliance_rate, fps) VALUES (?, ?, ?, ?, ?)",
-                        (cam_id, stats["total_tracked"], stats["active_violations"], stats["compliance_rate"], stats["fps"])
-                    )
+            for cam_id, proc in list(processors.items()):
+                stats = proc.get_stats()
+                bus.publish("metrics", {"camera_id": cam_id, **stats})
+
+                db.execute(
+                    "INSERT INTO metrics_log (camera_id, total_tracked, active_violations, compliance_rate, fps) VALUES (?, ?, ?, ?, ?)",
+                    (cam_id, stats["total_tracked"], stats["active_violations"], stats["compliance_rate"], stats["fps"])
+                )
 
             # Keep log small
             db.execute("DELETE FROM metrics_log WHERE id NOT IN (SELECT id FROM metrics_log ORDER BY created_at DESC LIMIT 50)")
             
-            # --- Cleanup Old Snapshots (Keep Max 10) ---
+            # --- Cleanup Old Snapshots & Clips (Keep Max 10) ---
             # Get IDs of old violations
-            old_violations = db.execute("SELECT id, snapshot FROM violations WHERE id NOT IN (SELECT id FROM violations ORDER BY created_at DESC LIMIT 10)").fetchall()
+            old_violations = db.execute("SELECT id, snapshot, clip FROM violations WHERE id NOT IN (SELECT id FROM violations ORDER BY created_at DESC LIMIT 10)").fetchall()
             
             if old_violations:
                 # Delete files
                 for vio in old_violations:
-                    try:
-                        # Extract filename from URL (e.g. http://localhost:5000/snapshots/vio_cam01_123.jpg)
-                        if vio["snapshot"] and "/snapshots/" in vio["snapshot"]:
-                            filename = vio["snapshot"].split("/snapshots/")[-1]
-                            filepath = os.path.join(SNAPSHOT_FOLDER, filename)
-                            if os.path.exists(filepath):
-                                os.remove(filepath)
-                                print(f"Deleted old snapshot: {filename}")
-                    except Exception as err:
-                        print(f"Error deleting snapshot file: {err}")
+                    delete_media_file(vio["snapshot"], "/snapshots/", SNAPSHOT_FOLDER)
+                    delete_media_file(vio["clip"], "/clips/", CLIP_FOLDER)
                 
                 # Delete DB rows
                 db.execute("DELETE FROM violations WHERE id NOT IN (SELECT id FROM violations ORDER BY created_at DESC LIMIT 10)")
                 print(f"Cleaned up {len(old_violations)} old violations")
 
             db.commit()
-            db.close()
         except Exception as e:
             print(f"Metrics Thread Error: {e}")
+        finally:
+            # Closing also rolls back a failed write, so it can't hold the database lock
+            if db is not None:
+                db.close()
         time.sleep(2)
 
-threading.Thread(target=background_metrics_updater, daemon=True).start()
+# --- Application Factory ---
+_background_started = False
+
+def start_background(**overrides):
+    """
+    Load Firebase, the model and the cameras in parallel, off the request path.
+    A phase can be replaced by keyword, e.g. start_background(model=load_fake_model).
+    """
+    global _background_started
+    if _background_started:
+        return
+    _background_started = True
+    # Before any phase or thread touches the database
+    init_db()
+
+    phases = {
+        "firebase": init_firebase,
+        "model": load_model,
+        "cameras": open_cameras
+    }
+    phases.update(overrides)
+    startup.run_parallel(phases)
+    start_alert_engine()
+    threading.Thread(target=background_metrics_updater, name="metrics", daemon=True).start()
+
+def start_alert_engine():
+    global alert_engine
+    alert_engine = AlertEngine(DB_PATH)
+    settings.subscribe(alert_engine.apply_settings)
+    alert_engine.start()
+
+def init_db():
+    """Bring an existing database up to date before any request is served."""
+    try:
+        db = get_db()
+        try:
+            # Violation rows written by the cameras need the event/clip columns
+            ensure_violation_columns(db)
+            ensure_export_indexes(db)
+            ensure_alert_columns(db)
+        finally:
+            db.close()
+    except Exception as e:
+        print(f"Database schema update failed: {e}")
+
+def create_app(start_background_tasks=True):
+    init_db()
+    app = Flask(__name__)
+    CORS(app)
+    app.register_blueprint(api)
+    if start_background_tasks:
+        start_background()
+    return app
 
 if __name__ == "__main__":
+    app = create_app()
     app.run(host="0.0.0.0", port=5000, debug=False)
@@ -0,0 +1,371 @@
+"""
+SafeGuard AI — Async Serving Mode
+==================================
+ASGI entry point for many concurrent viewers. The MJPEG feeds and the
+/api/events stream are served by asyncio coroutines instead of one
+blocked thread per client; every other route (REST API, uploads,
+snapshots) is handed to the regular Flask app on a small thread pool.
+
+Each (camera, variant) stream has one broadcaster that pulls the latest
+shared JPEG from the StreamHub while anyone is watching and wakes all of
+its viewers at once. Viewers never queue frames: a client whose socket
+is slow simply awaits its own send and skips to the newest frame when it
+is ready again, without holding up anyone else.
+
+Usage:
+    python asgi_app.py --port 5000
+    uvicorn asgi_app:create_asgi_app --factory --host 0.0.0.0 --port 5000
+"""
+
+import io
+import sys
+import json
+import asyncio
+import argparse
+from urllib.parse import parse_qs, unquote
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import jsonify
+
+import app as backend
+from event_bus import bus
+from stream_hub import VARIANTS, DEFAULT_VARIANT
+
+KEEPALIVE_SECONDS = 15
+BRIDGE_THREADS = 32     # Threads for Flask routes
+PRODUCER_THREADS = 64   # Threads blocked waiting for new frames, one per active stream
+
+CORS_HEADER = (b"access-control-allow-origin", b"*")
+
+
+class FrameBroadcast:
+    """Latest MJPEG part of one stream, shared by all of its async viewers."""
+
+    def __init__(self, source, fetch, executor):
+        self.source = source  # StreamEncoder or GridStream this broadcast reads from
+        self.fetch = fetch    # fetch(after_seq) -> (seq, jpeg) or None; blocking
+        self.executor = executor
+        self.seq = 0
+        self.part = None
+        self.viewers = 0
+        self.frames = 0
+        self._changed = None
+        self._task = None
+
+    def add_viewer(self):
+        self.viewers += 1
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._produce())
+
+    def remove_viewer(self):
+        self.viewers -= 1
+
+    async def next(self, after_seq):
+        """Wait for a frame newer than after_seq. Returns (seq, mjpeg part)."""
+        while self.seq <= after_seq:
+            if self._changed is None:
+                self._changed = asyncio.get_running_loop().create_future()
+            await asyncio.shield(self._changed)
+        return self.seq, self.part
+
+    async def _produce(self):
+        loop = asyncio.get_running_loop()
+        try:
+            while self.viewers > 0:
+                latest = await loop.run_in_executor(self.executor, self.fetch, self.seq)
+                if latest is None:
+                    continue
+                self.seq, jpeg = latest
+                self.part = backend.mjpeg_part(jpeg)
+                self.frames += 1
+                changed, self._changed = self._changed, None
+                if changed is not None:
+                    changed.set_result(None)
+        except Exception as e:
+            print(f"Stream producer stopped: {e}")
+            if self._changed is not None:
+                self._changed.set_exception(e)
+                self._changed = None
+
+
+class StreamingApp:
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.bridge = ThreadPoolExecutor(BRIDGE_THREADS, thread_name_prefix="wsgi")
+        self.producers = ThreadPoolExecutor(PRODUCER_THREADS, thread_name_prefix="stream")
+        self._broadcasts = {}
+        flask_app.add_url_rule("/api/streams", "async_streams", lambda: jsonify(self.get_stats()))
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await self._lifespan(receive, send)
+        if scope["type"] != "http":
+            return
+
+        path = scope["path"]
+        args = {k: v[-1] for k, v in parse_qs(scope["query_string"].decode()).items()}
+        if path == "/video_feed/grid":
+            await self._grid(args, receive, send)
+        elif path.startswith("/video_feed/") and path.count("/") == 2:
+            await self._camera(unquote(path[len("/video_feed/"):]), args, scope, receive, send)
+        elif path == "/api/events":
+            await self._events(args, receive, send)
+        else:
+            await self._wsgi(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.bridge.shutdown(wait=False)
+                self.producers.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    # --- MJPEG ---
+    def _broadcast(self, key, source, fetch):
+        """Shared broadcast for a stream, replaced if its source was recreated."""
+        broadcast = self._broadcasts.get(key)
+        if broadcast is None or broadcast.source is not source:
+            for old_key in [k for k, b in self._broadcasts.items() if b.viewers == 0]:
+                del self._broadcasts[old_key]
+            broadcast = self._broadcasts[key] = FrameBroadcast(source, fetch, self.producers)
+        return broadcast
+
+    async def _camera(self, cam_id, args, scope, receive, send):
+        if cam_id not in backend.processors:
+            # Flask answers: 404, or a redirect to the node running it (cluster.py)
+            return await self._wsgi(scope, receive, send)
+        variant = args.get("variant", DEFAULT_VARIANT)
+        if variant not in VARIANTS:
+            return await send_json(send, 400, {"error": f"Unknown variant. Use one of: {', '.join(VARIANTS)}"})
+        encoder = backend.streams.encoder(cam_id)
+        broadcast = self._broadcast(
+            (cam_id, variant), encoder, lambda seq: encoder.get(variant, seq, timeout=1.0)
+        )
+        await self._mjpeg(broadcast, args, receive, send)
+
+    async def _grid(self, args, receive, send):
+        cam_ids = [c for c in args.get("cams", "").split(",") if c] or sorted(backend.processors)
+        unknown = [c for c in cam_ids if c not in backend.processors]
+        if unknown:
+            return await send_json(send, 404, {"error": f"Camera not found or inactive: {', '.join(unknown)}"})
+        variant = args.get("tile", "thumb")
+        if variant not in VARIANTS:
+            return await send_json(send, 400, {"error": f"Unknown tile size. Use one of: {', '.join(VARIANTS)}"})
+        try:
+            cols, fps = int(args.get("cols", 4)), float(args.get("fps", 5))
+        except ValueError:
+            return await send_json(send, 400, {"error": "cols and fps must be numbers"})
+        grid = backend.streams.grid(cam_ids, cols, variant, fps)
+        broadcast = self._broadcast(("grid", ",".join(grid.cam_ids), cols, variant, fps), grid, grid.get)
+        await self._mjpeg(broadcast, args, receive, send, grid)
+
+    async def _mjpeg(self, broadcast, args, receive, send, grid=None):
+        """Stream frames until the client disconnects. ?fps= caps this viewer's rate."""
+        try:
+            min_interval = 1.0 / float(args["fps"]) if "fps" in args and grid is None else 0.0
+        except (ValueError, ZeroDivisionError):
+            min_interval = 0.0
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"multipart/x-mixed-replace; boundary=frame"),
+                        (b"cache-control", b"no-cache"), CORS_HEADER]
+        })
+
+        async def deliver():
+            loop = asyncio.get_running_loop()
+            seq = 0
+            while True:
+                seq, part = await broadcast.next(seq)
+                sent_at = loop.time()
+                # Waits only on this client's socket; frames published meanwhile are skipped
+                await send({"type": "http.response.body", "body": part, "more_body": True})
+                if min_interval:
+                    await asyncio.sleep(max(0.0, sent_at + min_interval - loop.time()))
+
+        broadcast.add_viewer()
+        if grid is not None:
+            backend.streams.add_grid_viewer(grid)
+        try:
+            await until_disconnect(receive, deliver())
+        finally:
+            broadcast.remove_viewer()
+            if grid is not None:
+                backend.streams.add_grid_viewer(grid, -1)
+
+    # --- Server-sent events ---
+    async def _events(self, args, receive, send):
+        topics = set(filter(None, args.get("topics", "").split(",")))
+        loop = asyncio.get_running_loop()
+        wake = asyncio.Event()
+        q = bus.subscribe_queue(notify=lambda: loop.call_soon_threadsafe(wake.set))
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"text/event-stream"), (b"cache-control", b"no-cache"), CORS_HEADER]
+        })
+
+        async def deliver():
+            while True:
+                try:
+                    await asyncio.wait_for(wake.wait(), KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    await send({"type": "http.response.body", "body": b": keep-alive\n\n", "more_body": True})
+                    continue
+                wake.clear()
+                chunks = []
+                while not q.empty():
+                    event = q.get_nowait()
+                    if not topics or event["topic"] in topics:
+                        chunks.append(backend.sse_event(event))
+                if chunks:
+                    await send({"type": "http.response.body", "body": "".join(chunks).encode(), "more_body": True})
+
+        try:
+            await until_disconnect(receive, deliver())
+        finally:
+            q.close()
+
+    # --- Everything else: the Flask app ---
+    async def _wsgi(self, scope, receive, send):
+        body = io.BytesIO()
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            body.write(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+        body.seek(0)
+
+        loop = asyncio.get_running_loop()
+        environ = wsgi_environ(scope, body)
+        status, headers, chunks = await loop.run_in_executor(self.bridge, self._call_wsgi, environ)
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        try:
+            while True:
+                chunk = await loop.run_in_executor(self.bridge, next, chunks, None)
+                if chunk is None:
+                    break
+                if chunk:
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        finally:
+            close = getattr(chunks, "close", None)
+            if close:
+                await loop.run_in_executor(self.bridge, close)
+        await send({"type": "http.response.body", "body": b""})
+
+    def _call_wsgi(self, environ):
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response["status"] = int(status.split(" ", 1)[0])
+            response["headers"] = [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers]
+
+        result = self.flask_app(environ, start_response)
+        chunks = iter(result)
+        if hasattr(result, "close"):
+            chunks = _ClosingIterator(chunks, result.close)
+        return response["status"], response["headers"], chunks
+
+    def get_stats(self):
+        return {
+            "streams": [
+                {"stream": "/".join(map(str, key)), "viewers": b.viewers, "frames": b.frames}
+                for key, b in self._broadcasts.items() if b.viewers
+            ],
+            "events": bus.get_stats()
+        }
+
+
+class _ClosingIterator:
+    def __init__(self, chunks, close):
+        self._chunks = chunks
+        self.close = close
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._chunks)
+
+
+async def until_disconnect(receive, coro):
+    """Run coro until it finishes or the client goes away, whichever is first."""
+    task = asyncio.ensure_future(coro)
+
+    async def watch():
+        while (await receive())["type"] != "http.disconnect":
+            pass
+
+    watcher = asyncio.ensure_future(watch())
+    try:
+        await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for t in (task, watcher):
+            t.cancel()
+        await asyncio.gather(task, watcher, return_exceptions=True)
+
+
+async def send_json(send, status, payload):
+    body = json.dumps(payload).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()), CORS_HEADER]
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+def wsgi_environ(scope, body):
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", ""),
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope["query_string"].decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": client[0],
+        "REMOTE_PORT": str(client[1]),
+        "CONTENT_LENGTH": str(body.getbuffer().nbytes),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": body,
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+    for name, value in scope["headers"]:
+        name = name.decode("latin-1").upper().replace("-", "_")
+        value = value.decode("latin-1")
+        if name == "CONTENT_TYPE":
+            environ["CONTENT_TYPE"] = value
+        elif name != "CONTENT_LENGTH":
+            key = f"HTTP_{name}"
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+def create_asgi_app():
+    """Build the Flask app (starting its background phases) and wrap it for ASGI."""
+    return StreamingApp(backend.create_app())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve SafeGuard AI with asyncio streaming")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5000)
+    args = parser.parse_args()
+    try:
+        import uvicorn
+    except ImportError:
+        sys.exit("uvicorn is required for the async server: pip install uvicorn")
+    uvicorn.run(create_asgi_app(), host=args.host, port=args.port, backlog=4096, log_level="warning")
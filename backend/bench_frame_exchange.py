@@ -0,0 +1,116 @@
+"""
+Benchmark: frame handoff between a camera thread and stream readers.
+
+Compares the old copy-under-lock handoff (frame.copy() before
+annotating, get_frame() copy per reader poll) with FrameExchange, and
+reports time per frame plus how much memory is allocated in steady
+state, measured with tracemalloc after a warm-up.
+
+Usage:
+    python bench_frame_exchange.py --frames 500 --readers 8
+"""
+
+import time
+import argparse
+import threading
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from frame_exchange import FrameExchange
+
+SHAPE = (360, 640, 3)
+
+
+def run_copy(raw, frames, readers, _ctx):
+    lock = threading.Lock()
+    state = {"frame": None, "version": 0}
+    stop = threading.Event()
+
+    def reader():
+        seen = 0
+        while not stop.is_set():
+            with lock:
+                if state["frame"] is None or state["version"] == seen:
+                    frame = None
+                else:
+                    frame, seen = state["frame"].copy(), state["version"]
+            if frame is None:
+                time.sleep(0.0005)
+                continue
+            frame.mean(axis=(0, 1))
+
+    threads = [threading.Thread(target=reader, daemon=True) for _ in range(readers)]
+    for t in threads:
+        t.start()
+    for _ in range(frames):
+        frame = cv2.resize(raw, (SHAPE[1], SHAPE[0]))
+        annotated = frame.copy()
+        with lock:
+            state["frame"] = annotated
+            state["version"] += 1
+    stop.set()
+    for t in threads:
+        t.join()
+    return {}
+
+
+def run_exchange(raw, frames, readers, exchange):
+    stop = threading.Event()
+    allocations = exchange.allocations
+
+    def reader():
+        seen = 0
+        while not stop.is_set():
+            ref = exchange.wait_newer(seen, timeout=0.05)
+            if ref is None:
+                continue
+            with ref:
+                seen = ref.version
+                ref.array.mean(axis=(0, 1))
+
+    threads = [threading.Thread(target=reader, daemon=True) for _ in range(readers)]
+    for t in threads:
+        t.start()
+    for _ in range(frames):
+        slot = exchange.acquire()
+        cv2.resize(raw, (SHAPE[1], SHAPE[0]), dst=slot.array)
+        exchange.publish(slot)
+    stop.set()
+    for t in threads:
+        t.join()
+    stats = exchange.get_stats()
+    stats["new_buffers"] = exchange.allocations - allocations
+    return stats
+
+
+def measure(name, fn, raw, frames, readers, ctx=None):
+    fn(raw, max(10, frames // 10), readers, ctx)  # Warm-up
+    tracemalloc.start()
+    base, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    extra = fn(raw, frames, readers, ctx)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:<10} {elapsed / frames * 1000:7.3f} ms/frame   "
+          f"steady-state peak +{(peak - base) / 1024:9.1f} KiB   {extra}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark frame handoff allocation and latency.")
+    parser.add_argument("--frames", type=int, default=500)
+    parser.add_argument("--readers", type=int, default=8)
+    args = parser.parse_args()
+
+    raw = np.random.randint(0, 255, (720, 1280, 3), dtype=np.uint8)
+    print(f"{args.frames} frames, {args.readers} readers, frame {SHAPE[1]}x{SHAPE[0]} "
+          f"({np.prod(SHAPE) / 1024:.0f} KiB)")
+    measure("copy", run_copy, raw, args.frames, args.readers)
+    measure("exchange", run_exchange, raw, args.frames, args.readers, FrameExchange(SHAPE))
+
+
+if __name__ == "__main__":
+    main()
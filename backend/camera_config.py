@@ -0,0 +1,167 @@
+"""
+SafeGuard AI — Camera Configuration
+====================================
+Per-camera settings: frame size, YOLO inference size and polygon zones.
+Detection only runs on the bounding box of a camera's zones (with the
+area outside the polygons blacked out), and every detection is tagged
+with the zone its feet are in.
+
+Optional backend/cameras.json overrides the built-in camera list:
+    {
+      "cam01": {
+        "source": "rtsp://...",
+        "name": "Assembly Line A",
+        "frame_size": [640, 360],
+        "inference_size": 480,
+        "zones": [
+          {"name": "Line A Floor", "polygon": [[0, 140], [640, 140], [640, 360], [0, 360]]}
+        ]
+      }
+    }
+Polygon points are in frame_size coordinates.
+"""
+
+import os
+import json
+import cv2
+import numpy as np
+
+DEFAULT_FRAME_SIZE = (640, 360)
+
+
+class Zone:
+    def __init__(self, name, polygon):
+        self.name = name
+        self.polygon = np.asarray(polygon, dtype=np.int32).reshape(-1, 2)
+
+    def contains(self, x, y):
+        return cv2.pointPolygonTest(self.polygon, (float(x), float(y)), False) >= 0
+
+
+class CameraConfig:
+    def __init__(self, camera_id, source, name=None, frame_size=DEFAULT_FRAME_SIZE,
+                 inference_size=None, zones=None):
+        self.camera_id = camera_id
+        self.source = source
+        self.name = name or camera_id
+        self.frame_size = (int(frame_size[0]), int(frame_size[1]))
+        self.inference_size = int(inference_size) if inference_size else None
+        self.zones = list(zones or [])
+
+    @property
+    def frame_shape(self):
+        w, h = self.frame_size
+        return (h, w, 3)
+
+    @classmethod
+    def from_dict(cls, camera_id, data):
+        """Build from a cameras.json entry, or from a bare source path."""
+        if isinstance(data, str):
+            return cls(camera_id, data)
+        zones = [Zone(z["name"], z["polygon"]) for z in data.get("zones", [])]
+        return cls(
+            camera_id, data["source"], name=data.get("name"),
+            frame_size=data.get("frame_size", DEFAULT_FRAME_SIZE),
+            inference_size=data.get("inference_size"), zones=zones
+        )
+
+    def to_dict(self):
+        return {
+            "source": self.source,
+            "name": self.name,
+            "frame_size": list(self.frame_size),
+            "inference_size": self.inference_size,
+            "zones": [{"name": z.name, "polygon": z.polygon.tolist()} for z in self.zones]
+        }
+
+
+def load_camera_configs(path, defaults):
+    """Read cameras.json if it exists, else fall back to the {cam_id: source} defaults."""
+    if os.path.exists(path):
+        with open(path) as f:
+            data = json.load(f)
+        print(f"Loaded camera configuration from {path}")
+    else:
+        data = defaults
+    return {cam_id: CameraConfig.from_dict(cam_id, entry) for cam_id, entry in data.items()}
+
+
+class RegionOfInterest:
+    """
+    Crops and masks frames down to a camera's zones before detection, then
+    maps the detections back to frame coordinates and assigns their zone.
+    With no zones configured the whole frame is a single zone named after
+    the camera.
+    """
+
+    def __init__(self, config):
+        fw, fh = config.frame_size
+        self.frame_size = (fw, fh)
+        self.zones = config.zones or [
+            Zone(config.name, [[0, 0], [fw, 0], [fw, fh], [0, fh]])
+        ]
+
+        points = np.concatenate([z.polygon for z in self.zones])
+        x, y, w, h = cv2.boundingRect(points)
+        x, y = max(x, 0), max(y, 0)
+        w, h = min(w, fw - x), min(h, fh - y)
+        self.rect = (x, y, w, h)
+
+        # Only mask when the polygons don't already fill their bounding box
+        self.mask = np.zeros((h, w), dtype=np.uint8)
+        for z in self.zones:
+            cv2.fillPoly(self.mask, [z.polygon - (x, y)], 255)
+        self.full = cv2.countNonZero(self.mask) == w * h
+        self._crop = np.empty((h, w, 3), dtype=np.uint8)
+
+    def prepare(self, frame):
+        """Masked crop of frame covering the zones. Reuses one buffer per camera."""
+        x, y, w, h = self.rect
+        region = frame[y:y + h, x:x + w]
+        if self.full:
+            np.copyto(self._crop, region)
+        else:
+            self._crop[:] = 0
+            cv2.copyTo(region, self.mask, self._crop)
+        return self._crop
+
+    def zone_for(self, bbox):
+        """Zone containing the bottom-center (feet) of a frame-space box, or None."""
+        bx, by, bw, bh = bbox
+        fw, fh = self.frame_size
+        # Boxes cut off by the frame edge have their feet on (or past) the border
+        fx = min(max(bx + bw / 2, 0), fw)
+        fy = min(max(by + bh, 0), fh)
+        for z in self.zones:
+            if z.contains(fx, fy):
+                return z.name
+        return None
+
+    def to_frame(self, detections):
+        """Shift crop-space detections into frame space and keep those inside a zone."""
+        x, y = self.rect[:2]
+        mapped = []
+        for d in detections:
+            bx, by, bw, bh = d["bbox"]
+            d["bbox"] = [bx + x, by + y, bw, bh]
+            d["zone"] = self.zone_for(d["bbox"])
+            if d["zone"] is not None:
+                mapped.append(d)
+        return mapped
+
+    def zone_stats(self, detections):
+        """Per-zone tracked/violation counts and compliance for the given detections."""
+        stats = {z.name: {"total_tracked": 0, "active_violations": 0} for z in self.zones}
+        for d in detections:
+            zone = stats.get(d.get("zone"))
+            if zone is None:
+                continue
+            zone["total_tracked"] += 1
+            if d["status"] == "Violation":
+                zone["active_violations"] += 1
+        for zone in stats.values():
+            tracked = zone["total_tracked"]
+            zone["compliance_rate"] = (
+                (tracked - zone["active_violations"]) / tracked * 100 if tracked else 100.0
+            )
+        return stats
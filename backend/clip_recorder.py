@@ -0,0 +1,167 @@
+"""
+SafeGuard AI — Violation Clip Recorder
+=======================================
+Keeps the last few seconds of a camera as JPEG-encoded frames in a ring
+buffer with a fixed byte budget. When a violation event opens, the
+frames from the previous `pre_seconds` are taken from the ring, frames
+keep being collected for `post_seconds`, and the finished clip is
+written to disk by a background thread, never on the capture thread.
+
+Memory per camera is bounded by byte_budget (ring) plus at most
+max_pending clips of (pre + post) seconds each.
+"""
+
+import os
+import queue
+import threading
+from collections import deque
+
+import cv2
+import numpy as np
+
+
+class EncodedRingBuffer:
+    """(timestamp, jpeg bytes) frames, oldest dropped first once over budget."""
+
+    def __init__(self, byte_budget, max_seconds):
+        self.byte_budget = byte_budget
+        self.max_seconds = max_seconds
+        self._frames = deque()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def append(self, timestamp, data):
+        with self._lock:
+            self._frames.append((timestamp, data))
+            self._bytes += len(data)
+            while self._frames and (
+                self._bytes > self.byte_budget or timestamp - self._frames[0][0] > self.max_seconds
+            ):
+                _, old = self._frames.popleft()
+                self._bytes -= len(old)
+
+    def since(self, timestamp):
+        with self._lock:
+            return [f for f in self._frames if f[0] >= timestamp]
+
+    @property
+    def nbytes(self):
+        return self._bytes
+
+    def __len__(self):
+        return len(self._frames)
+
+
+class _PendingClip:
+    __slots__ = ("filename", "end", "frames")
+
+    def __init__(self, filename, end, frames):
+        self.filename = filename
+        self.end = end
+        self.frames = frames
+
+
+class ClipRecorder:
+    def __init__(self, camera_id, clip_folder, pre_seconds=5.0, post_seconds=5.0, fps=5.0,
+                 byte_budget=8 * 1024 * 1024, quality=70, max_pending=4):
+        self.camera_id = camera_id
+        self.clip_folder = clip_folder
+        self.pre_seconds = pre_seconds
+        self.post_seconds = post_seconds
+        self.fps = fps
+        self.quality = quality
+        self.max_pending = max_pending
+        self.ring = EncodedRingBuffer(byte_budget, pre_seconds + 1.0)
+
+        self._pending = []
+        self._last_encoded = 0.0
+        self._encode_params = [int(cv2.IMWRITE_JPEG_QUALITY), quality]
+        self._write_queue = queue.Queue()
+        self._writer = None
+
+        # Stats
+        self.clips_written = 0
+        self.clips_dropped = 0
+
+    def add_frame(self, frame, now):
+        """Called from the capture thread with each published frame."""
+        if now - self._last_encoded < 1.0 / self.fps:
+            return
+        ok, buf = cv2.imencode(".jpg", frame, self._encode_params)
+        if not ok:
+            return
+        self._last_encoded = now
+        data = buf.tobytes()
+        self.ring.append(now, data)
+
+        if self._pending:
+            still_open = []
+            for clip in self._pending:
+                clip.frames.append((now, data))
+                if now >= clip.end:
+                    self._write_queue.put(clip)
+                else:
+                    still_open.append(clip)
+            self._pending = still_open
+
+    def capture(self, name, now):
+        """Start a clip around `now`. Returns its filename, or None if too many are pending."""
+        if len(self._pending) >= self.max_pending:
+            self.clips_dropped += 1
+            return None
+        if self._writer is None:
+            os.makedirs(self.clip_folder, exist_ok=True)
+            self._writer = threading.Thread(
+                target=self._write_loop, name=f"clips-{self.camera_id}", daemon=True
+            )
+            self._writer.start()
+
+        filename = f"clip_{name}.mp4"
+        frames = self.ring.since(now - self.pre_seconds)
+        self._pending.append(_PendingClip(filename, now + self.post_seconds, frames))
+        return filename
+
+    def flush(self):
+        """
+        Write every pending clip now with the frames it has so far, e.g. when
+        the camera pauses or stops and no more frames will arrive. Call from
+        the capture thread, like add_frame.
+        """
+        for clip in self._pending:
+            self._write_queue.put(clip)
+        self._pending = []
+
+    def _write_loop(self):
+        while True:
+            clip = self._write_queue.get()
+            try:
+                self._write(clip)
+                self.clips_written += 1
+            except Exception as e:
+                print(f"Error writing clip {clip.filename}: {e}")
+
+    def _write(self, clip):
+        if not clip.frames:
+            return
+        first = cv2.imdecode(np.frombuffer(clip.frames[0][1], dtype=np.uint8), cv2.IMREAD_COLOR)
+        h, w = first.shape[:2]
+        path = os.path.join(self.clip_folder, clip.filename)
+        tmp_path = path + ".tmp.mp4"
+        writer = cv2.VideoWriter(tmp_path, cv2.VideoWriter_fourcc(*"mp4v"), self.fps, (w, h))
+        try:
+            for _, data in clip.frames:
+                writer.write(cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR))
+        finally:
+            writer.release()
+        os.replace(tmp_path, path)
+        print(f"Saved violation clip: {clip.filename} ({len(clip.frames)} frames)")
+
+    def get_stats(self):
+        return {
+            "ring_frames": len(self.ring),
+            "ring_bytes": self.ring.nbytes,
+            "byte_budget": self.ring.byte_budget,
+            "pending_clips": len(self._pending),
+            "clips_written": self.clips_written,
+            "clips_dropped": self.clips_dropped
+        }
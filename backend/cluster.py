@@ -0,0 +1,498 @@
+"""
+SafeGuard AI — Camera Sharding
+===============================
+Spreads the camera registry over several backend nodes.
+
+The coordinator owns the registry (cameras.json) and assigns every camera
+to exactly one live node. Nodes send a heartbeat every HEARTBEAT_INTERVAL
+seconds with the stats of the cameras they run, get their assignment
+back, and start or stop processors to match it. A node that misses
+heartbeats for NODE_TIMEOUT seconds is dropped and its cameras go to the
+least loaded live nodes; a new node takes cameras over from the busiest
+nodes one at a time until the spread is even. If the coordinator is
+unreachable, nodes keep running the cameras they have.
+
+On the coordinator the dashboard API spans the cluster:
+    GET /api/metrics, /api/cameras       from the latest heartbeats
+    GET /api/violations                  merged from every node's database
+    PUT /api/violations/:id              sent to every node (the owner updates it)
+    POST /api/cameras/:id/pause|resume   forwarded to the camera's node
+    GET /video_feed/:id                  redirected (307) to the camera's node
+    GET /api/cluster                     nodes, assignment and rebalance count
+The coordinator checks the user's token and role itself and forwards
+requests with the cluster token and that uid and role (see
+firebase_auth.service_headers), so user tokens never leave it. Settings
+saved on the coordinator are pushed to nodes with the next heartbeat.
+
+SAFEGUARD_CLUSTER_TOKEN must be set to the same secret on every process:
+heartbeats and forwarded requests are only accepted with it.
+
+Usage (three local processes with synthetic cameras, fake auth and model):
+    export SAFEGUARD_CLUSTER_TOKEN=change-me
+    python cluster.py coordinator --port 5000 --offline --cameras 6
+    python cluster.py node --port 5101 --coordinator http://127.0.0.1:5000 --offline --db node1.db
+    python cluster.py node --port 5102 --coordinator http://127.0.0.1:5000 --offline --db node2.db
+"""
+
+import os
+import sys
+import hmac
+import json
+import time
+import socket
+import argparse
+import threading
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import request, jsonify, redirect, Response, g
+
+import app as backend
+from camera_config import CameraConfig, load_camera_configs
+from firebase_auth import (require_auth, require_role, set_service_token, service_headers,
+                           SERVICE_TOKEN_HEADER)
+
+HEARTBEAT_INTERVAL = 2.0
+NODE_TIMEOUT = 10.0
+FANOUT_TIMEOUT = 3.0
+CLUSTER_TOKEN = os.environ.get("SAFEGUARD_CLUSTER_TOKEN", "")
+
+
+def http_json(url, payload=None, method=None, headers=None, timeout=FANOUT_TIMEOUT):
+    """Send a JSON request. Returns (status, raw body); HTTP errors are returned, not raised."""
+    data = json.dumps(payload).encode() if payload is not None else None
+    req = urllib.request.Request(url, data=data, method=method or ("POST" if data is not None else "GET"))
+    req.add_header("Content-Type", "application/json")
+    for name, value in (headers or {}).items():
+        req.add_header(name, value)
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            return resp.status, resp.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+
+
+# ─── Coordinator ────────────────────────────────────────────
+
+class NodeInfo:
+    __slots__ = ("node_id", "url", "joined_at", "last_seen", "stats")
+
+    def __init__(self, node_id, url, now):
+        self.node_id = node_id
+        self.url = url
+        self.joined_at = now
+        self.last_seen = now
+        self.stats = {}  # cam_id -> VideoProcessor.get_stats() from the last heartbeat
+
+
+class Coordinator:
+    def __init__(self, configs, settings=None, node_timeout=NODE_TIMEOUT):
+        self.configs = configs    # cam_id -> CameraConfig, the whole registry
+        self.settings = settings  # SettingsService whose config nodes follow
+        self.node_timeout = node_timeout
+        self.nodes = {}
+        self.assignment = {}      # cam_id -> node_id
+        self.version = 0          # Bumped whenever the assignment changes
+        self.rebalances = 0
+        self._lock = threading.Lock()
+        self._fanout = ThreadPoolExecutor(16, thread_name_prefix="cluster-fanout")
+
+    def start(self):
+        threading.Thread(target=self._monitor, name="cluster-monitor", daemon=True).start()
+        print(f"Coordinator managing {len(self.configs)} cameras")
+
+    def _monitor(self):
+        while True:
+            time.sleep(HEARTBEAT_INTERVAL)
+            with self._lock:
+                self._expire(time.time())
+
+    def heartbeat(self, node_id, url, stats, settings_etag=None):
+        """Record a node's heartbeat and return its assignment (plus settings if they changed)."""
+        now = time.time()
+        with self._lock:
+            node = self.nodes.get(node_id)
+            if node is None:
+                node = self.nodes[node_id] = NodeInfo(node_id, url, now)
+                print(f"Node {node_id} joined at {url}")
+            node.url = url
+            node.last_seen = now
+            node.stats = stats
+            # After a coordinator restart, keep cameras where they already run
+            for cam_id in stats:
+                if cam_id in self.configs and cam_id not in self.assignment:
+                    self.assignment[cam_id] = node_id
+            self._expire(now)
+            cameras = {cam_id: self.configs[cam_id].to_dict()
+                       for cam_id, owner in self.assignment.items() if owner == node_id}
+            reply = {"cameras": cameras, "version": self.version}
+
+        if self.settings:
+            config, _, etag, _ = self.settings.get()
+            if etag != settings_etag:
+                reply["settings"] = config
+        return reply
+
+    def _expire(self, now):
+        """Drop nodes that stopped sending heartbeats, then rebalance. Caller holds the lock."""
+        for node_id, node in list(self.nodes.items()):
+            if now - node.last_seen > self.node_timeout:
+                del self.nodes[node_id]
+                print(f"Node {node_id} missed heartbeats for {now - node.last_seen:.0f}s, removing it")
+        self._rebalance()
+
+    def _rebalance(self):
+        """Give unowned cameras to the least loaded nodes, then even out the load. Caller holds the lock."""
+        for cam_id, node_id in list(self.assignment.items()):
+            if node_id not in self.nodes or cam_id not in self.configs:
+                del self.assignment[cam_id]
+        if not self.nodes:
+            return
+
+        load = dict.fromkeys(self.nodes, 0)
+        for node_id in self.assignment.values():
+            load[node_id] += 1
+        moves = 0
+        for cam_id in sorted(self.configs):
+            if cam_id not in self.assignment:
+                target = min(load, key=lambda n: (load[n], n))
+                self.assignment[cam_id] = target
+                load[target] += 1
+                moves += 1
+
+        # Move one camera at a time from the busiest node while that makes the spread more even
+        while True:
+            busiest = max(load, key=lambda n: (load[n], n))
+            idlest = min(load, key=lambda n: (load[n], n))
+            if load[busiest] - load[idlest] <= 1:
+                break
+            cam_id = max(c for c, n in self.assignment.items() if n == busiest)
+            self.assignment[cam_id] = idlest
+            load[busiest] -= 1
+            load[idlest] += 1
+            moves += 1
+
+        if moves:
+            self.version += 1
+            self.rebalances += 1
+            print(f"Rebalanced {moves} cameras: " +
+                  ", ".join(f"{n}={load[n]}" for n in sorted(load)))
+
+    # --- Cluster-wide API ---
+    def node_url(self, cam_id):
+        with self._lock:
+            node = self.nodes.get(self.assignment.get(cam_id))
+            return node.url if node else None
+
+    def node_urls(self):
+        with self._lock:
+            return {node_id: node.url for node_id, node in self.nodes.items()}
+
+    def camera_stats(self):
+        with self._lock:
+            return {
+                cam_id: {**config.to_dict(), "node": self.assignment.get(cam_id),
+                         "stats": self._stats_for(cam_id)}
+                for cam_id, config in self.configs.items()
+            }
+
+    def _stats_for(self, cam_id):
+        node = self.nodes.get(self.assignment.get(cam_id))
+        return node.stats.get(cam_id) if node else None
+
+    def metrics(self):
+        with self._lock:
+            rows = [s for s in (self._stats_for(c) for c in self.assignment) if s]
+        return backend.summarize_metrics(rows)
+
+    def fan_out(self, method, path, payload=None, headers=None):
+        """Send a request to every live node. Returns {node_id: (status, body)}; unreachable nodes are left out."""
+        urls = self.node_urls()
+
+        def call(url):
+            try:
+                return http_json(url + path, payload, method, headers)
+            except OSError as e:
+                print(f"Cluster request {method} {url}{path} failed: {e}")
+                return None
+
+        results = dict(zip(urls, self._fanout.map(call, urls.values())))
+        return {node_id: r for node_id, r in results.items() if r is not None}
+
+    def get_state(self):
+        now = time.time()
+        with self._lock:
+            return {
+                "version": self.version,
+                "rebalances": self.rebalances,
+                "nodes": {
+                    node_id: {
+                        "url": node.url,
+                        "last_seen_seconds": round(now - node.last_seen, 1),
+                        "cameras": sorted(c for c, n in self.assignment.items() if n == node_id)
+                    }
+                    for node_id, node in self.nodes.items()
+                },
+                "unassigned": sorted(set(self.configs) - set(self.assignment))
+            }
+
+
+def forwarded_auth():
+    """Cluster credentials for the user this request was authenticated as (never their token)."""
+    return service_headers(CLUSTER_TOKEN, g.user_uid, g.user_role)
+
+
+def check_cluster_token():
+    token = request.headers.get(SERVICE_TOKEN_HEADER, "")
+    return bool(CLUSTER_TOKEN) and hmac.compare_digest(token.encode(), CLUSTER_TOKEN.encode())
+
+
+def require_cluster_token():
+    if not CLUSTER_TOKEN:
+        sys.exit("SAFEGUARD_CLUSTER_TOKEN must be set (the same secret on the coordinator and every node)")
+
+
+def install_coordinator(app, coordinator):
+    """Add the cluster endpoints to a Flask app and route the dashboard API across nodes."""
+
+    def heartbeat():
+        if not check_cluster_token():
+            return jsonify({"error": "Invalid cluster token"}), 403
+        data = request.get_json(silent=True) or {}
+        if not data.get("node_id") or not data.get("url"):
+            return jsonify({"error": "node_id and url are required"}), 400
+        return jsonify(coordinator.heartbeat(
+            data["node_id"], data["url"], data.get("cameras") or {}, data.get("settings_etag")
+        ))
+
+    @require_auth
+    @require_role("admin")
+    def cluster_state():
+        return jsonify(coordinator.get_state())
+
+    app.add_url_rule("/api/cluster/heartbeat", "cluster_heartbeat", heartbeat, methods=["POST"])
+    app.add_url_rule("/api/cluster", "cluster_state", cluster_state)
+
+    def violations():
+        rows = []
+        for status, body in coordinator.fan_out("GET", "/api/violations").values():
+            if status == 200:
+                rows.extend(json.loads(body))
+        rows.sort(key=lambda r: r.get("created_at") or "", reverse=True)
+        return jsonify(rows[:50])
+
+    @require_auth
+    @require_role("admin", "staff")
+    def update_violation(id):
+        # Only the node whose database has the row changes anything
+        results = coordinator.fan_out("PUT", f"/api/violations/{id}", request.get_json(silent=True),
+                                      forwarded_auth())
+        statuses = sorted(status for status, _ in results.values())
+        if not statuses:
+            return jsonify({"error": "No cluster nodes reachable"}), 503
+        if statuses[0] < 300:
+            return jsonify({"success": True})
+        return Response(next(body for status, body in results.values() if status == statuses[0]),
+                        status=statuses[0], mimetype="application/json")
+
+    @require_auth
+    @require_role("admin", "staff")
+    def camera_action(cam_id):
+        url = coordinator.node_url(cam_id)
+        if not url:
+            return jsonify({"error": "Camera not found or inactive"}), 404
+        action = request.path.rsplit("/", 1)[-1]
+        try:
+            status, body = http_json(f"{url}/api/cameras/{cam_id}/{action}", {}, "POST", forwarded_auth())
+        except OSError as e:
+            return jsonify({"error": f"Camera node unreachable: {e}"}), 502
+        return Response(body, status=status, mimetype="application/json")
+
+    def video_feed(cam_id):
+        url = coordinator.node_url(cam_id)
+        if not url:
+            return jsonify({"error": "Camera not found or inactive"}), 404
+        query = request.query_string.decode()
+        return redirect(f"{url}/video_feed/{cam_id}" + (f"?{query}" if query else ""), code=307)
+
+    routes = {
+        "api.get_metrics": lambda: jsonify(coordinator.metrics()),
+        "api.get_cameras": lambda: jsonify(coordinator.camera_stats()),
+        "api.get_violations": violations,
+        "api.update_violation": update_violation,
+        "api.pause_camera": camera_action,
+        "api.resume_camera": camera_action,
+        "api.video_feed": video_feed,
+    }
+
+    @app.before_request
+    def route_across_cluster():
+        handler = routes.get(request.endpoint)
+        if handler:
+            return handler(**(request.view_args or {}))
+
+
+# ─── Node ───────────────────────────────────────────────────
+
+class NodeAgent:
+    """Heartbeats to the coordinator and runs the cameras it assigns to this node."""
+
+    def __init__(self, node_id, url, coordinator_url, interval=HEARTBEAT_INTERVAL):
+        self.node_id = node_id
+        self.url = url
+        self.coordinator_url = coordinator_url.rstrip("/")
+        self.interval = interval
+        self.assignment_version = None
+        self._opening = set()
+        self._lock = threading.Lock()
+        self._reachable = True
+
+    def start(self):
+        threading.Thread(target=self._loop, name="cluster-agent", daemon=True).start()
+        print(f"Node {self.node_id} reporting to {self.coordinator_url}")
+
+    def _loop(self):
+        while True:
+            try:
+                reply = self._heartbeat()
+                if not self._reachable:
+                    print("Coordinator reachable again")
+                self._reachable = True
+                if "settings" in reply:
+                    backend.settings.update(reply["settings"])
+                self._reconcile(reply["cameras"])
+                self.assignment_version = reply["version"]
+            except (OSError, ValueError, KeyError) as e:
+                if self._reachable:
+                    print(f"Coordinator heartbeat failed ({e}); keeping current cameras")
+                self._reachable = False
+            time.sleep(self.interval)
+
+    def _heartbeat(self):
+        _, _, etag, _ = backend.settings.get()
+        payload = {
+            "node_id": self.node_id,
+            "url": self.url,
+            "cameras": {cam_id: p.get_stats() for cam_id, p in list(backend.processors.items())},
+            "settings_etag": etag
+        }
+        headers = {SERVICE_TOKEN_HEADER: CLUSTER_TOKEN}
+        status, body = http_json(f"{self.coordinator_url}/api/cluster/heartbeat", payload, headers=headers)
+        if status != 200:
+            raise ValueError(f"HTTP {status}: {body[:200]!r}")
+        return json.loads(body)
+
+    def _reconcile(self, assigned):
+        for cam_id in list(backend.processors):
+            if cam_id not in assigned:
+                # stop_processor joins the camera thread, which must not hold up heartbeats either
+                threading.Thread(target=backend.stop_processor, args=(cam_id,),
+                                 name=f"stop-{cam_id}", daemon=True).start()
+
+        for cam_id, data in assigned.items():
+            running = backend.processors.get(cam_id)
+            if running and running.config.to_dict() == data:
+                continue
+            with self._lock:
+                if cam_id in self._opening:
+                    continue
+                self._opening.add(cam_id)
+            # Opening a source can take seconds (RTSP), so it must not hold up heartbeats
+            threading.Thread(target=self._start_camera, args=(cam_id, data),
+                             name=f"open-{cam_id}", daemon=True).start()
+
+    def _start_camera(self, cam_id, data):
+        try:
+            p = backend.open_processor(cam_id, CameraConfig.from_dict(cam_id, data))
+            if p:
+                backend.stop_processor(cam_id)  # Its config changed
+                backend.start_processor(cam_id, p)
+        finally:
+            with self._lock:
+                self._opening.discard(cam_id)
+
+
+def start_node_agent(agent):
+    """Startup phase for a node: cameras can only run once the model is ready."""
+    if not backend.startup.wait_for("model"):
+        raise RuntimeError("model failed to load, not joining the cluster")
+    agent.start()
+
+
+# ─── Command line ───────────────────────────────────────────
+
+def serve(args, role_setup):
+    if args.db:
+        backend.DB_PATH = backend.settings.db_path = args.db
+
+    overrides = {}
+    if args.offline:
+        from load_test import use_fake_auth, FakeDetector
+        overrides["firebase"] = lambda: use_fake_auth(20)
+        overrides["model"] = lambda: backend.install_detector(FakeDetector())
+    flask_app = role_setup(overrides)
+
+    if args.use_async:
+        try:
+            import uvicorn
+        except ImportError:
+            sys.exit("uvicorn is required for --async: pip install uvicorn")
+        import asgi_app
+        uvicorn.run(asgi_app.StreamingApp(flask_app), host=args.host, port=args.port,
+                    backlog=4096, log_level="warning")
+    else:
+        flask_app.run(host=args.host, port=args.port, threaded=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run SafeGuard AI as a cluster coordinator or node")
+    sub = parser.add_subparsers(dest="role", required=True)
+    for name in ("coordinator", "node"):
+        p = sub.add_parser(name)
+        p.add_argument("--host", default="0.0.0.0")
+        p.add_argument("--port", type=int, default=5000)
+        p.add_argument("--db", help="Database to use instead of safeguard.db")
+        p.add_argument("--async", dest="use_async", action="store_true", help="Serve through asgi_app (uvicorn)")
+        p.add_argument("--offline", action="store_true",
+                       help="Fake auth and model (see load_test.py), for local multi-process testing")
+    sub.choices["coordinator"].add_argument(
+        "--cameras", type=int, default=0, help="With --offline: number of synthetic cameras in the registry")
+    node = sub.choices["node"]
+    node.add_argument("--coordinator", required=True, help="Coordinator URL, e.g. http://10.0.0.1:5000")
+    node.add_argument("--node-id", default=None, help="Default: <hostname>-<port>")
+    node.add_argument("--advertise", default=None,
+                      help="URL the coordinator and browsers use to reach this node (default http://<host>:<port>)")
+    args = parser.parse_args()
+    require_cluster_token()
+
+    if args.role == "coordinator":
+        def setup(overrides):
+            if args.offline and args.cameras:
+                from load_test import synthetic_configs
+                configs = synthetic_configs(args.cameras)
+            else:
+                configs = load_camera_configs(backend.CAMERAS_FILE, backend.CAMERAS)
+            coordinator = Coordinator(configs, backend.settings)
+            # The coordinator runs no cameras itself
+            backend.start_background(cameras=coordinator.start, **overrides)
+            flask_app = backend.create_app(start_background_tasks=False)
+            install_coordinator(flask_app, coordinator)
+            return flask_app
+    else:
+        host = args.host if args.host != "0.0.0.0" else socket.gethostname()
+        url = (args.advertise or f"http://{host}:{args.port}").rstrip("/")
+        backend.MEDIA_URL = url
+        agent = NodeAgent(args.node_id or f"{socket.gethostname()}-{args.port}", url, args.coordinator)
+        # Requests the coordinator forwards for its authenticated users
+        set_service_token(CLUSTER_TOKEN)
+
+        def setup(overrides):
+            backend.start_background(cameras=lambda: start_node_agent(agent), **overrides)
+            return backend.create_app(start_background_tasks=False)
+
+    serve(args, setup)
+
+
+if __name__ == "__main__":
+    main()
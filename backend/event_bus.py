@@ -0,0 +1,103 @@
+"""
+SafeGuard AI — Event Bus
+=========================
+In-process publish/subscribe for live events (violation events opening
+and closing, periodic camera metrics). Publishers never block: thread
+subscribers get a callback on the publishing thread, queue subscribers
+get a bounded queue that drops the oldest event when a reader falls
+behind.
+
+Usage:
+    from event_bus import bus
+    bus.publish("violation.opened", {...})
+    bus.subscribe(callback)                 # callback(topic, data)
+    q = bus.subscribe_queue()               # for streaming endpoints
+"""
+
+import time
+import queue
+import threading
+
+
+class EventBus:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._callbacks = []
+        self._queues = []
+        self.published = 0
+        self.dropped = 0
+
+    def publish(self, topic, data):
+        event = {"topic": topic, "time": time.time(), "data": data}
+        with self._lock:
+            callbacks = list(self._callbacks)
+            queues = list(self._queues)
+            self.published += 1
+        for callback in callbacks:
+            try:
+                callback(topic, data)
+            except Exception as e:
+                print(f"Event subscriber error on {topic}: {e}")
+        for q in queues:
+            q.put_latest(event)
+
+    def subscribe(self, callback):
+        with self._lock:
+            self._callbacks.append(callback)
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def subscribe_queue(self, maxsize=256, notify=None):
+        """
+        Bounded queue of events. notify(), if given, is called after each put
+        (e.g. to wake an asyncio reader via loop.call_soon_threadsafe).
+        """
+        q = EventQueue(self, maxsize, notify)
+        with self._lock:
+            self._queues.append(q)
+        return q
+
+    def _remove_queue(self, q):
+        with self._lock:
+            if q in self._queues:
+                self._queues.remove(q)
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                "published": self.published,
+                "dropped": self.dropped,
+                "subscribers": len(self._callbacks),
+                "streams": len(self._queues)
+            }
+
+
+class EventQueue(queue.Queue):
+    def __init__(self, bus, maxsize, notify):
+        super().__init__(maxsize)
+        self._bus = bus
+        self._notify = notify
+
+    def put_latest(self, event):
+        """Put without blocking, dropping the oldest event if full."""
+        while True:
+            try:
+                self.put_nowait(event)
+                break
+            except queue.Full:
+                try:
+                    self.get_nowait()
+                    self._bus.dropped += 1
+                except queue.Empty:
+                    pass
+        if self._notify:
+            self._notify()
+
+    def close(self):
+        self._bus._remove_queue(self)
+
+
+bus = EventBus()
@@ -3,9 +3,15 @@ SafeGuard AI — Firebase Auth Middleware
 ========================================
 Verifies Firebase ID tokens on backend API requests.
 Fetches user role from Firestore and enforces RBAC.
+Verified tokens are cached until their `exp`, and roles for ROLE_CACHE_TTL
+seconds; call invalidate_role(uid) after changing a user's role.
+For offline runs and load tests, FakeTokenVerifier and InMemoryRoleStore
+stand in for Firebase and Firestore (see set_token_verifier/set_role_store).
 
 Usage:
-    from firebase_auth import require_auth, require_role
+    from firebase_auth import require_auth, require_role, init_firebase
+
+    init_firebase()  # once at startup; not run on import
 
     @app.route("/api/workers", methods=["POST"])
     @require_auth
@@ -15,7 +21,12 @@ Usage:
 """
 
 import os
+import time
+import hmac
+import hashlib
 import functools
+import threading
+from collections import OrderedDict
 from flask import request, jsonify, g
 
 # Firebase Admin SDK
@@ -29,10 +40,11 @@ from firebase_admin import credentials, auth, firestore
 # Option 3: Initialize with project ID only (limited features)
 
 _firebase_initialized = False
+_firebase_init_attempted = False  # False until init_firebase() has run once
 
 def init_firebase():
     """Initialize Firebase Admin SDK."""
-    global _firebase_initialized
+    global _firebase_initialized, _firebase_init_attempted
     if _firebase_initialized:
         return
 
@@ -61,43 +73,280 @@ def init_firebase():
         print(f"⚠️  Firebase Admin initialization failed: {e}")
         print("   Authentication middleware will run in permissive mode")
 
+    finally:
+        _firebase_init_attempted = True
+
+
+_firestore_client = None
 
 def get_firestore_client():
-    """Get Firestore client."""
+    """Get Firestore client (created once, then reused)."""
+    global _firestore_client
+    if _firestore_client is not None:
+        return _firestore_client
     try:
-        return firestore.client()
+        _firestore_client = firestore.client()
+        return _firestore_client
     except Exception:
         return None
 
 
+# ─── Role Stores ────────────────────────────────────────────
+# A role store answers get_user(uid) with the user's document as a dict,
+# or None if there is no such user. It raises if it can't tell (e.g. the
+# backend is unreachable), so that the failure is not cached as "no user".
+
+class FirestoreRoleStore:
+    """Reads user documents from the Firestore `users` collection."""
+
+    def get_user(self, uid):
+        db = get_firestore_client()
+        if not db:
+            raise RuntimeError("Firestore client unavailable")
+        doc = db.collection("users").document(uid).get()
+        return doc.to_dict() if doc.exists else None
+
+
+class InMemoryRoleStore:
+    """
+    Local stand-in for Firestore, for tests and offline runs.
+
+    Usage:
+        store = InMemoryRoleStore({"uid-1": {"role": "admin"}})
+        set_role_store(store)
+    """
+
+    def __init__(self, users=None):
+        self.users = dict(users or {})
+        self.reads = 0
+
+    def set_user(self, uid, role="viewer", status="active"):
+        self.users[uid] = {"role": role, "status": status}
+        invalidate_role(uid)
+
+    def get_user(self, uid):
+        self.reads += 1
+        user = self.users.get(uid)
+        return dict(user) if user else None
+
+
+_role_store = FirestoreRoleStore()
+
+def set_role_store(store):
+    """Swap the backing role store and drop any cached roles."""
+    global _role_store
+    _role_store = store
+    invalidate_role()
+
+
+# ─── Token Verifiers ────────────────────────────────────────
+# A token verifier answers verify(id_token) with the decoded claims
+# (at least `uid` and `exp`), or raises if the token is invalid.
+
+class FirebaseTokenVerifier:
+    def verify(self, id_token):
+        return auth.verify_id_token(id_token)
+
+
+class FakeTokenVerifier:
+    """
+    Local stand-in for Firebase token verification. Accepts tokens of the
+    form "fake:<uid>"; `latency` seconds are spent per verification to
+    mimic a round trip to Firebase.
+
+    Usage:
+        set_token_verifier(FakeTokenVerifier(latency=0.05))
+        # then send "Authorization: Bearer fake:uid-1"
+    """
+
+    PREFIX = "fake:"
+
+    def __init__(self, latency=0.0, ttl=3600):
+        self.latency = latency
+        self.ttl = ttl
+        self.calls = 0
+
+    @classmethod
+    def token_for(cls, uid):
+        return cls.PREFIX + uid
+
+    def verify(self, id_token):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if not id_token.startswith(self.PREFIX) or len(id_token) == len(self.PREFIX):
+            raise ValueError("Not a fake token")
+        now = int(time.time())
+        return {"uid": id_token[len(self.PREFIX):], "iat": now, "exp": now + self.ttl}
+
+
+_token_verifier = FirebaseTokenVerifier()
+
+def set_token_verifier(verifier):
+    """
+    Swap how ID tokens are verified and drop cached tokens. Auth is enforced
+    from then on, as if Firebase had initialized, and init_firebase() is skipped.
+    """
+    global _token_verifier, _firebase_initialized, _firebase_init_attempted
+    _token_verifier = verifier
+    _firebase_initialized = True
+    _firebase_init_attempted = True
+    clear_token_cache()
+
+
+# ─── Service Credentials ────────────────────────────────────
+# Requests from a trusted service (the cluster coordinator, see cluster.py)
+# carry a shared secret instead of a user's ID token, plus the uid and role
+# the service has already verified for that user.
+
+SERVICE_TOKEN_HEADER = "X-Service-Token"
+SERVICE_USER_HEADER = "X-Service-User"
+SERVICE_ROLE_HEADER = "X-Service-Role"
+
+_service_token = None
+
+def set_service_token(token):
+    """Accept requests carrying this shared secret (None to stop accepting them)."""
+    global _service_token
+    _service_token = token or None
+
+
+def service_headers(token, uid, role):
+    """Headers for a request made on behalf of an already authenticated user."""
+    return {SERVICE_TOKEN_HEADER: token, SERVICE_USER_HEADER: uid, SERVICE_ROLE_HEADER: role}
+
+
+def _service_identity():
+    """(uid, role) from valid service headers, else None."""
+    token = request.headers.get(SERVICE_TOKEN_HEADER, "")
+    role = request.headers.get(SERVICE_ROLE_HEADER)
+    if not _service_token or not hmac.compare_digest(token.encode(), _service_token.encode()):
+        return None
+    if role not in PERMISSIONS:
+        return None
+    return request.headers.get(SERVICE_USER_HEADER) or "service", role
+
+
+# ─── Caches & Metrics ───────────────────────────────────────
+TOKEN_CACHE_MAX = 10000
+TOKEN_EXPIRY_SKEW = 5   # Seconds before `exp` at which a cached token is dropped
+ROLE_CACHE_TTL = 30     # Seconds a looked-up role is trusted
+
+_cache_lock = threading.Lock()
+_token_cache = OrderedDict()  # sha256(token) -> (decoded, expires_at)
+_role_cache = {}              # uid -> (role, expires_at)
+
+_metrics = {
+    "token_hits": 0, "token_misses": 0,
+    "role_hits": 0, "role_misses": 0,
+    "requests": 0, "auth_seconds": 0.0, "auth_max_seconds": 0.0,
+    "verify_calls": 0, "verify_seconds": 0.0,
+    "role_lookups": 0, "role_seconds": 0.0,
+}
+
+def invalidate_role(uid=None):
+    """Forget the cached role for one user, or for everyone if uid is None."""
+    with _cache_lock:
+        if uid is None:
+            _role_cache.clear()
+        else:
+            _role_cache.pop(uid, None)
+
+
+def clear_token_cache():
+    with _cache_lock:
+        _token_cache.clear()
+
+
+def get_auth_metrics():
+    """Cache hit rates and average auth latency since startup."""
+    with _cache_lock:
+        m = dict(_metrics)
+        cached_tokens, cached_roles = len(_token_cache), len(_role_cache)
+
+    def rate(hits, misses):
+        total = hits + misses
+        return round(hits / total, 3) if total else None
+
+    def avg_ms(seconds, count):
+        return round(seconds / count * 1000, 3) if count else None
+
+    return {
+        "token_cache": {"hits": m["token_hits"], "misses": m["token_misses"],
+                        "hit_rate": rate(m["token_hits"], m["token_misses"]), "size": cached_tokens},
+        "role_cache": {"hits": m["role_hits"], "misses": m["role_misses"],
+                       "hit_rate": rate(m["role_hits"], m["role_misses"]), "size": cached_roles},
+        "requests": m["requests"],
+        "avg_auth_ms": avg_ms(m["auth_seconds"], m["requests"]),
+        "max_auth_ms": round(m["auth_max_seconds"] * 1000, 3),
+        "avg_verify_ms": avg_ms(m["verify_seconds"], m["verify_calls"]),
+        "avg_role_lookup_ms": avg_ms(m["role_seconds"], m["role_lookups"]),
+    }
+
+
 def verify_token(id_token):
-    """Verify a Firebase ID token and return decoded claims."""
+    """Verify a Firebase ID token and return decoded claims (cached until `exp`)."""
+    key = hashlib.sha256(id_token.encode()).hexdigest()
+    now = time.time()
+    with _cache_lock:
+        entry = _token_cache.get(key)
+        if entry and entry[1] > now:
+            _token_cache.move_to_end(key)
+            _metrics["token_hits"] += 1
+            return entry[0]
+        if entry:
+            del _token_cache[key]
+        _metrics["token_misses"] += 1
+
+    start = time.perf_counter()
     try:
-        decoded = auth.verify_id_token(id_token)
-        return decoded
+        decoded = _token_verifier.verify(id_token)
     except Exception as e:
         print(f"Token verification failed: {e}")
         return None
+    finally:
+        with _cache_lock:
+            _metrics["verify_calls"] += 1
+            _metrics["verify_seconds"] += time.perf_counter() - start
+
+    expires_at = decoded.get("exp", 0) - TOKEN_EXPIRY_SKEW
+    if expires_at > now:
+        with _cache_lock:
+            _token_cache[key] = (decoded, expires_at)
+            if len(_token_cache) > TOKEN_CACHE_MAX:
+                _token_cache.popitem(last=False)
+    return decoded
 
 
 def get_user_role(uid):
-    """Fetch user role from Firestore."""
+    """Fetch user role from the role store (Firestore), cached for ROLE_CACHE_TTL."""
+    now = time.time()
+    with _cache_lock:
+        entry = _role_cache.get(uid)
+        if entry and entry[1] > now:
+            _metrics["role_hits"] += 1
+            return entry[0]
+        _metrics["role_misses"] += 1
+
+    start = time.perf_counter()
     try:
-        db = get_firestore_client()
-        if not db:
-            return None
-
-        doc = db.collection("users").document(uid).get()
-        if doc.exists:
-            data = doc.to_dict()
-            # Check if user is active
-            if data.get("status") == "disabled":
-                return None
-            return data.get("role", "viewer")
-        return None
+        data = _role_store.get_user(uid)
     except Exception as e:
+        # Not cached: the user may well exist once the store is reachable again
         print(f"Error fetching user role: {e}")
         return None
+    finally:
+        with _cache_lock:
+            _metrics["role_lookups"] += 1
+            _metrics["role_seconds"] += time.perf_counter() - start
+
+    role = None
+    # Disabled and unknown users are cached too, as None
+    if data and data.get("status") != "disabled":
+        role = data.get("role", "viewer")
+    with _cache_lock:
+        _role_cache[uid] = (role, now + ROLE_CACHE_TTL)
+    return role
 
 
 # ─── Decorators ─────────────────────────────────────────────
@@ -107,35 +356,53 @@ def require_auth(f):
     Decorator: Verify Firebase ID token on each request.
     Sets g.user_uid and g.user_role for downstream use.
     
-    If Firebase Admin is not initialized, runs in permissive mode
-    (allows all requests with role='admin').
+    If Firebase Admin is still starting up, responds 503. If initialization
+    failed, runs in permissive mode (allows all requests with role='admin').
     """
     @functools.wraps(f)
     def decorated(*args, **kwargs):
+        if not _firebase_init_attempted:
+            return jsonify({"error": "Authentication service is starting up"}), 503
+
         if not _firebase_initialized:
             # Permissive mode: allow all requests when Firebase is not configured
             g.user_uid = "local-dev"
             g.user_role = "admin"
             return f(*args, **kwargs)
 
+        if SERVICE_TOKEN_HEADER in request.headers:
+            identity = _service_identity()
+            if not identity:
+                return jsonify({"error": "Invalid service credentials"}), 401
+            g.user_uid, g.user_role = identity
+            return f(*args, **kwargs)
+
         # Extract token from Authorization header
         auth_header = request.headers.get("Authorization", "")
         if not auth_header.startswith("Bearer "):
             return jsonify({"error": "Missing or invalid Authorization header"}), 401
 
-        id_token = auth_header.split("Bearer ")[1]
-        decoded = verify_token(id_token)
-        if not decoded:
-            return jsonify({"error": "Invalid or expired token"}), 401
-
-        uid = decoded.get("uid")
-        if not uid:
-            return jsonify({"error": "No UID in token"}), 401
-
-        # Fetch role from Firestore
-        role = get_user_role(uid)
-        if not role:
-            return jsonify({"error": "Account disabled or not found"}), 403
+        start = time.perf_counter()
+        try:
+            id_token = auth_header.split("Bearer ")[1]
+            decoded = verify_token(id_token)
+            if not decoded:
+                return jsonify({"error": "Invalid or expired token"}), 401
+
+            uid = decoded.get("uid")
+            if not uid:
+                return jsonify({"error": "No UID in token"}), 401
+
+            # Fetch role from Firestore (or the role cache)
+            role = get_user_role(uid)
+            if not role:
+                return jsonify({"error": "Account disabled or not found"}), 403
+        finally:
+            elapsed = time.perf_counter() - start
+            with _cache_lock:
+                _metrics["requests"] += 1
+                _metrics["auth_seconds"] += elapsed
+                _metrics["auth_max_seconds"] = max(_metrics["auth_max_seconds"], elapsed)
 
         # Store user info in Flask's request context
         g.user_uid = uid
@@ -194,7 +461,3 @@ PERMISSIONS = {
 def has_permission(role, permission):
     """Check if a role has a specific permission."""
     return permission in PERMISSIONS.get(role, set())
-
-
-# Initialize on import
-init_firebase()
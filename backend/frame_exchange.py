@@ -0,0 +1,162 @@
+"""
+SafeGuard AI — Frame Exchange
+==============================
+Hands frames from a camera thread to any number of readers without
+copying. The writer draws into a buffer taken from a small preallocated
+pool and publishes it; readers get a read-only, reference-counted view
+of the latest published buffer. A buffer only goes back into the pool
+once it has been replaced and every reader has released it, so steady
+state needs no new allocations.
+
+Usage (writer):
+    slot = exchange.acquire()
+    cv2.resize(raw, (640, 360), dst=slot.array)
+    exchange.publish(slot)
+
+Usage (reader):
+    with exchange.read() as ref:      # or exchange.wait_newer(version)
+        cv2.imencode(".jpg", ref.array)
+"""
+
+import time
+import threading
+import numpy as np
+
+
+class _Slot:
+    __slots__ = ("array", "view", "refs", "writing")
+
+    def __init__(self, shape, dtype):
+        self.array = np.empty(shape, dtype=dtype)
+        self.view = self.array.view()
+        self.view.flags.writeable = False
+        self.refs = 0
+        self.writing = False
+
+
+class FrameRef:
+    """A read-only published frame. Call release() (or use `with`) when done."""
+
+    __slots__ = ("_exchange", "_slot", "version", "timestamp")
+
+    def __init__(self, exchange, slot, version, timestamp):
+        self._exchange = exchange
+        self._slot = slot
+        self.version = version
+        self.timestamp = timestamp
+
+    @property
+    def array(self):
+        return self._slot.view
+
+    def release(self):
+        if self._slot is not None:
+            self._exchange._release(self._slot)
+            self._slot = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class FrameExchange:
+    def __init__(self, shape, dtype=np.uint8, pool_size=4, max_pool_size=16):
+        self.shape = tuple(shape)
+        self.dtype = dtype
+        self.max_pool_size = max_pool_size
+        self._cond = threading.Condition()
+        self._slots = [_Slot(self.shape, dtype) for _ in range(pool_size)]
+        self._current = None
+        self._version = 0
+        self._timestamp = 0.0
+
+        # Stats
+        self.allocations = pool_size
+        self.published = 0
+        self.writer_waits = 0
+
+    @property
+    def version(self):
+        return self._version
+
+    def acquire(self):
+        """
+        Take a free buffer for the writer. Grows the pool only if every
+        buffer is still held by readers, and waits once max_pool_size is hit.
+        """
+        with self._cond:
+            while True:
+                for slot in self._slots:
+                    if slot.refs == 0 and not slot.writing and slot is not self._current:
+                        slot.writing = True
+                        return slot
+                if len(self._slots) < self.max_pool_size:
+                    slot = _Slot(self.shape, self.dtype)
+                    slot.writing = True
+                    self._slots.append(slot)
+                    self.allocations += 1
+                    return slot
+                self.writer_waits += 1
+                self._cond.wait(0.1)
+
+    def publish(self, slot):
+        """Make slot the latest frame and wake readers waiting for it."""
+        with self._cond:
+            slot.writing = False
+            self._current = slot
+            self._version += 1
+            self._timestamp = time.time()
+            self.published += 1
+            self._cond.notify_all()
+            return self._version
+
+    def discard(self, slot):
+        """Give back an acquired buffer without publishing it."""
+        with self._cond:
+            slot.writing = False
+            self._cond.notify_all()
+
+    def _ref_current(self):
+        slot = self._current
+        slot.refs += 1
+        return FrameRef(self, slot, self._version, self._timestamp)
+
+    def read(self):
+        """Latest published frame as a FrameRef, or None before the first publish."""
+        with self._cond:
+            if self._current is None:
+                return None
+            return self._ref_current()
+
+    def wait_newer(self, version, timeout=None):
+        """Block until a frame newer than version is published. None on timeout."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._version > version, timeout):
+                return None
+            return self._ref_current()
+
+    def read_copy(self):
+        """Private copy of the latest frame, for callers that need to own it."""
+        ref = self.read()
+        if ref is None:
+            return None
+        with ref:
+            return ref.array.copy()
+
+    def _release(self, slot):
+        with self._cond:
+            slot.refs -= 1
+            if slot.refs == 0:
+                self._cond.notify_all()
+
+    def get_stats(self):
+        with self._cond:
+            return {
+                "version": self._version,
+                "pool_size": len(self._slots),
+                "allocations": self.allocations,
+                "readers": sum(s.refs for s in self._slots),
+                "writer_waits": self.writer_waits
+            }
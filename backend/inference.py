@@ -0,0 +1,91 @@
+"""
+SafeGuard AI — Batched Inference
+=================================
+Single worker thread that owns the YOLO detector. Camera threads and
+upload requests submit frames; the worker gathers whatever is queued
+(up to max_batch, waiting at most max_wait for stragglers) and runs one
+batched model call for all of them.
+
+Usage:
+    inference = BatchedDetector(YoloPPEDetector("yolov8n.pt"))
+    detections = inference.detect(frame)           # blocking
+    future = inference.submit(frame)               # non-blocking
+"""
+
+import time
+import queue
+import threading
+from concurrent.futures import Future
+
+
+class BatchedDetector:
+    def __init__(self, detector, max_batch=8, max_wait=0.01):
+        self.detector = detector
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+
+        # Stats
+        self.batches = 0
+        self.frames = 0
+
+        self._thread = threading.Thread(target=self._worker, name="inference", daemon=True)
+        self._thread.start()
+
+    def submit(self, frame, check_helmet=True, check_vest=True, imgsz=None):
+        """Queue a frame for detection and return a Future of its detections."""
+        future = Future()
+        self._queue.put((frame, (check_helmet, check_vest, imgsz), future))
+        return future
+
+    def detect(self, frame, check_helmet=True, check_vest=True, imgsz=None, timeout=None):
+        """Drop-in replacement for YoloPPEDetector.detect that goes through the batch queue."""
+        return self.submit(frame, check_helmet, check_vest, imgsz).result(timeout)
+
+    def get_stats(self):
+        return {
+            "batches": self.batches,
+            "frames": self.frames,
+            "avg_batch_size": round(self.frames / self.batches, 2) if self.batches else 0,
+            "queued": self._queue.qsize()
+        }
+
+    def _collect(self):
+        """Block for one item, then gather more until the batch is full or max_wait passes."""
+        items = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(items) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                items.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return items
+
+    def _worker(self):
+        while True:
+            items = self._collect()
+
+            # Frames with different PPE flags or input sizes can't share a model call
+            groups = {}
+            for item in items:
+                groups.setdefault(item[1], []).append(item)
+
+            for (check_helmet, check_vest, imgsz), group in groups.items():
+                pending = [(frame, future) for frame, _, future in group
+                           if future.set_running_or_notify_cancel()]
+                if not pending:
+                    continue
+                try:
+                    results = self.detector.detect_batch(
+                        [frame for frame, _ in pending], check_helmet, check_vest, imgsz
+                    )
+                except Exception as e:
+                    for _, future in pending:
+                        future.set_exception(e)
+                    continue
+
+                self.batches += 1
+                self.frames += len(pending)
+                for (_, future), detections in zip(pending, results):
+                    future.set_result(detections)
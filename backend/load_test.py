@@ -0,0 +1,333 @@
+"""
+SafeGuard AI — Load Test Harness
+=================================
+Runs the backend fully offline and drives a mix of realistic traffic at it.
+
+`serve` starts the app with local stand-ins: FakeTokenVerifier and an
+InMemoryRoleStore instead of Firebase/Firestore, synthetic:// cameras
+instead of video files, and (by default) a fake model with a fixed
+inference time instead of YOLO.
+
+`run` generates load against a server:
+  - dashboard users polling violations, alerts and metrics every second
+    (like the frontend's AppContext)
+  - staff updating violation statuses (authenticated PUTs)
+  - clients uploading images to /api/detect back to back
+  - MJPEG viewers (see load_test_streams.py)
+and reports throughput, error rate and latency percentiles per endpoint.
+
+Usage:
+    python load_test.py serve --cameras 4 --db loadtest.db      # add --async for asgi_app
+    python load_test.py run --duration 60 --dashboard 50 --updaters 5 --uploaders 2 --viewers 100
+"""
+
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import threading
+import http.client
+from urllib.parse import urlsplit
+
+import cv2
+
+from firebase_auth import FakeTokenVerifier, InMemoryRoleStore, set_token_verifier, set_role_store
+from synthetic_source import SyntheticCapture
+from load_test_streams import ViewerStats, viewer, percentile
+
+ROLES = ("admin", "staff", "viewer")
+VIOLATION_STATUSES = ("Pending", "Reviewed", "Resolved")
+
+
+def user_ids(role, count):
+    return [f"loadtest-{role}-{i}" for i in range(count)]
+
+
+# ─── Server side ────────────────────────────────────────────
+
+class FakeDetector:
+    """Stands in for YoloPPEDetector: spends `latency` seconds per batch and finds nobody."""
+
+    def __init__(self, latency=0.03):
+        self.latency = latency
+
+    def apply_settings(self, settings):
+        pass
+
+    def detect(self, frame, check_helmet=True, check_vest=True, imgsz=None):
+        return self.detect_batch([frame], check_helmet, check_vest, imgsz)[0]
+
+    def detect_batch(self, frames, check_helmet=True, check_vest=True, imgsz=None):
+        time.sleep(self.latency)
+        return [[] for _ in frames]
+
+
+def use_fake_auth(users_per_role, latency=0.0):
+    """Fake token verifier plus an in-memory role store with loadtest-<role>-<i> users."""
+    users = {uid: {"role": role} for role in ROLES for uid in user_ids(role, users_per_role)}
+    set_role_store(InMemoryRoleStore(users))
+    set_token_verifier(FakeTokenVerifier(latency=latency))
+    print(f"Fake auth: {len(users)} users, tokens look like {FakeTokenVerifier.token_for(user_ids('admin', 1)[0])}")
+
+
+def synthetic_configs(count, people=4, size="640x360"):
+    """CameraConfigs for cam01..camNN on synthetic:// sources."""
+    from camera_config import CameraConfig
+
+    configs = {}
+    for i in range(1, count + 1):
+        cam_id = f"cam{i:02d}"
+        source = f"synthetic://{cam_id}?people={people}&size={size}&seed={i}"
+        configs[cam_id] = CameraConfig(cam_id, source, name=f"Synthetic {i}")
+    return configs
+
+
+def serve(args):
+    import app as backend
+
+    if args.db:
+        backend.DB_PATH = backend.settings.db_path = args.db
+
+    configs = synthetic_configs(args.cameras, args.people, args.size)
+    overrides = {
+        "firebase": lambda: use_fake_auth(args.users, args.auth_latency_ms / 1000),
+        "cameras": lambda: backend.open_cameras(configs)
+    }
+    if args.model == "fake":
+        overrides["model"] = lambda: backend.install_detector(FakeDetector(args.model_latency_ms / 1000))
+    backend.start_background(**overrides)
+    flask_app = backend.create_app(start_background_tasks=False)
+
+    if args.use_async:
+        try:
+            import uvicorn
+        except ImportError:
+            sys.exit("uvicorn is required for --async: pip install uvicorn")
+        import asgi_app
+        uvicorn.run(asgi_app.StreamingApp(flask_app), host=args.host, port=args.port,
+                    backlog=4096, log_level="warning")
+    else:
+        flask_app.run(host=args.host, port=args.port, threaded=True)
+
+
+# ─── Load generation ────────────────────────────────────────
+
+class EndpointStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latencies = {}  # label -> [seconds]
+        self._errors = {}     # label -> count
+        self._error_samples = {}
+
+    def record(self, label, seconds, error=None):
+        with self._lock:
+            self._latencies.setdefault(label, []).append(seconds)
+            if error:
+                self._errors[label] = self._errors.get(label, 0) + 1
+                self._error_samples.setdefault(label, error)
+
+    def report(self, elapsed):
+        print(f"{'Endpoint':<32} {'Requests':>9} {'Errors':>7} {'Req/s':>7} "
+              f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+        with self._lock:
+            for label in sorted(self._latencies):
+                lat = self._latencies[label]
+                errors = self._errors.get(label, 0)
+                print(f"{label:<32} {len(lat):>9} {errors:>7} {len(lat) / elapsed:>7.1f} "
+                      f"{percentile(lat, 50) * 1000:>8.1f} {percentile(lat, 95) * 1000:>8.1f} "
+                      f"{percentile(lat, 99) * 1000:>8.1f} {max(lat) * 1000:>8.1f}")
+            for label, sample in sorted(self._error_samples.items()):
+                print(f"  {label}: {self._errors[label]} errors, e.g. {sample}")
+
+
+class Client:
+    """One keep-alive HTTP connection that records every request in EndpointStats."""
+
+    def __init__(self, host, port, stats, token=None):
+        self.host = host
+        self.port = port
+        self.stats = stats
+        self.token = token
+        self.conn = http.client.HTTPConnection(host, port, timeout=30)
+
+    def request(self, label, method, path, body=None, headers=None):
+        headers = dict(headers or {})
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        start = time.perf_counter()
+        error = None
+        data = None
+        try:
+            self.conn.request(method, path, body=body, headers=headers)
+            response = self.conn.getresponse()
+            data = response.read()
+            if response.status >= 400:
+                error = f"HTTP {response.status}"
+        except (OSError, http.client.HTTPException) as e:
+            error = str(e) or type(e).__name__
+            self.conn.close()
+        self.stats.record(label, time.perf_counter() - start, error)
+        return None if error else data
+
+
+def dashboard_user(client, deadline, interval):
+    while time.monotonic() < deadline:
+        start = time.monotonic()
+        client.request("GET /api/violations", "GET", "/api/violations")
+        client.request("GET /api/alerts", "GET", "/api/alerts")
+        client.request("GET /api/metrics", "GET", "/api/metrics")
+        time.sleep(max(0.0, start + interval - time.monotonic()))
+
+
+def violation_updater(client, deadline, interval):
+    ids = []
+    i = 0
+    while time.monotonic() < deadline:
+        start = time.monotonic()
+        if i % 20 == 0:
+            data = client.request("GET /api/violations", "GET", "/api/violations")
+            ids = [v["id"] for v in json.loads(data)] if data else ids
+        vio_id = random.choice(ids) if ids else "VIO-LOADTEST"
+        body = json.dumps({"status": random.choice(VIOLATION_STATUSES)})
+        client.request("PUT /api/violations/:id", "PUT", f"/api/violations/{vio_id}", body,
+                       {"Content-Type": "application/json"})
+        i += 1
+        time.sleep(max(0.0, start + interval - time.monotonic()))
+
+
+def detect_uploader(client, deadline, image):
+    boundary = "loadtestboundary"
+    body = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"image\"; filename=\"frame.jpg\"\r\n"
+            f"Content-Type: image/jpeg\r\n\r\n").encode() + image + f"\r\n--{boundary}--\r\n".encode()
+    headers = {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+    while time.monotonic() < deadline:
+        client.request("POST /api/detect", "POST", "/api/detect", body, headers)
+
+
+def synthetic_jpeg(people):
+    _, frame = SyntheticCapture(people=people, seed=7).read()
+    return cv2.imencode(".jpg", frame)[1].tobytes()
+
+
+def run_viewers(args, host, port, deadline):
+    """MJPEG viewers spread over the cameras, on one asyncio loop."""
+    stats = [ViewerStats() for _ in range(args.viewers)]
+
+    async def main():
+        connect_sem = asyncio.Semaphore(200)
+        await asyncio.gather(*(
+            viewer(host, port, f"/video_feed/{args.cameras[i % len(args.cameras)]}?variant={args.variant}",
+                   deadline, s, connect_sem)
+            for i, s in enumerate(stats)
+        ))
+
+    asyncio.run(main())
+    return stats
+
+
+def report_viewers(stats, elapsed):
+    ok = [s for s in stats if s.error is None and s.frames]
+    gaps = [g for s in ok for g in s.gaps]
+    first = [s.first_frame for s in ok]
+    frames = sum(s.frames for s in stats)
+    errors = sum(1 for s in stats if s.error)
+    print(f"\nMJPEG viewers: {len(ok)}/{len(stats)} received frames, {errors} errors, "
+          f"{frames / elapsed:.0f} frames/s ({frames / max(1, len(ok)) / elapsed:.1f}/s per viewer)")
+    print(f"  first frame p50 {percentile(first, 50) * 1000:.0f} ms, p99 {percentile(first, 99) * 1000:.0f} ms; "
+          f"frame gap p50 {percentile(gaps, 50) * 1000:.0f} ms, p95 {percentile(gaps, 95) * 1000:.0f} ms, "
+          f"p99 {percentile(gaps, 99) * 1000:.0f} ms")
+
+
+def run(args):
+    url = urlsplit(args.url)
+    host, port = url.hostname, url.port or 80
+    stats = EndpointStats()
+    staff = [FakeTokenVerifier.token_for(uid) for uid in user_ids("staff", args.users)]
+    image = synthetic_jpeg(args.people)
+
+    if not args.cameras:
+        health = Client(host, port, stats).request("GET /api/health", "GET", "/api/health")
+        args.cameras = json.loads(health)["cameras"] if health else []
+    if args.viewers and not args.cameras:
+        sys.exit("No cameras to view: the server reports none (pass --cameras cam01,...)")
+
+    start = time.monotonic()
+    deadline = start + args.duration
+    threads = []
+    for i in range(args.dashboard):
+        c = Client(host, port, stats)
+        threads.append(threading.Thread(target=dashboard_user, args=(c, deadline, args.poll_interval)))
+    for i in range(args.updaters):
+        c = Client(host, port, stats, staff[i % len(staff)])
+        threads.append(threading.Thread(target=violation_updater, args=(c, deadline, args.update_interval)))
+    for i in range(args.uploaders):
+        c = Client(host, port, stats)
+        threads.append(threading.Thread(target=detect_uploader, args=(c, deadline, image)))
+
+    viewer_stats = []
+    if args.viewers:
+        threads.append(threading.Thread(
+            target=lambda: viewer_stats.extend(run_viewers(args, host, port, deadline))
+        ))
+
+    print(f"Load: {args.dashboard} dashboard users, {args.updaters} violation updaters, "
+          f"{args.uploaders} uploaders, {args.viewers} MJPEG viewers for {args.duration:.0f}s")
+    for t in threads:
+        t.daemon = True
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.monotonic() - start
+
+    print()
+    stats.report(elapsed)
+    if viewer_stats:
+        report_viewers(viewer_stats, elapsed)
+
+    admin = Client(host, port, EndpointStats(), FakeTokenVerifier.token_for(user_ids("admin", 1)[0]))
+    auth_metrics = admin.request("GET /api/auth/metrics", "GET", "/api/auth/metrics")
+    if auth_metrics:
+        m = json.loads(auth_metrics)
+        print(f"\nAuth: token cache hit rate {m['token_cache']['hit_rate']}, "
+              f"role cache hit rate {m['role_cache']['hit_rate']}, avg auth {m['avg_auth_ms']} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline load testing for the SafeGuard AI backend")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("serve", help="Run the backend with fake auth, synthetic cameras and a fake model")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=5000)
+    p.add_argument("--async", dest="use_async", action="store_true", help="Serve through asgi_app (uvicorn)")
+    p.add_argument("--db", help="Database to use instead of safeguard.db (e.g. a scratch copy)")
+    p.add_argument("--cameras", type=int, default=3, help="Number of synthetic cameras")
+    p.add_argument("--people", type=int, default=4, help="Figures per synthetic camera")
+    p.add_argument("--size", default="640x360", help="Synthetic camera resolution")
+    p.add_argument("--users", type=int, default=20, help="Fake users per role")
+    p.add_argument("--auth-latency-ms", type=float, default=50.0, help="Simulated Firebase verify time")
+    p.add_argument("--model", choices=("fake", "yolo"), default="fake")
+    p.add_argument("--model-latency-ms", type=float, default=30.0, help="Fake model time per batch")
+
+    p = sub.add_parser("run", help="Generate load against a running server")
+    p.add_argument("--url", default="http://127.0.0.1:5000")
+    p.add_argument("--duration", type=float, default=60.0)
+    p.add_argument("--dashboard", type=int, default=20, help="Users polling the dashboard")
+    p.add_argument("--poll-interval", type=float, default=1.0)
+    p.add_argument("--updaters", type=int, default=2, help="Staff users updating violation statuses")
+    p.add_argument("--update-interval", type=float, default=1.0)
+    p.add_argument("--uploaders", type=int, default=1, help="Clients posting images to /api/detect")
+    p.add_argument("--viewers", type=int, default=20, help="MJPEG viewers, spread over the cameras")
+    p.add_argument("--variant", default="thumb", choices=("full", "medium", "thumb"))
+    p.add_argument("--cameras", type=lambda s: [c for c in s.split(",") if c], default=None,
+                   help="Cameras to view (default: all reported by /api/health)")
+    p.add_argument("--users", type=int, default=20, help="Fake users per role (match serve)")
+    p.add_argument("--people", type=int, default=4, help="Figures in the uploaded synthetic image")
+
+    args = parser.parse_args()
+    if args.command == "serve":
+        serve(args)
+    else:
+        run(args)
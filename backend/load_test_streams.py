@@ -0,0 +1,112 @@
+"""
+SafeGuard AI — MJPEG Load Test
+===============================
+Opens many simultaneous MJPEG viewers against a running server and
+reports how evenly frames arrive: time to first frame, gaps between
+frames per viewer (p50/p95/p99/max) and the overall delivery rate.
+Uses raw asyncio sockets, so a thousand viewers need one process and
+no extra dependencies.
+
+Usage:
+    python asgi_app.py --port 5000                       # in another shell
+    python load_test_streams.py --viewers 1000 --duration 30 --path "/video_feed/cam01?variant=thumb"
+"""
+
+import time
+import asyncio
+import argparse
+
+BOUNDARY = b"--frame\r\n"
+
+
+class ViewerStats:
+    def __init__(self):
+        self.first_frame = None
+        self.frames = 0
+        self.gaps = []
+        self.error = None
+
+
+async def viewer(host, port, path, deadline, stats, connect_sem):
+    start = time.monotonic()
+    try:
+        async with connect_sem:
+            reader, writer = await asyncio.open_connection(host, port)
+        writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: keep-alive\r\n\r\n".encode())
+        await writer.drain()
+        head = await reader.readuntil(b"\r\n\r\n")
+        status = head.split(b" ", 2)[1]
+        if status != b"200":
+            raise RuntimeError(f"HTTP {status.decode()}")
+
+        tail = b""
+        last = None
+        while time.monotonic() < deadline:
+            chunk = await asyncio.wait_for(reader.read(65536), deadline - time.monotonic())
+            if not chunk:
+                raise RuntimeError("connection closed")
+            data = tail + chunk
+            count = data.count(BOUNDARY)
+            tail = data[-(len(BOUNDARY) - 1):]
+            if not count:
+                continue
+            now = time.monotonic()
+            if stats.first_frame is None:
+                stats.first_frame = now - start
+            elif last is not None:
+                stats.gaps.append(now - last)
+            last = now
+            stats.frames += count
+        writer.close()
+    except asyncio.TimeoutError:
+        pass  # Deadline reached while waiting for data
+    except Exception as e:
+        stats.error = str(e) or type(e).__name__
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+async def run(args):
+    connect_sem = asyncio.Semaphore(args.connect_concurrency)
+    stats = [ViewerStats() for _ in range(args.viewers)]
+    start = time.monotonic()
+    deadline = start + args.duration
+    await asyncio.gather(*(
+        viewer(args.host, args.port, args.path, deadline, s, connect_sem) for s in stats
+    ))
+    elapsed = time.monotonic() - start
+
+    ok = [s for s in stats if s.error is None and s.frames]
+    errors = {}
+    for s in stats:
+        if s.error:
+            errors[s.error] = errors.get(s.error, 0) + 1
+    gaps = [g for s in ok for g in s.gaps]
+    first = [s.first_frame for s in ok]
+    total_frames = sum(s.frames for s in stats)
+
+    print(f"Viewers:          {len(ok)}/{args.viewers} received frames")
+    print(f"Frames delivered: {total_frames} ({total_frames / elapsed:.0f}/s, "
+          f"{total_frames / max(1, len(ok)) / elapsed:.1f}/s per viewer)")
+    print(f"First frame (s):  p50 {percentile(first, 50):.3f}  p99 {percentile(first, 99):.3f}")
+    print(f"Frame gap (ms):   p50 {percentile(gaps, 50) * 1000:.1f}  p95 {percentile(gaps, 95) * 1000:.1f}  "
+          f"p99 {percentile(gaps, 99) * 1000:.1f}  max {max(gaps, default=0) * 1000:.1f}")
+    for error, count in sorted(errors.items(), key=lambda e: -e[1]):
+        print(f"Error x{count}: {error}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent MJPEG viewer load test")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--path", default="/video_feed/cam01?variant=thumb")
+    parser.add_argument("--viewers", type=int, default=1000)
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to keep viewers connected")
+    parser.add_argument("--connect-concurrency", type=int, default=200,
+                        help="Connections opened at once while ramping up")
+    asyncio.run(run(parser.parse_args()))
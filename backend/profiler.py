@@ -0,0 +1,154 @@
+"""
+SafeGuard AI — In-Process Profiling
+====================================
+Diagnostics that can be run on a live server without restarting it.
+
+sample_threads() is a wall-clock sampling profiler. Every `interval`
+seconds it records the Python stack of each thread, with the thread's
+name as the root frame (camera-cam01, inference, metrics, ...), and
+returns the counts as collapsed stacks for flamegraph.pl or speedscope.
+Sampling only reads frames, so the profiled threads are never paused or
+instrumented. Time spent waiting (sleep, queue.get) shows up like any
+other frame.
+
+memory_snapshot() reports the largest live allocations from tracemalloc.
+If tracing is not already on, it is turned on only for the requested
+window and turned off again afterwards.
+"""
+
+import os
+import sys
+import time
+import threading
+import tracemalloc
+from collections import Counter
+
+MAX_PROFILE_SECONDS = 60
+MIN_INTERVAL = 0.001
+MEMORY_GROUPS = ("lineno", "filename", "traceback")
+
+_profile_lock = threading.Lock()
+_memory_lock = threading.Lock()
+
+
+class ProfilerBusy(RuntimeError):
+    pass
+
+
+def _frame_label(frame, lines):
+    code = frame.f_code
+    lineno = frame.f_lineno if lines else code.co_firstlineno
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{lineno})"
+
+
+def _collapse(frame, lines):
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame, lines))
+        frame = frame.f_back
+    labels.reverse()
+    return ";".join(labels)
+
+
+def sample_threads(seconds, interval=0.005, thread_prefix=None, lines=False):
+    """
+    Sample every thread (or those whose name starts with thread_prefix)
+    for `seconds`. Functions are labelled by their first line, or by the
+    executing line if lines=True. Raises ProfilerBusy if a profile is
+    already running.
+    """
+    if not _profile_lock.acquire(blocking=False):
+        raise ProfilerBusy("A profile is already running")
+    try:
+        me = threading.get_ident()
+        stacks = Counter()
+        per_thread = Counter()
+        samples = 0
+        sampling_time = 0.0
+        start = next_tick = time.perf_counter()
+        deadline = start + seconds
+
+        while next_tick < deadline:
+            tick_start = time.perf_counter()
+            names = {t.ident: t.name.replace(";", ":") for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                name = names.get(ident, f"thread-{ident}")
+                if ident == me or (thread_prefix and not name.startswith(thread_prefix)):
+                    continue
+                stacks[f"{name};{_collapse(frame, lines)}"] += 1
+                per_thread[name] += 1
+            frame = None  # Don't keep the last sampled stack alive while sleeping
+            samples += 1
+            sampling_time += time.perf_counter() - tick_start
+
+            next_tick += interval
+            time.sleep(max(0.0, next_tick - time.perf_counter()))
+        elapsed = time.perf_counter() - start
+    finally:
+        _profile_lock.release()
+
+    return {
+        "seconds": round(elapsed, 3),
+        "interval_ms": round(interval * 1000, 3),
+        "samples": samples,
+        "overhead": round(sampling_time / elapsed, 4) if elapsed else 0.0,  # Fraction of time spent sampling
+        "threads": dict(per_thread.most_common()),
+        "stacks": stacks
+    }
+
+
+def collapsed_stacks(stacks):
+    """Brendan Gregg's collapsed format: one "root;...;leaf count" line per stack."""
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+def memory_snapshot(seconds=10.0, top=25, group_by="lineno", frames=1):
+    """
+    Largest live allocations grouped by line, file or traceback. Unless
+    tracemalloc was already tracing (e.g. PYTHONTRACEMALLOC=1), it traces
+    for `seconds` with `frames` stack depth, so the result is memory
+    allocated during that window that is still alive.
+    """
+    if group_by not in MEMORY_GROUPS:
+        raise ValueError(f"group_by must be one of: {', '.join(MEMORY_GROUPS)}")
+    if not _memory_lock.acquire(blocking=False):
+        raise ProfilerBusy("A memory snapshot is already running")
+    try:
+        window = not tracemalloc.is_tracing()
+        if window:
+            tracemalloc.start(frames)
+            time.sleep(seconds)
+        try:
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+        finally:
+            if window:
+                tracemalloc.stop()
+    finally:
+        _memory_lock.release()
+
+    snapshot = snapshot.filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+    ])
+    stats = snapshot.statistics(group_by)
+    result = []
+    for stat in stats[:top]:
+        origin = stat.traceback[-1]  # Allocation site (tracebacks run oldest to newest)
+        entry = {
+            "location": origin.filename if group_by == "filename" else f"{origin.filename}:{origin.lineno}",
+            "size_kb": round(stat.size / 1024, 1),
+            "count": stat.count
+        }
+        if group_by == "traceback":
+            entry["traceback"] = stat.traceback.format()
+        result.append(entry)
+
+    return {
+        "mode": "window" if window else "process",
+        "seconds": seconds if window else None,
+        "total_kb": round(sum(s.size for s in stats) / 1024, 1),
+        "traced_current_kb": round(current / 1024, 1),
+        "traced_peak_kb": round(peak / 1024, 1),
+        "top": result
+    }
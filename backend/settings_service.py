@@ -0,0 +1,113 @@
+"""
+SafeGuard AI — Settings Service
+================================
+Holds the parsed app_config settings in memory with a version counter.
+GETs are answered from the cached JSON body (with an ETag), and every
+change is pushed to subscribers such as running VideoProcessors, so
+nothing has to poll the database or restart to pick it up.
+
+Usage:
+    settings = SettingsService(DB_PATH)
+    settings.subscribe(processor.apply_settings)   # called now and on every change
+    settings.update(new_config)
+"""
+
+import json
+import hashlib
+import sqlite3
+import threading
+
+
+class SettingsService:
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._config = {}
+        self._body = b"{}"
+        self._etag = None
+        self.version = 0
+        self._subscribers = []
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _set(self, config):
+        """Swap in a new config. Caller holds the lock."""
+        self._config = config
+        self._body = json.dumps(config).encode()
+        self._etag = hashlib.sha1(self._body).hexdigest()[:16]
+        self.version += 1
+        self._loaded = True
+
+    def _load(self):
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT value FROM settings WHERE key='app_config'").fetchone()
+        finally:
+            conn.close()
+        return json.loads(row[0]) if row else {}
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            config = self._load()
+            with self._lock:
+                if not self._loaded:
+                    self._set(config)
+
+    def get(self):
+        """Current (config, body, etag, version). Treat config as read-only."""
+        self._ensure_loaded()
+        with self._lock:
+            return self._config, self._body, self._etag, self.version
+
+    def update(self, config):
+        """Persist a new config and publish it to subscribers."""
+        conn = self._connect()
+        try:
+            conn.execute("INSERT OR REPLACE INTO settings (key, value) VALUES ('app_config', ?)", (json.dumps(config),))
+            conn.commit()
+        finally:
+            conn.close()
+        with self._lock:
+            self._set(config)
+            version = self.version
+        self._publish(config, version)
+        return version
+
+    def reload(self):
+        """Re-read the database, e.g. after an offline script changed it."""
+        config = self._load()
+        with self._lock:
+            self._set(config)
+            version = self.version
+        self._publish(config, version)
+        return version
+
+    def subscribe(self, callback):
+        """Call callback(config) now and after every change."""
+        config, _, _, _ = self.get()
+        with self._lock:
+            self._subscribers.append(callback)
+        self._safe_call(callback, config)
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    def _publish(self, config, version):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            self._safe_call(callback, config)
+        print(f"Settings v{version} applied to {len(subscribers)} subscribers")
+
+    @staticmethod
+    def _safe_call(callback, config):
+        try:
+            callback(config)
+        except Exception as e:
+            print(f"Error applying settings: {e}")
@@ -0,0 +1,118 @@
+"""
+SafeGuard AI — Startup Tracker
+===============================
+Runs the slow startup phases (model, Firebase, cameras) in background
+threads and records the state and cost of each one, so the HTTP server
+can bind immediately and report readiness through /api/health.
+
+Usage:
+    tracker = StartupTracker()
+    tracker.run_parallel({"model": load_model, "firebase": init_firebase})
+    tracker.wait_for("model")
+"""
+
+import time
+import threading
+
+PENDING = "pending"
+RUNNING = "running"
+READY = "ready"
+FAILED = "failed"
+
+
+class StartupTracker:
+    def __init__(self):
+        self.created_at = time.time()
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._events = {}
+        self._order = []
+        self._report_printed = False
+
+    def _event(self, name):
+        with self._lock:
+            if name not in self._events:
+                self._events[name] = threading.Event()
+                self._stages[name] = {"state": PENDING, "seconds": None, "error": None}
+                self._order.append(name)
+            return self._events[name]
+
+    def register(self, *names):
+        """Declare stages up front so /api/health lists them as pending."""
+        for name in names:
+            self._event(name)
+
+    def run_stage(self, name, fn):
+        """Run fn as the named stage, recording its duration and outcome."""
+        event = self._event(name)
+        with self._lock:
+            self._stages[name]["state"] = RUNNING
+        start = time.perf_counter()
+        try:
+            fn()
+        except Exception as e:
+            with self._lock:
+                self._stages[name].update(state=FAILED, error=str(e))
+            print(f"Startup stage '{name}' failed: {e}")
+        else:
+            with self._lock:
+                self._stages[name]["state"] = READY
+        finally:
+            with self._lock:
+                self._stages[name]["seconds"] = round(time.perf_counter() - start, 3)
+            event.set()
+            self._maybe_print_report()
+
+    def run_parallel(self, stages):
+        """Start each stage of a {name: fn} dict in its own daemon thread."""
+        self.register(*stages)
+        for name, fn in stages.items():
+            threading.Thread(
+                target=self.run_stage, args=(name, fn), name=f"startup-{name}", daemon=True
+            ).start()
+
+    def wait_for(self, name, timeout=None):
+        """Block until the stage finishes. Returns True only if it succeeded."""
+        self._event(name).wait(timeout)
+        with self._lock:
+            return self._stages[name]["state"] == READY
+
+    def is_ready(self):
+        with self._lock:
+            return all(s["state"] == READY for s in self._stages.values())
+
+    def is_finished(self):
+        with self._lock:
+            return all(s["state"] in (READY, FAILED) for s in self._stages.values())
+
+    def status(self):
+        """Overall status string: starting, healthy or degraded."""
+        with self._lock:
+            states = [s["state"] for s in self._stages.values()]
+        if any(s in (PENDING, RUNNING) for s in states):
+            return "starting"
+        if any(s == FAILED for s in states):
+            return "degraded"
+        return "healthy"
+
+    def snapshot(self):
+        with self._lock:
+            return {name: dict(self._stages[name]) for name in self._order}
+
+    def report(self):
+        """Human readable timing report of every stage."""
+        lines = ["Startup timing report:"]
+        for name, stage in self.snapshot().items():
+            seconds = f"{stage['seconds']:.3f}s" if stage["seconds"] is not None else "-"
+            lines.append(f"  {name:<12} {stage['state']:<8} {seconds}")
+        lines.append(f"  {'total':<12} {'':<8} {time.time() - self.created_at:.3f}s")
+        return "\n".join(lines)
+
+    def _maybe_print_report(self):
+        if not self.is_finished():
+            return
+        with self._lock:
+            if self._report_printed:
+                return
+            self._report_printed = True
+        print(self.report())
@@ -0,0 +1,206 @@
+"""
+SafeGuard AI — Stream Hub
+==========================
+Shared JPEG encoding for the MJPEG endpoints.
+
+Every camera frame is encoded at most once per stream variant (full,
+medium, thumb), no matter how many viewers are watching it; viewers of
+the same variant all get the cached bytes. Grid streams tile several
+cameras into one image at a capped frame rate and are likewise encoded
+once per tick for all of their viewers.
+"""
+
+import time
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from camera_config import DEFAULT_FRAME_SIZE
+
+# name -> (scale relative to the camera frame, JPEG quality)
+VARIANTS = {
+    "full": (1.0, 80),
+    "medium": (0.5, 70),
+    "thumb": (0.25, 60),
+}
+DEFAULT_VARIANT = "full"
+MAX_GRID_FPS = 15
+MAX_GRIDS = 16  # Distinct grid layouts kept encoding at once
+
+
+def encode_variant(frame, variant, buffer=None):
+    """Resize (if needed) and JPEG-encode frame for a variant. Returns bytes or None."""
+    scale, quality = VARIANTS[variant]
+    if scale != 1.0:
+        h, w = frame.shape[:2]
+        size = (max(1, int(w * scale)), max(1, int(h * scale)))
+        frame = cv2.resize(frame, size, dst=buffer, interpolation=cv2.INTER_AREA)
+    ok, buf = cv2.imencode(".jpg", frame, [int(cv2.IMWRITE_JPEG_QUALITY), quality])
+    return buf.tobytes() if ok else None
+
+
+class StreamEncoder:
+    """Per-camera cache of the latest encoded frame for each variant."""
+
+    def __init__(self, exchange):
+        self.exchange = exchange
+        self._cache = {}    # variant -> (version, jpeg bytes)
+        self._locks = {v: threading.Lock() for v in VARIANTS}
+        self._buffers = {}  # variant -> reusable resize buffer
+        self.encodes = dict.fromkeys(VARIANTS, 0)
+        self.served = dict.fromkeys(VARIANTS, 0)
+
+    def _buffer(self, variant, frame_shape):
+        """Reusable resize target for a variant, or None for full size."""
+        scale = VARIANTS[variant][0]
+        if scale == 1.0:
+            return None
+        shape = (max(1, int(frame_shape[0] * scale)), max(1, int(frame_shape[1] * scale)), 3)
+        buf = self._buffers.get(variant)
+        if buf is None or buf.shape != shape:
+            buf = self._buffers[variant] = np.empty(shape, dtype=np.uint8)
+        return buf
+
+    def get(self, variant, after_version, timeout=None):
+        """
+        Wait for a frame newer than after_version and return (version, jpeg),
+        encoding it only if no other viewer already has. None on timeout.
+        """
+        ref = self.exchange.wait_newer(after_version, timeout)
+        if ref is None:
+            return None
+        with ref, self._locks[variant]:
+            cached = self._cache.get(variant)
+            if cached is None or cached[0] < ref.version:
+                data = encode_variant(ref.array, variant, self._buffer(variant, ref.array.shape))
+                if data is None:
+                    return None
+                cached = (ref.version, data)
+                self._cache[variant] = cached
+                self.encodes[variant] += 1
+            self.served[variant] += 1
+            return cached
+
+    def get_stats(self):
+        return {"encodes": dict(self.encodes), "served": dict(self.served)}
+
+
+class GridStream:
+    """Several cameras tiled into one stream, composed at most `fps` times a second."""
+
+    def __init__(self, hub, cam_ids, cols, variant, fps):
+        self.hub = hub
+        self.cam_ids = cam_ids
+        self.cols = max(1, min(cols, len(cam_ids)))
+        self.rows = -(-len(cam_ids) // self.cols)
+        scale, self.quality = VARIANTS[variant]
+        self.tile_size = (int(DEFAULT_FRAME_SIZE[0] * scale), int(DEFAULT_FRAME_SIZE[1] * scale))
+        self.interval = 1.0 / fps
+
+        tw, th = self.tile_size
+        self._canvas = np.zeros((self.rows * th, self.cols * tw, 3), dtype=np.uint8)
+        self._tile = np.empty((th, tw, 3), dtype=np.uint8)
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._data = None
+        self._versions = None
+        self._last_compose = 0.0
+        self.encodes = 0
+        self.viewers = 0
+
+    def _compose(self):
+        tw, th = self.tile_size
+        versions = []
+        for i, cam_id in enumerate(self.cam_ids):
+            r, c = divmod(i, self.cols)
+            region = self._canvas[r * th:(r + 1) * th, c * tw:(c + 1) * tw]
+            ref = self.hub.read(cam_id)
+            if ref is None:
+                versions.append(None)
+                region[:] = 0
+                continue
+            with ref:
+                versions.append(ref.version)
+                cv2.resize(ref.array, self.tile_size, dst=self._tile, interpolation=cv2.INTER_AREA)
+            region[:] = self._tile
+            cv2.putText(region, cam_id, (6, 16), cv2.FONT_HERSHEY_SIMPLEX, 0.45, (255, 255, 255), 1)
+
+        # Nothing changed (e.g. all cameras paused): keep the previous encoding
+        if versions == self._versions and self._data is not None:
+            return
+        ok, buf = cv2.imencode(".jpg", self._canvas, [int(cv2.IMWRITE_JPEG_QUALITY), self.quality])
+        if ok:
+            self._versions = versions
+            self._data = buf.tobytes()
+            self._seq += 1
+            self.encodes += 1
+
+    def get(self, after_seq):
+        """Block until a composite newer than after_seq exists. Returns (seq, jpeg)."""
+        while True:
+            with self._lock:
+                if self._seq > after_seq:
+                    return self._seq, self._data
+                wait = self._last_compose + self.interval - time.monotonic()
+                if wait <= 0:
+                    self._last_compose = time.monotonic()
+                    self._compose()
+                    if self._seq > after_seq:
+                        return self._seq, self._data
+                    wait = self.interval
+            time.sleep(wait)
+
+
+class StreamHub:
+    def __init__(self, processors):
+        self.processors = processors
+        self._encoders = {}
+        self._grids = OrderedDict()
+        self._lock = threading.Lock()
+
+    def read(self, cam_id):
+        p = self.processors.get(cam_id)
+        return p.frames.read() if p else None
+
+    def encoder(self, cam_id):
+        with self._lock:
+            enc = self._encoders.get(cam_id)
+            p = self.processors.get(cam_id)
+            if p and (enc is None or enc.exchange is not p.frames):
+                enc = self._encoders[cam_id] = StreamEncoder(p.frames)
+            return enc
+
+    def grid(self, cam_ids, cols, variant, fps):
+        """Shared GridStream for this layout, created on first request."""
+        fps = max(0.5, min(float(fps), MAX_GRID_FPS))
+        key = (tuple(cam_ids), cols, variant, fps)
+        with self._lock:
+            grid = self._grids.get(key)
+            if grid is None:
+                grid = self._grids[key] = GridStream(self, list(cam_ids), cols, variant, fps)
+                # Drop the least recently requested layout without viewers
+                if len(self._grids) > MAX_GRIDS:
+                    for old_key, old in self._grids.items():
+                        if old.viewers == 0 and old_key != key:
+                            del self._grids[old_key]
+                            break
+            self._grids.move_to_end(key)
+            return grid
+
+    def add_grid_viewer(self, grid, delta=1):
+        """Count a viewer joining (1) or leaving (-1); grid() reads the count under the same lock."""
+        with self._lock:
+            grid.viewers += delta
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                "cameras": {cam_id: enc.get_stats() for cam_id, enc in self._encoders.items()},
+                "grids": [
+                    {"cameras": list(k[0]), "cols": k[1], "variant": k[2], "fps": k[3],
+                     "viewers": g.viewers, "encodes": g.encodes}
+                    for k, g in self._grids.items()
+                ]
+            }
@@ -0,0 +1,126 @@
+"""
+SafeGuard AI — Synthetic Video Source
+======================================
+A stand-in for cv2.VideoCapture that draws a simple moving scene: figures
+walking across a floor, some wearing a yellow helmet and an orange vest
+and some not. It lets VideoProcessor, the stream endpoints and load tests
+run without camera hardware or the Windows video files.
+
+Used wherever a camera source is a synthetic:// URL, e.g. in cameras.json:
+    {"cam01": "synthetic://dock?people=6&size=1280x720&seed=2"}
+
+Query options: people (default 4), size (WxH, default 640x360), seed,
+fps (reported by get(CAP_PROP_FPS), default 15) and frames (end of
+"file" after this many frames, default 0 = never).
+"""
+
+from urllib.parse import urlsplit, parse_qs
+
+import cv2
+import numpy as np
+
+SCHEME = "synthetic://"
+
+HELMET = (0, 220, 255)   # BGR yellow
+VEST = (0, 140, 255)     # BGR orange
+SHIRT = (160, 90, 40)    # BGR blue
+SKIN = (120, 160, 210)
+
+
+def is_synthetic(source):
+    return isinstance(source, str) and source.startswith(SCHEME)
+
+
+class _Figure:
+    def __init__(self, rng, width, height):
+        self.h = int(height * rng.uniform(0.3, 0.5))
+        self.w = max(4, self.h // 3)
+        self.x = float(rng.uniform(0, width - self.w))
+        self.y = int(rng.uniform(height * 0.3, height - self.h))
+        self.speed = float(rng.uniform(1.0, 4.0)) * rng.choice([-1, 1])
+        self.helmet = bool(rng.random() < 0.7)
+        self.vest = bool(rng.random() < 0.7)
+
+    def step(self, width):
+        self.x += self.speed
+        if self.x < 0 or self.x + self.w > width:
+            self.speed = -self.speed
+            self.x = min(max(self.x, 0), width - self.w)
+
+    def draw(self, frame):
+        x, y, w, h = int(self.x), self.y, self.w, self.h
+        head = max(3, h // 8)
+        cx = x + w // 2
+        cv2.circle(frame, (cx, y + head), head, SKIN, -1)
+        if self.helmet:
+            cv2.ellipse(frame, (cx, y + head), (head + 2, head), 0, 180, 360, HELMET, -1)
+        cv2.rectangle(frame, (x, y + 2 * head), (x + w, y + h // 2 + head), VEST if self.vest else SHIRT, -1)
+        cv2.rectangle(frame, (x + w // 6, y + h // 2 + head), (x + w - w // 6, y + h), (60, 60, 60), -1)
+
+
+class SyntheticCapture:
+    """The parts of the cv2.VideoCapture interface that VideoProcessor uses."""
+
+    def __init__(self, width=640, height=360, people=4, seed=0, fps=15, frames=0):
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.frames = frames
+        self.seed = seed
+        self.people = people
+        self._background = np.full((height, width, 3), 90, dtype=np.uint8)
+        self._background[: height // 3] = 140  # Back wall above the floor
+        self._frame = np.empty_like(self._background)
+        self._opened = True
+        self._reset()
+
+    @classmethod
+    def from_url(cls, url):
+        query = {k: v[-1] for k, v in parse_qs(urlsplit(url).query).items()}
+        width, height = (int(v) for v in query.get("size", "640x360").lower().split("x"))
+        return cls(width, height, people=int(query.get("people", 4)), seed=int(query.get("seed", 0)),
+                   fps=float(query.get("fps", 15)), frames=int(query.get("frames", 0)))
+
+    def _reset(self):
+        rng = np.random.default_rng(self.seed)
+        self._figures = [_Figure(rng, self.width, self.height) for _ in range(self.people)]
+        self._index = 0
+
+    def isOpened(self):
+        return self._opened
+
+    def read(self):
+        """Next frame. The returned array is reused by the following read()."""
+        if not self._opened or (self.frames and self._index >= self.frames):
+            return False, None
+        np.copyto(self._frame, self._background)
+        for figure in self._figures:
+            figure.step(self.width)
+            figure.draw(self._frame)
+        self._index += 1
+        return True, self._frame
+
+    def set(self, prop, value):
+        if prop == cv2.CAP_PROP_POS_FRAMES and int(value) == 0:
+            self._reset()
+            return True
+        return False
+
+    def get(self, prop):
+        return {
+            cv2.CAP_PROP_FPS: self.fps,
+            cv2.CAP_PROP_FRAME_WIDTH: self.width,
+            cv2.CAP_PROP_FRAME_HEIGHT: self.height,
+            cv2.CAP_PROP_FRAME_COUNT: self.frames,
+            cv2.CAP_PROP_POS_FRAMES: self._index,
+        }.get(prop, 0.0)
+
+    def release(self):
+        self._opened = False
+
+
+def open_capture(source):
+    """cv2.VideoCapture for real sources, SyntheticCapture for synthetic:// URLs."""
+    if is_synthetic(source):
+        return SyntheticCapture.from_url(source)
+    return cv2.VideoCapture(source)
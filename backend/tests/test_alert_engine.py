@@ -0,0 +1,84 @@
+import sqlite3
+import time
+
+import pytest
+
+from alert_engine import AlertEngine, CameraStalledRule
+from event_bus import bus
+
+ALERTS = """CREATE TABLE alerts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, type TEXT, time TEXT, title TEXT, zone TEXT, worker TEXT,
+    color TEXT, read INT DEFAULT 0, created_at TEXT DEFAULT CURRENT_TIMESTAMP, camera_id TEXT, rule TEXT)"""
+
+
+def opened(camera="cam01", zone="Dock 2"):
+    return {"camera_id": camera, "zone": zone, "type": "No Helmet", "severity": "Medium"}
+
+
+@pytest.fixture
+def raised():
+    """Alerts published on the event bus after they were written."""
+    alerts = []
+
+    def collect(topic, data):
+        if topic == "alert.raised":
+            alerts.append(data)
+
+    bus.subscribe(collect)
+    yield alerts
+    bus.unsubscribe(collect)
+
+
+@pytest.fixture
+def engine(tmp_path, raised):
+    path = str(tmp_path / "alerts.db")
+    conn = sqlite3.connect(path)
+    conn.execute(ALERTS)
+    conn.close()
+    engine = AlertEngine(path, flush_interval=0.01)
+    engine.start()
+    yield engine
+    bus.unsubscribe(engine.handle)
+
+
+def written(engine, count):
+    """Rows in the alerts table once `count` alerts have been flushed."""
+    deadline = time.time() + 2
+    while time.time() < deadline:
+        stats = engine.get_stats()
+        if stats["written"] >= count and stats["pending"] == 0:
+            break
+        time.sleep(0.01)
+    conn = sqlite3.connect(engine.db_path)
+    try:
+        return conn.execute("SELECT zone, camera_id, rule, worker, color FROM alerts ORDER BY id").fetchall()
+    finally:
+        conn.close()
+
+
+def test_zone_scoped_burst_rule_fires_for_its_zone(engine, raised):
+    engine.apply_settings({"alertRules": [{"type": "violation_burst", "count": 0, "minutes": 1, "zone": "Dock 2"}]})
+    bus.publish("violation.opened", opened(zone="Loader"))
+    bus.publish("violation.opened", opened())
+    assert written(engine, 1) == [("Dock 2", "cam01", "violation_burst-1", None, "rose")]
+    assert [(a["zone"], a["rule"]) for a in raised] == [("Dock 2", "violation_burst-1")]
+    assert "worker" not in raised[0]
+
+
+def test_burst_alerts_are_deduplicated_within_cooldown(engine, raised):
+    engine.apply_settings({"alertRules": [{"type": "violation_burst", "count": 1, "minutes": 5}]})
+    for _ in range(5):
+        bus.publish("violation.opened", opened())
+    assert len(written(engine, 1)) == 1
+    assert len(raised) == 1
+    assert engine.get_stats()["suppressed"] == 3
+
+
+def test_stalled_rule_uses_frame_age_not_fps():
+    rule = CameraStalledRule("stalled", seconds=30)
+    # fps keeps its last value once frames stop, so only the frame age shows the stall
+    assert rule.evaluate({"camera_id": "cam01", "fps": 15.9, "frame_age": 5.0}, 0) is None
+    assert rule.evaluate({"camera_id": "cam01", "fps": 15.9, "frame_age": 31.0, "paused": True}, 0) is None
+    key, title, zone = rule.evaluate({"camera_id": "cam01", "fps": 15.9, "frame_age": 31.0}, 0)
+    assert (key, zone) == ("cam01", "cam01")
+    assert "31s" in title
@@ -0,0 +1,47 @@
+import cv2
+import numpy as np
+import pytest
+
+import analyze_video
+
+
+class OnePersonDetector:
+    """One person per frame, wearing a helmet but no vest; unchecked items are None."""
+
+    def detect_batch(self, frames, check_helmet=True, check_vest=True, imgsz=None):
+        person = {"bbox": [10, 10, 20, 40], "conf": 0.9,
+                  "helmet": True if check_helmet else None, "vest": False if check_vest else None}
+        person["status"] = "Violation" if person["vest"] is False else "Compliant"
+        return [[dict(person)] for _ in frames]
+
+
+@pytest.fixture
+def video(tmp_path):
+    path = str(tmp_path / "clip.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 10, (64, 48))
+    for _ in range(4):
+        writer.write(np.zeros((48, 64, 3), dtype=np.uint8))
+    writer.release()
+    return path
+
+
+def analyze(video, tmp_path, monkeypatch, check_helmet, check_vest):
+    monkeypatch.setattr(analyze_video, "_detector", OnePersonDetector())
+    seg_path = str(tmp_path / "seg.npz")
+    analyze_video._analyze_segment(video, 0, 0, 4, 1, check_helmet, check_vest, seg_path)
+    with np.load(seg_path) as data:
+        return {key: data[key] for key in data.files}
+
+
+def test_checked_items_are_stored_per_detection(video, tmp_path, monkeypatch):
+    columns = analyze(video, tmp_path, monkeypatch, True, True)
+    assert columns["det_helmet"].tolist() == [True] * 4
+    assert columns["det_vest"].tolist() == [False] * 4
+    assert columns["frame_no_vest"].tolist() == [1] * 4
+
+
+def test_unchecked_item_is_left_out_instead_of_reading_as_missing(video, tmp_path, monkeypatch):
+    columns = analyze(video, tmp_path, monkeypatch, True, False)
+    assert "det_vest" not in columns
+    assert columns["frame_no_vest"].tolist() == [0] * 4
+    assert columns["det_violation"].tolist() == [False] * 4
@@ -0,0 +1,13 @@
+import importlib
+
+import app as backend
+
+
+def test_importing_asgi_app_starts_nothing(monkeypatch):
+    calls = []
+    monkeypatch.setattr(backend, "create_app", lambda *a, **kw: calls.append("create_app"))
+    monkeypatch.setattr(backend, "start_background", lambda **kw: calls.append("start_background"))
+    import asgi_app
+    importlib.reload(asgi_app)
+    assert calls == []
+    assert callable(asgi_app.create_asgi_app)
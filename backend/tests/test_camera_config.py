@@ -0,0 +1,27 @@
+from camera_config import CameraConfig, RegionOfInterest, Zone
+
+
+def detection(bbox):
+    return {"bbox": list(bbox), "conf": 0.9, "status": "Compliant"}
+
+
+def test_default_zone_keeps_box_touching_frame_bottom():
+    roi = RegionOfInterest(CameraConfig("cam01", "synthetic://cam01"))
+    mapped = roi.to_frame([detection([100, 200, 50, 160])])
+    assert [d["zone"] for d in mapped] == ["cam01"]
+
+
+def test_default_zone_keeps_box_past_frame_edges():
+    roi = RegionOfInterest(CameraConfig("cam01", "synthetic://cam01"))
+    mapped = roi.to_frame([detection([600, 250, 60, 120]), detection([-10, 0, 30, 400])])
+    assert len(mapped) == 2
+
+
+def test_configured_zone_still_filters():
+    config = CameraConfig("cam01", "synthetic://cam01",
+                          zones=[Zone("Floor", [[0, 180], [320, 180], [320, 360], [0, 360]])])
+    roi = RegionOfInterest(config)
+    x, y = roi.rect[:2]
+    inside = detection([100 - x, 200 - y, 50, 160])
+    outside = detection([500 - x, 200 - y, 50, 160])
+    assert [d["zone"] for d in roi.to_frame([inside, outside])] == ["Floor"]
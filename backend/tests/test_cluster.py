@@ -0,0 +1,118 @@
+import json
+import sqlite3
+
+import pytest
+
+import app as backend
+import cluster
+import firebase_auth
+from camera_config import CameraConfig
+from cluster import Coordinator, install_coordinator
+from firebase_auth import FakeTokenVerifier, InMemoryRoleStore, service_headers
+
+TOKEN = "cluster-secret"
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cluster.time, "time", lambda: now[0])
+    return now
+
+
+def coordinator(cameras=4):
+    configs = {f"cam{i:02d}": CameraConfig(f"cam{i:02d}", f"cam{i}.mp4") for i in range(cameras)}
+    return Coordinator(configs, node_timeout=10)
+
+
+def owned(coord):
+    owners = {}
+    for cam_id, node_id in coord.assignment.items():
+        owners.setdefault(node_id, []).append(cam_id)
+    return {node_id: sorted(cams) for node_id, cams in owners.items()}
+
+
+def test_cameras_move_to_live_nodes_after_missed_heartbeats(clock):
+    coord = coordinator()
+    coord.heartbeat("n1", "http://n1", {})
+    coord.heartbeat("n2", "http://n2", {})
+    assert sorted(len(cams) for cams in owned(coord).values()) == [2, 2]
+    version, rebalances = coord.version, coord.rebalances
+
+    clock[0] += 5
+    coord.heartbeat("n1", "http://n1", {})
+    assert set(owned(coord)) == {"n1", "n2"}  # n2 is late but not yet timed out
+
+    clock[0] += 6
+    reply = coord.heartbeat("n1", "http://n1", {})
+    assert owned(coord) == {"n1": ["cam00", "cam01", "cam02", "cam03"]}
+    assert sorted(reply["cameras"]) == ["cam00", "cam01", "cam02", "cam03"]
+    assert reply["version"] > version
+    assert coord.rebalances == rebalances + 1
+    assert coord.node_url("cam03") == "http://n1"
+
+
+def test_new_node_takes_cameras_until_the_spread_is_even(clock):
+    coord = coordinator(cameras=5)
+    coord.heartbeat("n1", "http://n1", {})
+    assert len(owned(coord)["n1"]) == 5
+
+    coord.heartbeat("n2", "http://n2", {})
+    assert sorted(len(cams) for cams in owned(coord).values()) == [2, 3]
+
+
+@pytest.fixture
+def auth(monkeypatch):
+    # monkeypatch restores the real verifier, role store and service token afterwards
+    monkeypatch.setattr(firebase_auth, "_token_verifier", FakeTokenVerifier())
+    monkeypatch.setattr(firebase_auth, "_role_store", InMemoryRoleStore({"staff-1": {"role": "staff"}}))
+    monkeypatch.setattr(firebase_auth, "_firebase_initialized", True)
+    monkeypatch.setattr(firebase_auth, "_firebase_init_attempted", True)
+    monkeypatch.setattr(firebase_auth, "_service_token", TOKEN)
+    monkeypatch.setattr(cluster, "CLUSTER_TOKEN", TOKEN)
+    firebase_auth.invalidate_role()
+    yield
+    firebase_auth.invalidate_role()
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    path = str(tmp_path / "cluster.db")
+    sqlite3.connect(path).close()
+    monkeypatch.setattr(backend, "DB_PATH", path)
+
+
+def test_node_rejects_forged_service_credentials(auth, db):
+    client = backend.create_app(start_background_tasks=False).test_client()
+    url = "/api/cameras/cam01/pause"
+
+    resp = client.post(url, headers=service_headers("wrong", "staff-1", "staff"))
+    assert resp.status_code == 401
+    assert resp.get_json()["error"] == "Invalid service credentials"
+    assert client.post(url, headers=service_headers(TOKEN, "staff-1", "superuser")).status_code == 401
+    assert client.post(url, headers=service_headers(TOKEN, "viewer-1", "viewer")).status_code == 403
+    # Accepted: the node itself then reports the camera isn't running there
+    assert client.post(url, headers=service_headers(TOKEN, "staff-1", "staff")).status_code == 404
+
+
+def test_coordinator_checks_the_cluster_token_and_forwards_without_user_tokens(auth, db, clock, monkeypatch):
+    coord = coordinator(cameras=1)
+    app = backend.create_app(start_background_tasks=False)
+    install_coordinator(app, coord)
+    client = app.test_client()
+
+    beat = {"node_id": "n1", "url": "http://n1", "cameras": {}}
+    assert client.post("/api/cluster/heartbeat", json=beat).status_code == 403
+    assert client.post("/api/cluster/heartbeat", json=beat,
+                       headers={firebase_auth.SERVICE_TOKEN_HEADER: "wrong"}).status_code == 403
+    resp = client.post("/api/cluster/heartbeat", json=beat, headers={firebase_auth.SERVICE_TOKEN_HEADER: TOKEN})
+    assert resp.status_code == 200
+    assert list(resp.get_json()["cameras"]) == ["cam00"]
+
+    sent = []
+    monkeypatch.setattr(cluster, "http_json", lambda url, payload, method, headers: (
+        sent.append((url, headers)) or (200, json.dumps({"success": True}).encode())
+    ))
+    resp = client.post("/api/cameras/cam00/pause", headers={"Authorization": "Bearer fake:staff-1"})
+    assert resp.status_code == 200
+    assert sent == [("http://n1/api/cameras/cam00/pause", service_headers(TOKEN, "staff-1", "staff"))]
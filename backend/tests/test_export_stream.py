@@ -0,0 +1,82 @@
+import csv
+import gzip
+import io
+import json
+import sqlite3
+
+import pytest
+
+import app as backend
+from export_stream import iter_query, ndjson_chunks, stream_export
+
+ROWS = [
+    ("VIO-1", "No Helmet", "cam01", "2026-03-01 08:00:00"),
+    ("VIO-2", "No Vest", "cam02", "2026-03-01 23:59:59"),
+    ("VIO-3", "No Helmet", "cam01", "2026-03-02 00:00:00"),
+    ("VIO-4", "No Helmet", "cam03", "2026-03-03 12:00:00"),
+]
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    path = str(tmp_path / "export.db")
+    conn = sqlite3.connect(path)
+    conn.execute("""CREATE TABLE violations (
+        id TEXT PRIMARY KEY, date TEXT, time TEXT, worker TEXT, worker_id TEXT, type TEXT,
+        severity TEXT, zone TEXT, camera_id TEXT, status TEXT, snapshot TEXT, created_at TEXT)""")
+    conn.executemany("INSERT INTO violations (id, type, camera_id, created_at) VALUES (?, ?, ?, ?)", ROWS)
+    conn.commit()
+    conn.close()
+    monkeypatch.setattr(backend, "DB_PATH", path)
+    return path
+
+
+@pytest.fixture
+def client(db):
+    return backend.create_app(start_background_tasks=False).test_client()
+
+
+def ids_from_csv(body):
+    return [row["id"] for row in csv.DictReader(io.StringIO(body.decode()))]
+
+
+def test_csv_export_filters_by_date_range_inclusive(client):
+    resp = client.get("/api/export/violations?from=2026-03-01&to=2026-03-02")
+    assert resp.status_code == 200
+    assert resp.mimetype == "text/csv"
+    assert "Content-Encoding" not in resp.headers
+    # Newest first; the last second of the "to" day is included, the next day is not
+    assert ids_from_csv(resp.get_data()) == ["VIO-3", "VIO-2", "VIO-1"]
+
+
+def test_ndjson_export_filters_by_camera(client):
+    resp = client.get("/api/export/violations?format=ndjson&camera=cam01,cam03")
+    assert resp.mimetype == "application/x-ndjson"
+    rows = [json.loads(line) for line in resp.get_data().decode().splitlines()]
+    assert [(r["id"], r["camera_id"]) for r in rows] == [("VIO-4", "cam03"), ("VIO-3", "cam01"), ("VIO-1", "cam01")]
+    assert set(rows[0]) == set(backend.VIOLATION_EXPORT_COLUMNS)
+
+
+def test_export_is_gzipped_when_accepted(client):
+    resp = client.get("/api/export/violations?camera=cam02", headers={"Accept-Encoding": "gzip"})
+    assert resp.headers["Content-Encoding"] == "gzip"
+    assert resp.headers["Vary"] == "Accept-Encoding"
+    assert ids_from_csv(gzip.decompress(resp.get_data())) == ["VIO-2"]
+
+
+@pytest.mark.parametrize("query", ["format=xml", "from=03/01/2026", "to=2026-13-01"])
+def test_bad_export_parameters_are_rejected(client, query):
+    assert client.get(f"/api/export/violations?{query}").status_code == 400
+
+
+def test_rows_are_streamed_in_chunks(db):
+    row_chunks = list(iter_query(db, "SELECT id FROM violations ORDER BY id", chunk_rows=3))
+    assert row_chunks == [[("VIO-1",), ("VIO-2",), ("VIO-3",)], [("VIO-4",)]]
+    assert list(ndjson_chunks(["id"], row_chunks)) == [
+        b'{"id": "VIO-1"}\n{"id": "VIO-2"}\n{"id": "VIO-3"}\n', b'{"id": "VIO-4"}\n'
+    ]
+
+
+def test_empty_csv_export_still_has_a_header(db):
+    empty = b"".join(stream_export(db, "SELECT id FROM violations WHERE 0", (), ["id"], "csv", gzip=True))
+    assert gzip.decompress(empty) == b"id\r\n"
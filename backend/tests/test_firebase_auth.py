@@ -0,0 +1,74 @@
+import pytest
+
+import firebase_auth
+from firebase_auth import InMemoryRoleStore, get_user_role, invalidate_role, set_role_store
+
+
+class FlakyRoleStore(InMemoryRoleStore):
+    """Fails every lookup while `down` is set, like an unreachable Firestore."""
+
+    def __init__(self, users=None):
+        super().__init__(users)
+        self.down = False
+
+    def get_user(self, uid):
+        if self.down:
+            self.reads += 1
+            raise RuntimeError("role store unavailable")
+        return super().get_user(uid)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(firebase_auth.time, "time", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def store(clock):
+    store = FlakyRoleStore({"uid-1": {"role": "staff"}})
+    set_role_store(store)
+    yield store
+    set_role_store(firebase_auth.FirestoreRoleStore())
+
+
+def test_role_is_cached_until_ttl(store, clock):
+    assert get_user_role("uid-1") == "staff"
+    assert get_user_role("uid-1") == "staff"
+    assert store.reads == 1
+
+    clock[0] += firebase_auth.ROLE_CACHE_TTL + 1
+    assert get_user_role("uid-1") == "staff"
+    assert store.reads == 2
+
+
+def test_invalidate_drops_cached_role(store):
+    assert get_user_role("uid-1") == "staff"
+    store.users["uid-1"]["role"] = "admin"
+    assert get_user_role("uid-1") == "staff"
+    invalidate_role("uid-1")
+    assert get_user_role("uid-1") == "admin"
+
+
+def test_unknown_and_disabled_users_are_cached(store):
+    store.users["uid-2"] = {"role": "admin", "status": "disabled"}
+    assert get_user_role("uid-2") is None
+    assert get_user_role("nobody") is None
+    reads = store.reads
+    assert get_user_role("uid-2") is None
+    assert get_user_role("nobody") is None
+    assert store.reads == reads
+
+
+def test_lookup_failures_are_not_cached(store):
+    store.down = True
+    assert get_user_role("uid-1") is None
+    store.down = False
+    assert get_user_role("uid-1") == "staff"
+
+
+def test_firestore_store_raises_when_client_unavailable(monkeypatch):
+    monkeypatch.setattr(firebase_auth, "get_firestore_client", lambda: None)
+    with pytest.raises(RuntimeError):
+        firebase_auth.FirestoreRoleStore().get_user("uid-1")
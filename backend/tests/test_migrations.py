@@ -0,0 +1,76 @@
+import sqlite3
+
+import pytest
+
+import app as backend
+
+OLD_VIOLATIONS = """CREATE TABLE violations (
+    id TEXT PRIMARY KEY, date TEXT, time TEXT, worker TEXT, worker_id TEXT, type TEXT,
+    severity TEXT, zone TEXT, camera_id TEXT, status TEXT, snapshot TEXT,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP)"""
+OLD_ALERTS = """CREATE TABLE alerts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, type TEXT, time TEXT, title TEXT, zone TEXT,
+    worker TEXT, color TEXT, read INT DEFAULT 0, created_at TEXT DEFAULT CURRENT_TIMESTAMP)"""
+OLD_METRICS = """CREATE TABLE metrics_log (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, camera_id TEXT, total_tracked INT, active_violations INT,
+    compliance_rate REAL, fps REAL, created_at TEXT DEFAULT CURRENT_TIMESTAMP)"""
+
+
+def columns(path, table):
+    conn = sqlite3.connect(path)
+    try:
+        return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def old_db(tmp_path, monkeypatch):
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    for ddl in (OLD_VIOLATIONS, OLD_ALERTS, OLD_METRICS):
+        conn.execute(ddl)
+    conn.execute("INSERT INTO violations (id, type, camera_id) VALUES ('VIO-1', 'No Helmet', 'cam01')")
+    conn.commit()
+    conn.close()
+    monkeypatch.setattr(backend, "DB_PATH", path)
+    return path
+
+
+def test_start_background_migrates_before_starting_anything(old_db, monkeypatch):
+    seen = {}
+
+    def record_schema(phases):
+        seen["violations"] = columns(old_db, "violations")
+
+    monkeypatch.setattr(backend, "_background_started", False)
+    monkeypatch.setattr(backend.startup, "run_parallel", record_schema)
+    monkeypatch.setattr(backend, "start_alert_engine", lambda: None)
+    monkeypatch.setattr(backend, "background_metrics_updater", lambda: None)
+    backend.start_background()
+
+    assert {"started_at", "ended_at", "duration", "clip"} <= seen["violations"]
+    assert {"camera_id", "rule"} <= columns(old_db, "alerts")
+
+
+def test_failed_metrics_pass_does_not_hold_the_database_lock(old_db, monkeypatch):
+    # The old violations table has no clip column, so the cleanup query fails mid-transaction
+    class Stop(Exception):
+        pass
+
+    def stop(seconds):
+        raise Stop
+
+    monkeypatch.setattr(backend.time, "sleep", stop)
+    with pytest.raises(Stop):
+        backend.background_metrics_updater()
+
+    backend.init_db()
+    assert "clip" in columns(old_db, "violations")
+
+
+def test_export_works_on_migrated_old_database(old_db):
+    client = backend.create_app(start_background_tasks=False).test_client()
+    resp = client.get("/api/export/violations?format=ndjson")
+    assert resp.status_code == 200
+    assert b'"id": "VIO-1"' in resp.get_data()
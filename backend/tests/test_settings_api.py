@@ -0,0 +1,79 @@
+import sqlite3
+
+import pytest
+
+import app as backend
+import firebase_auth
+from firebase_auth import FakeTokenVerifier, InMemoryRoleStore
+from settings_service import SettingsService
+from video_processor import VideoProcessor
+
+ADMIN = {"Authorization": "Bearer fake:admin-1"}
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    # monkeypatch restores the real verifier and role store afterwards
+    monkeypatch.setattr(firebase_auth, "_token_verifier", FakeTokenVerifier())
+    monkeypatch.setattr(firebase_auth, "_role_store", InMemoryRoleStore({"admin-1": {"role": "admin"}}))
+    monkeypatch.setattr(firebase_auth, "_firebase_initialized", True)
+    monkeypatch.setattr(firebase_auth, "_firebase_init_attempted", True)
+    firebase_auth.invalidate_role()
+
+    path = str(tmp_path / "settings.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE settings (key TEXT PRIMARY KEY, value TEXT)")
+    conn.commit()
+    conn.close()
+    monkeypatch.setattr(backend, "DB_PATH", path)
+    monkeypatch.setattr(backend, "settings", SettingsService(path))
+    yield backend.create_app(start_background_tasks=False).test_client()
+    firebase_auth.invalidate_role()
+
+
+def test_valid_alert_rules_are_saved(client):
+    rules = [{"type": "camera_stalled", "seconds": 10}]
+    resp = client.put("/api/settings", json={"alertRules": rules}, headers=ADMIN)
+    assert resp.status_code == 200
+    assert backend.settings.get()[0]["alertRules"] == rules
+
+
+@pytest.mark.parametrize("rules", [
+    {"type": "camera_stalled"},
+    ["camera_stalled"],
+    [{"type": "no_such_rule"}],
+    [{"type": "violation_burst", "count": "many"}],
+    [{"type": "low_compliance", "severity": "Urgent"}],
+])
+def test_invalid_alert_rules_are_rejected(client, rules):
+    resp = client.put("/api/settings", json={"alertRules": rules}, headers=ADMIN)
+    assert resp.status_code == 400
+    assert "alertRules" not in backend.settings.get()[0]
+
+
+@pytest.mark.parametrize("body", [
+    {"confidenceThreshold": "high"},
+    {"confidenceThreshold": 75},
+    {"detectionTargets": {"helmet": "yes"}},
+    {"inferenceFrequency": "fast"},
+    {"violationEvents": {"openFrames": 0}},
+    {"ppeColors": {"helmet": [{"lower": [20, 80, 80]}]}},
+    {"ppeColors": {"vest": [{"lower": [0, 90, 90], "upper": [200, 255, 255]}]}},
+    {"colorThreshold": 3},
+])
+def test_invalid_detection_settings_are_rejected(client, body):
+    resp = client.put("/api/settings", json=body, headers=ADMIN)
+    assert resp.status_code == 400
+    assert backend.settings.get()[0] == {}
+
+
+def test_processor_applies_settings_all_or_nothing():
+    processor = VideoProcessor("missing.mp4")
+    processor.apply_settings({"detectionTargets": {"helmet": False}, "confidenceThreshold": 0.5,
+                              "inferenceFrequency": "5fps"})
+    assert (processor.check_helmet, processor.min_confidence, processor.detect_every) == (False, 0.5, 3)
+    version = processor.settings_version
+
+    processor.apply_settings({"detectionTargets": {"helmet": True, "vest": False}, "confidenceThreshold": "high"})
+    assert (processor.check_helmet, processor.check_vest, processor.min_confidence) == (False, True, 0.5)
+    assert processor.settings_version == version
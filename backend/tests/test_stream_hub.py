@@ -0,0 +1,84 @@
+import threading
+from types import SimpleNamespace
+
+from frame_exchange import FrameExchange
+from stream_hub import MAX_GRIDS, StreamHub
+
+SHAPE = (360, 640, 3)
+
+
+def publish(exchange, value):
+    slot = exchange.acquire()
+    slot.array[:] = value
+    return exchange.publish(slot)
+
+
+def hub_with(*cam_ids):
+    processors = {cam_id: SimpleNamespace(frames=FrameExchange(SHAPE)) for cam_id in cam_ids}
+    return StreamHub(processors), processors
+
+
+def test_each_variant_is_encoded_once_per_frame_for_all_viewers():
+    hub, processors = hub_with("cam01")
+    encoder = hub.encoder("cam01")
+    assert hub.encoder("cam01") is encoder
+    publish(processors["cam01"].frames, 50)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(encoder.get("thumb", 0, timeout=1)))
+               for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len({data for _, data in results}) == 1
+    assert encoder.encodes["thumb"] == 1 and encoder.served["thumb"] == 8
+
+    encoder.get("full", 0, timeout=1)
+    assert encoder.encodes == {"full": 1, "medium": 0, "thumb": 1}
+
+    version = publish(processors["cam01"].frames, 200)
+    assert encoder.get("thumb", version - 1, timeout=1)[0] == version
+    assert encoder.encodes["thumb"] == 2
+
+
+def test_grid_is_shared_and_reencoded_only_for_new_frames():
+    hub, processors = hub_with("cam01", "cam02")
+    grid = hub.grid(["cam01", "cam02"], 2, "thumb", 15)
+    assert hub.grid(["cam01", "cam02"], 2, "thumb", 15) is grid
+    publish(processors["cam01"].frames, 80)
+
+    seq, data = grid.get(0)
+    assert grid.get(0) == (seq, data)  # Later viewers get the cached composite
+    assert grid.encodes == 1
+
+    publish(processors["cam02"].frames, 120)
+    assert grid.get(seq)[0] == seq + 1
+    assert grid.encodes == 2
+
+
+def test_grid_viewers_are_counted_under_the_hub_lock():
+    hub, _ = hub_with("cam01")
+    watched = hub.grid(["cam01"], 1, "thumb", 5)
+
+    def viewers_come_and_go():
+        for _ in range(500):
+            hub.add_grid_viewer(watched)
+            hub.add_grid_viewer(watched, -1)
+        hub.add_grid_viewer(watched)
+
+    def churn_layouts():
+        for fps in range(1, 200):
+            hub.grid(["cam01"], 1, "medium", fps / 20)
+
+    threads = [threading.Thread(target=viewers_come_and_go) for _ in range(8)]
+    threads += [threading.Thread(target=churn_layouts) for _ in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert watched.viewers == 8
+    # A layout with viewers is never evicted, however many others were requested
+    assert hub.grid(["cam01"], 1, "thumb", 5) is watched
+    assert len(hub.get_stats()["grids"]) == MAX_GRIDS
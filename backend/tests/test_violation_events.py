@@ -0,0 +1,64 @@
+import time
+
+import pytest
+
+from violation_events import ViolationEventTracker, parse_event_settings, severity_of, violation_type_of
+
+
+def violation(bbox=(100, 100, 50, 150), zone="Dock 2"):
+    return {"bbox": list(bbox), "conf": 0.8, "status": "Violation",
+            "helmet": False, "vest": True, "zone": zone}
+
+
+def test_opened_event_carries_zone_type_and_severity():
+    opened = []
+    tracker = ViolationEventTracker("cam01", open_k=2, window_n=3,
+                                    on_open=lambda e: opened.append(e.to_dict()))
+    for i in range(3):
+        tracker.update([violation()], None, 1000.0 + i)
+    assert len(opened) == 1
+    assert opened[0]["zone"] == "Dock 2"
+    assert opened[0]["type"] == "No Helmet"
+    assert opened[0]["severity"] == "Medium"
+
+
+def test_event_times_are_utc_whatever_the_local_timezone(monkeypatch):
+    monkeypatch.setenv("TZ", "America/New_York")
+    time.tzset()
+    try:
+        closed = []
+        tracker = ViolationEventTracker("cam01", open_k=1, window_n=1, close_after=1,
+                                        on_close=lambda e: closed.append(e.to_dict()))
+        start = 1772352000.0  # 2026-03-01 08:00:00 UTC
+        tracker.update([violation()], None, start)
+        tracker.update([violation()], None, start + 90)
+        tracker.update([], None, start + 91)
+    finally:
+        monkeypatch.delenv("TZ")
+        time.tzset()
+    assert closed[0]["started_at"] == "2026-03-01T08:00:00+00:00"
+    assert closed[0]["ended_at"] == "2026-03-01T08:01:30+00:00"
+
+
+def test_unchecked_items_are_not_reported_missing():
+    vest_only = {"helmet": None, "vest": False}
+    assert violation_type_of(vest_only) == "No Vest"
+    assert severity_of(vest_only) == "Medium"
+    assert severity_of({"helmet": False, "vest": False}) == "High"
+
+
+def test_event_settings_are_coerced_and_range_checked():
+    assert parse_event_settings({"openFrames": "2", "windowFrames": 4.0}) == (2, 4, 5)
+    for bad in ({"openFrames": -1}, {"closeFrames": "soon"}, {"windowFrames": None},
+                {"openFrames": 6, "windowFrames": 5}, {"closeFrames": True}):
+        with pytest.raises(ValueError):
+            parse_event_settings(bad)
+
+
+def test_configure_resizes_existing_track_history():
+    tracker = ViolationEventTracker("cam01", open_k=3, window_n=5)
+    for i in range(5):
+        tracker.update([violation()], None, 1000.0 + i)
+    tracker.configure(2, 3, 5)
+    assert [t.history.maxlen for t in tracker._tracks] == [3]
+    assert len(tracker._tracks[0].history) == 3
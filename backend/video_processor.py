@@ -5,158 +5,295 @@ import sqlite3
 import os
 import platform
 from datetime import datetime
-from yolo_logic import YoloPPEDetector
+from annotation_renderer import AnnotationRenderer
+from frame_exchange import FrameExchange
+from camera_config import CameraConfig, RegionOfInterest
+from violation_events import ViolationEventTracker, parse_event_settings
+from clip_recorder import ClipRecorder
+from event_bus import bus
+from synthetic_source import open_capture
+
+CAPTURE_FPS = 15  # Approximate loop rate, used to turn inferenceFrequency into a cadence
+READ_RETRY_SECONDS = 0.1      # First wait after a source stops returning frames, doubled per failure
+READ_RETRY_MAX_SECONDS = 2.0
+
+
+def parse_processor_settings(settings, detect_every=5, event_defaults=()):
+    """
+    The VideoProcessor fields set by the app settings, as a dict. Missing keys
+    keep the given detect_every / (open_k, window_n, close_after) values.
+    Raises ValueError for any invalid value, so nothing is applied partially.
+    """
+    targets = settings.get("detectionTargets") or {}
+    if not isinstance(targets, dict):
+        raise ValueError("detectionTargets must be an object")
+    for item in ("helmet", "vest"):
+        if not isinstance(targets.get(item, True), bool):
+            raise ValueError(f"detectionTargets.{item} must be true or false")
+
+    threshold = settings.get("confidenceThreshold") or 0.0
+    if isinstance(threshold, bool) or not isinstance(threshold, (int, float)) or not 0 <= threshold <= 1:
+        raise ValueError("confidenceThreshold must be a number from 0 to 1")
+
+    # "15fps" -> run detection on every frame, "5fps" -> every 3rd, at ~15 FPS capture
+    frequency = settings.get("inferenceFrequency")
+    if frequency:
+        frequency = str(frequency)
+        if not (frequency.endswith("fps") and frequency[:-3].isdigit()):
+            raise ValueError("inferenceFrequency must look like \"15fps\"")
+        detect_every = max(1, round(CAPTURE_FPS / max(1, int(frequency[:-3]))))
+
+    return {
+        "check_helmet": targets.get("helmet", True),
+        "check_vest": targets.get("vest", True),
+        "min_confidence": float(threshold),
+        "detect_every": detect_every,
+        "events": parse_event_settings(settings.get("violationEvents") or {}, *event_defaults)
+    }
 
 class VideoProcessor:
-    def __init__(self, source, camera_id="cam01", db_path="safeguard.db", snapshot_folder="snapshots"):
+    def __init__(self, source, camera_id="cam01", db_path="safeguard.db", snapshot_folder="snapshots", config=None,
+                 clip_folder=None, media_url="http://localhost:5000"):
         self.source = source
+        self.media_url = media_url  # Base of the snapshot/clip URLs stored with violations
         self.camera_id = camera_id
+        self.config = config or CameraConfig(camera_id, source)
+        self.roi = RegionOfInterest(self.config)
         self.db_path = db_path
         self.snapshot_folder = snapshot_folder
         
         self.running = False
+        self.paused = False
         self.thread = None
+        self.cap = None
         self.lock = threading.Lock()
-        self.processed_frame = None
+        self.frames = FrameExchange(self.config.frame_shape)  # Published annotated frames
         self.detector = None
-        self.detection_lock = None  # Shared lock for YOLO thread safety
+        self.renderer = AnnotationRenderer()
         
+        # Violations are logged once per event, when the event closes
+        self.events = ViolationEventTracker(camera_id, on_open=self._on_event_opened, on_close=self._on_event_closed)
+        # Short clips around each violation, from an in-memory ring of encoded frames
+        self.clips = ClipRecorder(camera_id, clip_folder) if clip_folder else None
+
+        # Detection settings, updated live by apply_settings()
+        self.check_helmet = True
+        self.check_vest = True
+        self.min_confidence = 0.0
+        self.detect_every = 5  # Run YOLO every 5th frame to share CPU fairly
+        self.settings_version = 0
+
         # State
-        self.last_violation_time = 0
-        self.violation_cooldown = 15 # Seconds between logging violations (Increased to prevent spam)
         self.fps = 0
+        self.last_frame_at = None  # time.time() of the last published frame
         self.total_tracked = 0
         self.active_violations = 0
 
         self.compliance_rate = 100.0
+        self.zone_stats = self.roi.zone_stats([])
 
-    def start(self, detector_ref, detection_lock=None):
+    def apply_settings(self, settings):
+        """Apply app settings (see SettingsService) to the running pipeline, all or nothing."""
+        try:
+            parsed = parse_processor_settings(
+                settings, self.detect_every, (self.events.open_k, self.events.window_n, self.events.close_after)
+            )
+        except ValueError as e:
+            print(f"[{self.camera_id}] Settings not applied: {e}")
+            return
+        self.check_helmet = parsed["check_helmet"]
+        self.check_vest = parsed["check_vest"]
+        self.min_confidence = parsed["min_confidence"]
+        self.detect_every = parsed["detect_every"]
+        self.events.configure(*parsed["events"])
+        self.settings_version += 1
+
+    def open(self):
+        """Open the video source ahead of start() so it can be done in parallel."""
+        print(f"Opening video source: {self.source}")
+        self.cap = open_capture(self.source)
+        if not self.cap.isOpened():
+            print(f"FAILED to open: {self.source}")
+            return False
+        return True
+
+    def start(self, detector_ref):
         self.detector = detector_ref
-        self.detection_lock = detection_lock
         self.running = True
-        self.thread = threading.Thread(target=self._process_loop, daemon=True)
+        self.last_frame_at = time.time()  # Frame age counts from start until the first frame
+        # Named so the profiler (see profiler.py) can group samples by camera
+        self.thread = threading.Thread(target=self._process_loop, name=f"camera-{self.camera_id}", daemon=True)
         self.thread.start()
         
-    def get_frame(self):
+    def stop(self, timeout=5.0):
+        """Stop processing; open violation events are closed and the source is released."""
+        self.running = False
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join(timeout)
+
+    def pause(self):
+        """Freeze the stream on its current frame; no frames are read or re-rendered."""
+        self.paused = True
+        with self.lock:
+            self.fps = 0
+
+    def resume(self):
         with self.lock:
-            if self.processed_frame is None:
-                return None
-            return self.processed_frame.copy()
+            self.last_frame_at = time.time()  # Time spent paused doesn't count as stalled
+        self.paused = False
 
     def get_stats(self):
         with self.lock:
             return {
                 "fps": self.fps,
+                # fps is only recalculated every 30 frames, so it can't show a source that stopped
+                "frame_age": round(time.time() - self.last_frame_at, 1) if self.last_frame_at else None,
                 "total_tracked": self.total_tracked,
                 "active_violations": self.active_violations,
-                "compliance_rate": self.compliance_rate
+                "compliance_rate": self.compliance_rate,
+                "paused": self.paused,
+                "open_events": len(self.events.open_events()),
+                "settings_version": self.settings_version,
+                "clips": self.clips.get_stats() if self.clips else None,
+                "zones": {name: dict(z) for name, z in self.zone_stats.items()}
             }
 
-    def _log_violation(self, frame, detections):
-        try:
-            violations = [d for d in detections if d['status'] == 'Violation']
-            if not violations: return
+    def _on_event_opened(self, event):
+        if self.clips:
+            event.clip = self.clips.capture(event.id, event.started_at)
+        bus.publish("violation.opened", event.to_dict())
+
+    def _on_event_closed(self, event):
+        bus.publish("violation.closed", event.to_dict())
+        # Disk and DB writes stay off the capture thread
+        threading.Thread(
+            target=self._log_violation, args=(event,), name=f"violation-log-{self.camera_id}", daemon=True
+        ).start()
 
-            timestamp = int(time.time())
-            filename = f"vio_{self.camera_id}_{timestamp}.jpg"
+    def _log_violation(self, event):
+        """Write one closed violation event: best snapshot plus a single DB row."""
+        try:
+            started = datetime.fromtimestamp(event.started_at)
+            filename = f"vio_{self.camera_id}_{int(event.started_at)}_{event.track_id}.jpg"
             filepath = os.path.join(self.snapshot_folder, filename)
             
-            cv2.imwrite(filepath, frame)
-            
-            v = violations[0]
-            violation_type = "PPE Violation"
-            if not v.get('helmet', True): violation_type = "No Helmet"
-            elif not v.get('vest', True): violation_type = "No Vest"
+            if event.snapshot is not None:
+                cv2.imwrite(filepath, event.snapshot)
+                event.snapshot = None
             
-            now_str = datetime.now()
-            date_str = now_str.strftime("%b %d, %Y")
-            time_str = now_str.strftime("%H:%M:%S")
+            date_str = started.strftime("%b %d, %Y")
+            time_str = started.strftime("%H:%M:%S")
+            info = event.to_dict()
             
             conn = sqlite3.connect(self.db_path, timeout=10)
             conn.execute("PRAGMA journal_mode=WAL")
             conn.execute(
                 """INSERT INTO violations 
-                   (id, date, time, worker, worker_id, type, severity, zone, camera_id, status, snapshot) 
-                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-                (f"VIO-{timestamp}-{self.camera_id}", date_str, time_str, "Unknown Worker", "N/A", 
-                 violation_type, "High", f"Zone {self.camera_id}", self.camera_id, "Pending", 
-                 f"http://localhost:5000/snapshots/{filename}")
+                   (id, date, time, worker, worker_id, type, severity, zone, camera_id, status, snapshot,
+                    started_at, ended_at, duration, clip) 
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (event.id, date_str, time_str, "Unknown Worker", "N/A", 
+                 event.type, event.severity, event.zone or self.config.name, self.camera_id, "Pending", 
+                 f"{self.media_url}/snapshots/{filename}",
+                 info["started_at"], info["ended_at"], info["duration"],
+                 f"{self.media_url}/clips/{event.clip}" if event.clip else None)
             )
             conn.commit()
             conn.close()
-            print(f"Logged violation: {filename}")
+            print(f"Logged violation: {event.id} ({info['duration']}s)")
             
         except Exception as e:
             print(f"Error logging violation: {e}")
 
+    def _detect(self, frame):
+        """Run detection on the camera's zones only, at its inference size."""
+        crop = self.roi.prepare(frame)
+        detections = self.detector.detect(crop, self.check_helmet, self.check_vest, imgsz=self.config.inference_size)
+        if self.min_confidence:
+            detections = [d for d in detections if d["conf"] >= self.min_confidence]
+        return self.roi.to_frame(detections)
+
     def _process_loop(self):
-        print(f"Opening video source: {self.source}")
-        cap = cv2.VideoCapture(self.source)
-        
-        if not cap.isOpened():
-            print(f"FAILED to open: {self.source}")
+        if self.cap is None and not self.open():
             return
+        cap = self.cap
 
         frame_count = 0
-        detect_every = 5  # Run YOLO every 5th frame to share CPU fairly
         last_detections = []
+        detections_version = 0
         start_time = time.time()
+
+        events_version = 0
+        slot = None   # Buffer from self.frames being drawn into
+        frame = None
+        read_failures = 0
         
         while self.running:
-            ret, frame = cap.read()
-            if not ret:
-                cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-                continue
-            
-            # Resize ALL videos to 640x360 for fast processing
-            frame = cv2.resize(frame, (640, 360))
-                
-            frame_count += 1
-            
-            # FPS Calculation
-            if frame_count % 30 == 0:
-                elapsed = time.time() - start_time
-                self.fps = 30 / elapsed if elapsed > 0 else 0
-                start_time = time.time()
-
-            # Only run detection every Nth frame
-            if frame_count % detect_every == 0:
-                try:
-                    if self.detection_lock:
-                        # Use timeout to prevent starvation
-                        acquired = self.detection_lock.acquire(timeout=2)
-                        if acquired:
-                            try:
-                                last_detections = self.detector.detect(frame)
-                            finally:
-                                self.detection_lock.release()
+            # While paused keep the last frame; the renderer then has nothing to redo
+            if not self.paused or frame is None:
+                ret, raw = cap.read()
+                if not ret:
+                    read_failures += 1
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                    if read_failures > 1:
+                        # Not just the end of a file: back off instead of spinning on a dead source
+                        time.sleep(min(READ_RETRY_MAX_SECONDS, READ_RETRY_SECONDS * 2 ** (read_failures - 2)))
+                    continue
+                read_failures = 0
+
+                # Resize to the camera's frame size (640x360 by default) for fast processing
+                slot = self.frames.acquire()
+                frame = cv2.resize(raw, self.config.frame_size, dst=slot.array)
+
+                frame_count += 1
+
+                # FPS Calculation
+                if frame_count % 30 == 0:
+                    elapsed = time.time() - start_time
+                    self.fps = 30 / elapsed if elapsed > 0 else 0
+                    start_time = time.time()
+
+                # Only run detection every Nth frame
+                if frame_count % self.detect_every == 0:
+                    try:
+                        last_detections = self._detect(frame)
+                    except Exception as e:
+                        print(f"Detection error in {self.camera_id}: {e}")
+                        last_detections = []
+                    detections_version += 1
+
+            # Always draw the latest known detections on the current frame (in place)
+            if self.renderer.render(frame, last_detections, frame_count, detections_version):
+                self.frames.publish(slot)
+
+                # Update stats
+                with self.lock:
+                    self.last_frame_at = time.time()
+                    self.total_tracked = len(last_detections)
+                    self.zone_stats = self.roi.zone_stats(last_detections)
+                    violation_count = sum(1 for d in last_detections if d['status'] == 'Violation')
+                    self.active_violations = violation_count
+                    if self.total_tracked > 0:
+                        self.compliance_rate = ((self.total_tracked - self.active_violations) / self.total_tracked) * 100
                     else:
-                        last_detections = self.detector.detect(frame)
-                except Exception as e:
-                    print(f"Detection error in {self.camera_id}: {e}")
-                    last_detections = []
+                        self.compliance_rate = 100.0
 
-            # Always draw the latest known detections on the current frame
-            annotated_frame = self.detector.draw_annotations(frame.copy(), last_detections)
-            
-            # Update stats
-            with self.lock:
-                self.processed_frame = annotated_frame
-                self.total_tracked = len(last_detections)
-                violation_count = sum(1 for d in last_detections if d['status'] == 'Violation')
-                self.active_violations = violation_count
-                if self.total_tracked > 0:
-                    self.compliance_rate = ((self.total_tracked - self.active_violations) / self.total_tracked) * 100
-                else:
-                    self.compliance_rate = 100.0
-
-            # Log Violation if needed
-            if self.active_violations > 0:
-                if time.time() - self.last_violation_time > self.violation_cooldown:
-                    threading.Thread(target=self._log_violation, args=(annotated_frame.copy(), list(last_detections)), daemon=True).start()
-                    self.last_violation_time = time.time()
-            
-            # Throttle to ~15 FPS
+                if self.clips:
+                    self.clips.add_frame(frame, time.time())
+
+            # Feed each new detection result to the violation event engine
+            if detections_version != events_version:
+                events_version = detections_version
+                self.events.update(last_detections, frame, time.time())
+
+            # A paused camera adds no frames, so finish the clips it was recording
+            if self.paused and self.clips:
+                self.clips.flush()
+
+            # Throttle to ~15 FPS (CAPTURE_FPS)
             time.sleep(0.06)
             
+        self.events.close_all(time.time())
+        if self.clips:
+            self.clips.flush()
         cap.release()
@@ -0,0 +1,249 @@
+"""
+SafeGuard AI — Violation Events
+================================
+Turns per-frame detections into violation events with a start and end.
+
+People are followed across detection frames by box overlap (IoU). An
+event opens once a person has been non-compliant in K of their last N
+detection frames, is updated in memory while the violation persists
+(peak severity, best snapshot), and closes after the person has been
+compliant or out of view for `close_after` detection frames. Only closed
+events are written to the database, as a single row each.
+"""
+
+import itertools
+from collections import deque
+from datetime import datetime, timezone
+
+import numpy as np
+
+SEVERITY_RANK = {"Medium": 1, "High": 2}
+OPEN_FRAMES, WINDOW_FRAMES, CLOSE_FRAMES = 3, 5, 5  # Defaults: open on K of N frames, close after M
+MAX_EVENT_FRAMES = 300  # Upper bound for the violationEvents frame counts
+
+
+def severity_of(d):
+    """High when both helmet and vest are missing, Medium for one. Unchecked items (None) don't count."""
+    missing = (d.get("helmet") is False) + (d.get("vest") is False)
+    return "High" if missing >= 2 else "Medium"
+
+
+def violation_type_of(d):
+    if d.get("helmet") is False: return "No Helmet"
+    if d.get("vest") is False: return "No Vest"
+    return "PPE Violation"
+
+
+def utc_iso(timestamp):
+    """time.time() value as an ISO 8601 string in UTC, e.g. 2026-03-01T08:00:00+00:00."""
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat(timespec="seconds")
+
+
+def iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    iw = min(ax + aw, bx + bw) - max(ax, bx)
+    ih = min(ay + ah, by + bh) - max(ay, by)
+    if iw <= 0 or ih <= 0:
+        return 0.0
+    inter = iw * ih
+    return inter / float(aw * ah + bw * bh - inter)
+
+
+class ViolationEvent:
+    def __init__(self, event_id, camera_id, track_id, started_at):
+        self.id = event_id
+        self.camera_id = camera_id
+        self.track_id = track_id
+        self.started_at = started_at
+        self.last_seen = started_at
+        self.ended_at = None
+        self.zone = None
+        self.type = None
+        self.severity = None
+        self.frames = 0
+        self.best_score = None
+        self.snapshot = None  # Owned copy of the best frame so far
+        self.clip = None      # Clip filename, if a clip recorder captured one
+
+    def observe(self, d, frame, now):
+        """Record one non-compliant detection of this person."""
+        self.last_seen = now
+        self.frames += 1
+        severity = severity_of(d)
+        score = (SEVERITY_RANK[severity], d["conf"])
+        if self.best_score is None or score > self.best_score:
+            self.best_score = score
+            self.severity = severity
+            self.type = violation_type_of(d)
+            self.zone = d.get("zone")
+            if frame is not None:
+                if self.snapshot is None or self.snapshot.shape != frame.shape:
+                    self.snapshot = np.empty_like(frame)
+                np.copyto(self.snapshot, frame)
+
+    @property
+    def duration(self):
+        return (self.ended_at or self.last_seen) - self.started_at
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "camera_id": self.camera_id,
+            "zone": self.zone,
+            "type": self.type,
+            "severity": self.severity,
+            # UTC with an explicit offset, like the rows' created_at (SQLite CURRENT_TIMESTAMP)
+            "started_at": utc_iso(self.started_at),
+            "ended_at": utc_iso(self.ended_at) if self.ended_at else None,
+            "duration": round(self.duration, 1),
+            "clip": self.clip,
+        }
+
+
+class _Track:
+    __slots__ = ("id", "bbox", "history", "clear_frames", "event")
+
+    def __init__(self, track_id, bbox, window):
+        self.id = track_id
+        self.bbox = bbox
+        self.history = deque(maxlen=window)
+        self.clear_frames = 0  # Consecutive detection frames compliant or unseen
+        self.event = None
+
+
+def parse_event_settings(events, open_k=OPEN_FRAMES, window_n=WINDOW_FRAMES, close_after=CLOSE_FRAMES):
+    """
+    (open_k, window_n, close_after) from the "violationEvents" settings
+    (openFrames, windowFrames, closeFrames); missing keys keep the given
+    values. Raises ValueError for non-integers or values out of range.
+    """
+    if not isinstance(events, dict):
+        raise ValueError("violationEvents must be an object")
+    values = {}
+    for key, current in (("openFrames", open_k), ("windowFrames", window_n), ("closeFrames", close_after)):
+        value = events.get(key, current)
+        if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+            raise ValueError(f"violationEvents.{key} must be an integer")
+        try:
+            number = float(value)
+        except ValueError:
+            raise ValueError(f"violationEvents.{key} must be an integer")
+        if number != int(number) or not 1 <= number <= MAX_EVENT_FRAMES:
+            raise ValueError(f"violationEvents.{key} must be an integer from 1 to {MAX_EVENT_FRAMES}")
+        values[key] = int(number)
+    if values["openFrames"] > values["windowFrames"]:
+        raise ValueError("violationEvents.openFrames can't be larger than windowFrames")
+    return values["openFrames"], values["windowFrames"], values["closeFrames"]
+
+
+class ViolationEventTracker:
+    def __init__(self, camera_id, open_k=OPEN_FRAMES, window_n=WINDOW_FRAMES, close_after=CLOSE_FRAMES,
+                 iou_threshold=0.3, on_open=None, on_close=None):
+        self.camera_id = camera_id
+        self.open_k = open_k
+        self.window_n = window_n
+        self.close_after = close_after
+        self.iou_threshold = iou_threshold
+        self.on_open = on_open
+        self.on_close = on_close
+        self._tracks = []
+        self._ids = itertools.count(1)
+
+    def configure(self, open_k, window_n, close_after):
+        """Change the thresholds; existing tracks keep their most recent history."""
+        self.open_k = open_k
+        self.close_after = close_after
+        if window_n != self.window_n:
+            self.window_n = window_n
+            for track in list(self._tracks):
+                track.history = deque(track.history, maxlen=window_n)
+
+    def open_events(self):
+        return [t.event for t in self._tracks if t.event is not None]
+
+    def _match(self, detections):
+        """Greedy IoU matching of detections to existing tracks."""
+        pairs = sorted(
+            ((iou(t.bbox, d["bbox"]), ti, di)
+             for ti, t in enumerate(self._tracks) for di, d in enumerate(detections)),
+            reverse=True
+        )
+        matched, used_t, used_d = [], set(), set()
+        for score, ti, di in pairs:
+            if score < self.iou_threshold:
+                break
+            if ti in used_t or di in used_d:
+                continue
+            used_t.add(ti)
+            used_d.add(di)
+            matched.append((self._tracks[ti], detections[di]))
+        return matched, used_t, used_d
+
+    def update(self, detections, frame, now):
+        """Feed one detection frame. frame is the annotated frame for snapshots."""
+        matched, used_t, used_d = self._match(detections)
+
+        for di, d in enumerate(detections):
+            if di not in used_d:
+                track = _Track(next(self._ids), d["bbox"], self.window_n)
+                self._tracks.append(track)
+                matched.append((track, d))
+        unmatched = [t for ti, t in enumerate(self._tracks) if ti not in used_t and t.history]
+
+        for track, d in matched:
+            track.bbox = d["bbox"]
+            violating = d["status"] == "Violation"
+            track.history.append(violating)
+            track.clear_frames = 0 if violating else track.clear_frames + 1
+
+            if not violating:
+                continue
+            opening = track.event is None and sum(track.history) >= self.open_k
+            if opening:
+                track.event = ViolationEvent(
+                    f"VIO-{int(now)}-{self.camera_id}-{track.id}", self.camera_id, track.id, now
+                )
+            if track.event is not None:
+                # Observe first so the opened event already has its zone, type and severity
+                track.event.observe(d, frame, now)
+            if opening and self.on_open:
+                self.on_open(track.event)
+
+        for track in unmatched:
+            track.history.append(False)
+            track.clear_frames += 1
+
+        # Close finished events and forget people who are gone
+        keep = []
+        for track in self._tracks:
+            if track.clear_frames >= self.close_after:
+                if track.event is not None:
+                    self._close(track.event, track.event.last_seen)
+                    track.event = None
+                if track.clear_frames >= self.window_n and track in unmatched:
+                    continue
+            keep.append(track)
+        self._tracks = keep
+
+    def close_all(self, now):
+        for track in self._tracks:
+            if track.event is not None:
+                self._close(track.event, now)
+                track.event = None
+
+    def _close(self, event, ended_at):
+        event.ended_at = ended_at
+        if self.on_close:
+            self.on_close(event)
+
+
+def ensure_violation_columns(conn):
+    """Add the event interval and clip columns to an existing violations table."""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(violations)")}
+    if not columns:
+        return
+    for name, ddl in (("started_at", "TEXT"), ("ended_at", "TEXT"), ("duration", "REAL"), ("clip", "TEXT")):
+        if name not in columns:
+            conn.execute(f"ALTER TABLE violations ADD COLUMN {name} {ddl}")
+    conn.commit()
@@ -1,10 +1,53 @@
 import cv2
 import numpy as np
-from ultralytics import YOLO
+
+HSV_MAX = (180, 255, 255)  # OpenCV hue is 0-180
+
+
+def parse_color_settings(settings):
+    """
+    ({type: ranges}, threshold) from the "ppeColors" and "colorThreshold"
+    settings; missing keys give no ranges for that type and a None threshold.
+    Raises ValueError for malformed ranges or a threshold outside 0-1.
+    """
+    colors = settings.get("ppeColors") or {}
+    if not isinstance(colors, dict):
+        raise ValueError("ppeColors must be an object")
+    ranges = {}
+    for color_type in ("helmet", "vest"):
+        entries = colors.get(color_type)
+        if not entries:
+            continue
+        if not isinstance(entries, list):
+            raise ValueError(f"ppeColors.{color_type} must be a list of ranges")
+        parsed = []
+        for entry in entries:
+            if not isinstance(entry, dict):
+                raise ValueError(f"ppeColors.{color_type} ranges must be objects with lower and upper")
+            bounds = {}
+            for key in ("lower", "upper"):
+                value = entry.get(key)
+                if (not isinstance(value, list) or len(value) != 3
+                        or not all(isinstance(v, int) and not isinstance(v, bool) and 0 <= v <= top
+                                   for v, top in zip(value, HSV_MAX))):
+                    raise ValueError(f"ppeColors.{color_type}.{key} must be [h, s, v] with h 0-180 and s, v 0-255")
+                bounds[key] = np.array(value, dtype=np.uint8)
+            parsed.append(bounds)
+        ranges[color_type] = parsed
+
+    threshold = settings.get("colorThreshold")
+    if threshold is not None:
+        if isinstance(threshold, bool) or not isinstance(threshold, (int, float)) or not 0 <= threshold <= 1:
+            raise ValueError("colorThreshold must be a number from 0 to 1")
+        threshold = float(threshold)
+    return ranges, threshold
+
 
 class YoloPPEDetector:
     def __init__(self, model_path="yolov8n.pt"):
         """Initialize the YOLOv8 model for person detection."""
+        # Imported here so that only building a detector loads ultralytics/torch
+        from ultralytics import YOLO
         self.model = YOLO(model_path)
         
         # HSV Color Ranges for PPE (Broad ranges for common gear)
@@ -22,6 +65,24 @@ class YoloPPEDetector:
                 {"lower": np.array([35, 90, 90]), "upper": np.array([85, 255, 255])}
             ]
         }
+        self.color_threshold = 0.03  # Fraction of the region that must match
+
+    def apply_settings(self, settings):
+        """
+        Apply HSV ranges and the color match threshold from app settings:
+            "ppeColors": {"helmet": [{"lower": [h, s, v], "upper": [h, s, v]}, ...], "vest": [...]}
+            "colorThreshold": 0.03
+        Missing keys leave the current values alone; invalid ones leave everything alone.
+        """
+        try:
+            ranges, threshold = parse_color_settings(settings)
+        except ValueError as e:
+            print(f"PPE color settings not applied: {e}")
+            return
+        # Swap in whole objects so detection threads never see a half-applied update
+        self.color_ranges = {**self.color_ranges, **ranges}
+        if threshold is not None:
+            self.color_threshold = threshold
 
     def _check_region_for_color(self, region_hsv, color_type):
         """Check if any of the target colors exist in the HSV region."""
@@ -37,12 +98,25 @@ class YoloPPEDetector:
         pixel_count = cv2.countNonZero(combined_mask)
         total_pixels = region_hsv.shape[0] * region_hsv.shape[1]
         
-        return pixel_count > (total_pixels * 0.03) # 3% threshold
+        return pixel_count > (total_pixels * self.color_threshold) # 3% by default
 
-    def detect(self, frame, check_helmet=True, check_vest=True):
+    def detect(self, frame, check_helmet=True, check_vest=True, imgsz=None):
         """Detect people and then check for PPE in their ROI."""
+        return self.detect_batch([frame], check_helmet, check_vest, imgsz)[0]
+
+    def detect_batch(self, frames, check_helmet=True, check_vest=True, imgsz=None):
+        """
+        Run YOLO once over a list of frames and return detections per frame.
+        imgsz overrides the model's inference input size (e.g. 320 for speed).
+        """
+        options = {"imgsz": imgsz} if imgsz else {}
         # Lower confidence to 0.15 to detect smaller/further objects
-        results = self.model(frame, verbose=False, conf=0.15)[0]
+        results = self.model(list(frames), verbose=False, conf=0.15, **options)
+        return [self._check_ppe(frame, result, check_helmet, check_vest)
+                for frame, result in zip(frames, results)]
+
+    def _check_ppe(self, frame, results, check_helmet, check_vest):
+        """Turn one frame's YOLO results into person detections with PPE status."""
         detections = []
         
         for box in results.boxes:
@@ -61,26 +135,27 @@ class YoloPPEDetector:
             
             hsv = cv2.cvtColor(person_crop, cv2.COLOR_BGR2HSV)
             
-            has_helmet = False
-            has_vest = False
+            # None: the item is not being checked (see detectionTargets)
+            has_helmet = None
+            has_vest = None
             
             # 1. Helmet Check (Top 25% of the person)
             if check_helmet:
                 head_h = int(h * 0.25)
                 head_roi = hsv[0:head_h, :]
-                has_helmet = self._check_region_for_color(head_roi, "helmet")
+                has_helmet = bool(self._check_region_for_color(head_roi, "helmet"))
                 
             # 2. Vest Check (Middle 50% of the person)
             if check_vest:
                 vest_start = int(h * 0.15)
                 vest_end = int(h * 0.70)
                 vest_roi = hsv[vest_start:vest_end, :]
-                has_vest = self._check_region_for_color(vest_roi, "vest")
+                has_vest = bool(self._check_region_for_color(vest_roi, "vest"))
                 
             # Logic: If both are checked, both must be present for "Compliant"
             compliance = "Compliant"
-            if check_helmet and not has_helmet: compliance = "Violation"
-            if check_vest and not has_vest: compliance = "Violation"
+            if has_helmet is False: compliance = "Violation"
+            if has_vest is False: compliance = "Violation"
             
             detections.append({
                 "status": compliance,
@@ -91,32 +166,3 @@ class YoloPPEDetector:
             })
             
         return detections
-
-    def draw_annotations(self, frame, detections):
-        for d in detections:
-            x, y, w, h = d["bbox"]
-            
-            # Color
-            color = (0, 255, 0) # Green
-            if d["status"] == "Violation":
-                color = (0, 0, 255) # Red
-            
-            # Box
-            cv2.rectangle(frame, (x, y), (x + w, y + h), color, 2)
-            
-            # Label
-            label = d["status"]
-            # Add details
-            details = []
-            if not d["helmet"]: details.append("No Helmet")
-            if not d["vest"]: details.append("No Vest")
-            
-            if details:
-                label += ": " + ", ".join(details)
-                
-            # Draw label background
-            (tw, th), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1)
-            cv2.rectangle(frame, (x, y - 20), (x + tw, y), color, -1)
-            cv2.putText(frame, label, (x, y - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
-            
-        return frame
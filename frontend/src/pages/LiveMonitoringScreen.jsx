@@ -139,7 +139,7 @@ const LiveMonitoringScreen = () => {
                                     onClick={() => setSelectedCam(cam.id)}
                                     className={`relative h-32 rounded-2xl overflow-hidden shadow-sm transition-all group border-4 ${selectedCam === cam.id ? 'border-[#0066FF] shadow-xl' : 'border-transparent hover:border-slate-200'}`}
                                 >
-                                    <img src={cam.source} className="w-full h-full object-cover" />
+                                    <img src={`${cam.source}?variant=thumb`} className="w-full h-full object-cover" />
                                     <div className="absolute inset-0 bg-gradient-to-t from-black/80 via-transparent to-transparent"></div>
                                     <span className="absolute bottom-3 left-4 text-white text-xs font-bold shadow-sm">{cam.shortLabel}</span>
                                     {selectedCam === cam.id && (